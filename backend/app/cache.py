@@ -0,0 +1,170 @@
+"""
+Caché en memoria con TTL por espacio de nombres y desalojo LRU
+Envuelve los métodos async de los conectores y las consultas de datos de los motores;
+los tiempos de vida y el tamaño máximo salen de Config (CACHE_TTL_*, MAX_CACHE_SIZE).
+Los fallos de caché simultáneos para la misma clave se coalescen con single-flight.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from services.normalization import normalizar
+from .config import Config
+from .single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Espacios de nombres y su TTL en segundos
+CACHE_TTLS = {
+    'crime_data': Config.CACHE_TTL_CRIME_DATA,
+    'weather': Config.CACHE_TTL_WEATHER,
+    'socioeconomic': Config.CACHE_TTL_SOCIOECONOMIC,
+    'risk_data': Config.CACHE_TTL_RISK_DATA,
+    'business_density': Config.CACHE_TTL_BUSINESS_DENSITY,
+}
+
+_FALTA = object()
+
+
+def _normalizar_argumento(valor: Any) -> Any:
+    """Municipio/estado escritos distinto ('Tultepec', 'TULTEPEC ') comparten clave"""
+    return normalizar(valor) if isinstance(valor, str) else valor
+
+
+class _Espacio:
+    """Entradas (expira, valor) de un espacio de nombres en orden LRU, con sus contadores"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.entradas: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class TTLCache:
+    """Caché acotada por espacio de nombres: TTL propio, máximo max_size entradas, desalojo LRU"""
+
+    def __init__(self, max_size: int = Config.MAX_CACHE_SIZE, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = Config.CACHE_TTL_CRIME_DATA):
+        self.max_size = max_size
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.enabled = True
+        self._espacios: Dict[str, _Espacio] = {}
+        # Los motores también consultan desde hilos (asyncio.to_thread)
+        self._lock = threading.Lock()
+
+    def _espacio(self, namespace: str) -> _Espacio:
+        espacio = self._espacios.get(namespace)
+        if espacio is None:
+            espacio = self._espacios[namespace] = _Espacio(self.ttls.get(namespace, self.default_ttl))
+        return espacio
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            espacio = self._espacio(namespace)
+            entrada = espacio.entradas.get(key)
+            if entrada is not None:
+                expira, valor = entrada
+                if expira > time.monotonic():
+                    espacio.entradas.move_to_end(key)
+                    espacio.hits += 1
+                    return valor
+                del espacio.entradas[key]
+                espacio.expirations += 1
+            espacio.misses += 1
+            return default
+
+    def set(self, namespace: str, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            espacio = self._espacio(namespace)
+            espacio.entradas[key] = (time.monotonic() + (espacio.ttl if ttl is None else ttl), value)
+            espacio.entradas.move_to_end(key)
+            while len(espacio.entradas) > self.max_size:
+                espacio.entradas.popitem(last=False)
+                espacio.evictions += 1
+
+    def contains(self, namespace: str, key: Hashable) -> bool:
+        """Entrada vigente sin alterar el orden LRU ni los contadores"""
+        with self._lock:
+            espacio = self._espacios.get(namespace)
+            entrada = espacio.entradas.get(key) if espacio is not None else None
+            return entrada is not None and entrada[0] > time.monotonic()
+
+    def invalidate(self, namespace: Optional[str] = None):
+        """Vaciar un espacio de nombres (o todos)"""
+        with self._lock:
+            for nombre, espacio in self._espacios.items():
+                if namespace is None or nombre == namespace:
+                    espacio.entradas.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            espacios = {
+                nombre: {
+                    'size': len(e.entradas),
+                    'ttl': e.ttl,
+                    'hits': e.hits,
+                    'misses': e.misses,
+                    'evictions': e.evictions,
+                    'expirations': e.expirations,
+                    'hit_rate': round(e.hits / (e.hits + e.misses), 3) if e.hits + e.misses else 0.0,
+                }
+                for nombre, e in self._espacios.items()
+            }
+        return {'enabled': self.enabled, 'max_size': self.max_size, 'namespaces': espacios}
+
+
+# Instancia global compartida por conectores y motores
+response_cache = TTLCache()
+
+
+def cached(namespace: str, respaldo: Optional[Callable[[Any], bool]] = None,
+           cache: Optional[TTLCache] = None):
+    """
+    Decorador para métodos async: la clave es (método, argumentos normalizados) sin self,
+    así que instancias distintas del mismo conector comparten entradas.
+    Llamadas concurrentes con la misma clave esperan una sola consulta a la fuente.
+    Los resultados de respaldo (respaldo(resultado) es True) se guardan solo CACHE_TTL_FALLBACK
+    segundos para no martillar una fuente caída sin fijar valores de emergencia por horas.
+    Las excepciones no se cachean; el valor devuelto es compartido, los llamadores no lo mutan.
+    """
+    def decorador(func):
+        nombre = func.__qualname__
+
+        def clave(*args, **kwargs) -> Tuple:
+            return (
+                tuple(_normalizar_argumento(a) for a in args),
+                tuple(sorted((k, _normalizar_argumento(v)) for k, v in kwargs.items())),
+            )
+
+        @functools.wraps(func)
+        async def envoltura(self, *args, **kwargs):
+            almacen = cache or response_cache
+            key = clave(*args, **kwargs)
+            if almacen.enabled:
+                valor = almacen.get(namespace, (nombre, key), _FALTA)
+                if valor is not _FALTA:
+                    return valor
+
+            async def consultar():
+                valor = await func(self, *args, **kwargs)
+                if almacen.enabled:
+                    ttl = Config.CACHE_TTL_FALLBACK if respaldo is not None and respaldo(valor) else None
+                    almacen.set(namespace, (nombre, key), valor, ttl=ttl)
+                return valor
+
+            return await single_flight.do(nombre, key, consultar)
+
+        def en_cache(*args, **kwargs) -> bool:
+            """¿Hay resultado vigente para estos argumentos? (sin contar como hit)"""
+            return (cache or response_cache).contains(namespace, (nombre, clave(*args, **kwargs)))
+
+        envoltura.en_cache = en_cache
+        return envoltura
+    return decorador
@@ -28,17 +28,55 @@ class Config:
     HTTP_TIMEOUT = 60  # segundos - mayor para archivos grandes del gobierno
     WEATHER_TIMEOUT = 15  # segundos
     CSV_DOWNLOAD_TIMEOUT = 90  # segundos para CSVs grandes del SESNSP
-    
+
+    # Pool de conexiones HTTP compartido por los conectores
+    HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "8"))
+    HTTP_KEEPALIVE_TIMEOUT = 30  # segundos que una conexión ociosa sigue abierta
+    HTTP_DNS_CACHE_TTL = 300     # segundos de caché DNS
+    HTTP_USER_AGENT = "RiskAnalysis/4.0 (+datos abiertos)"
+    # Si se define, todas las URLs externas se redirigen al servidor de fuentes falsas
+    # (servidor_fuentes_falsas.py) para pruebas de carga sin red
+    HTTP_REPLAY_URL: Optional[str] = os.getenv("HTTP_REPLAY_URL") or None
+
     # Configuración de cache
     CACHE_TTL_CRIME_DATA = 21600  # 6 horas para datos criminales
     CACHE_TTL_WEATHER = 1800      # 30 minutos para clima
     CACHE_TTL_SOCIOECONOMIC = 86400  # 24 horas para datos socioeconómicos
-    MAX_CACHE_SIZE = 200
+    CACHE_TTL_RISK_DATA = 3600    # 1 hora para datos combinados de los motores
+    CACHE_TTL_FALLBACK = 300      # 5 minutos para respuestas de respaldo
+    CACHE_TTL_BUSINESS_DENSITY = 2592000  # 30 días: el DENUE se actualiza una vez al año
+    MAX_CACHE_SIZE = 200          # entradas por espacio de nombres
     
     # Configuración de reintentos
     MAX_RETRIES = 3
     RETRY_DELAY = 2  # segundos
     
+    # Límite por host del API DENUE (densidad comercial por código SCIAN)
+    DENUE_MAX_CONCURRENCY = int(os.getenv("DENUE_MAX_CONCURRENCY", "4"))
+    DENUE_RATE_LIMIT = float(os.getenv("DENUE_RATE_LIMIT", "5"))  # solicitudes por segundo
+    DENUE_RATE_BURST = 5
+    DENUE_TIMEOUT = 45  # segundos
+    
+    # Pool para parsear HTML/RSS fuera del event loop ("process" o "thread")
+    PARSE_POOL_KIND = os.getenv("PARSE_POOL_KIND", "process")
+    PARSE_POOL_WORKERS = int(os.getenv("PARSE_POOL_WORKERS", "2"))
+    PARSE_CACHE_SIZE = 256  # documentos parseados que se recuerdan por hash
+    
+    # Presupuesto por solicitud del motor integrado y circuit breaker por fuente
+    INTEGRATED_DEADLINE = float(os.getenv("INTEGRATED_DEADLINE", "12"))  # segundos
+    CIRCUIT_BREAKER_THRESHOLD = 3  # fallos seguidos para abrir el circuito
+    CIRCUIT_BREAKER_RESET = 60     # segundos antes de probar de nuevo la fuente
+    
+    # Precalentamiento en segundo plano de los datos de cada almacén del catálogo
+    # Desactivado por omisión: llena las cachés de los conectores del motor integrado, que
+    # /consultar-riesgo no usa (ese lee SQLite y el motor científico); activarlo solo hace
+    # descargas periódicas a fuentes externas sin beneficio para los endpoints servidos
+    WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "false").lower() == "true"
+    WARMUP_INTERVAL = int(os.getenv("WARMUP_INTERVAL", "3600"))  # segundos entre rondas
+    WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "3"))  # municipios a la vez
+    WARMUP_INITIAL_DELAY = 5  # segundos tras el arranque antes de la primera ronda
+    
     # Logging detallado
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_API_CALLS = True
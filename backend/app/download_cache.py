@@ -0,0 +1,152 @@
+"""
+Caché en disco de descargas de datasets oficiales (CSV del SESNSP)
+Los archivos se guardan por contenido (SHA-256) bajo backend/data/downloads y cada URL
+se revalida con GET condicional (If-None-Match / If-Modified-Since): un 304 reutiliza el archivo.
+"""
+import json
+import logging
+import os
+import time
+from typing import Dict, NamedTuple, Optional
+
+import aiohttp
+
+from .config import Config
+from .http_client import descargar_a_archivo
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CACHE_DIR = os.getenv(
+    "DOWNLOAD_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'downloads')
+)
+
+
+class EntradaDescarga(NamedTuple):
+    """Archivo cacheado de una URL con sus validadores HTTP"""
+    url: str
+    sha256: str
+    ruta: str
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class DownloadCache:
+    """Almacén direccionado por contenido + índice url -> entrada en index.json"""
+
+    def __init__(self, directorio: str = DOWNLOAD_CACHE_DIR):
+        self.directorio = directorio
+        self.objetos = os.path.join(directorio, 'objects')
+        self.indice_path = os.path.join(directorio, 'index.json')
+        self._indice: Optional[Dict[str, Dict]] = None
+        self._stats = {'descargas': 0, 'no_modificados': 0, 'obsoletos_servidos': 0, 'bytes_descargados': 0}
+
+    def _ruta_objeto(self, sha256: str) -> str:
+        return os.path.join(self.objetos, sha256[:2], f"{sha256}.csv")
+
+    def _cargar_indice(self) -> Dict[str, Dict]:
+        if self._indice is None:
+            os.makedirs(self.objetos, exist_ok=True)
+            try:
+                with open(self.indice_path, encoding='utf-8') as f:
+                    self._indice = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._indice = {}
+        return self._indice
+
+    def _guardar_indice(self):
+        tmp = f"{self.indice_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._indice, f, indent=1)
+        os.replace(tmp, self.indice_path)
+
+    def entrada(self, url: str) -> Optional[EntradaDescarga]:
+        """Entrada cacheada de una URL si su archivo sigue en disco"""
+        datos = self._cargar_indice().get(url)
+        if datos is None:
+            return None
+        ruta = self._ruta_objeto(datos['sha256'])
+        if not os.path.exists(ruta):
+            return None
+        return EntradaDescarga(url, datos['sha256'], ruta, datos['size'], datos.get('etag'),
+                               datos.get('last_modified'), datos['fetched_at'])
+
+    def _eliminar_huerfano(self, sha256: str):
+        """Borrar un objeto que ninguna URL referencia ya"""
+        if any(d['sha256'] == sha256 for d in self._indice.values()):
+            return
+        try:
+            os.unlink(self._ruta_objeto(sha256))
+        except FileNotFoundError:
+            pass
+
+    async def obtener(self, session: aiohttp.ClientSession, url: str,
+                      timeout: float = Config.CSV_DOWNLOAD_TIMEOUT) -> Optional[EntradaDescarga]:
+        """
+        Archivo local actualizado de la URL: revalida la copia cacheada o descarga una nueva
+        Si el servidor falla y hay copia previa, se sirve la copia (obsoleta) en vez de nada.
+        """
+        indice = self._cargar_indice()
+        cacheada = self.entrada(url)
+        headers = {}
+        if cacheada is not None:
+            if cacheada.etag:
+                headers['If-None-Match'] = cacheada.etag
+            if cacheada.last_modified:
+                headers['If-Modified-Since'] = cacheada.last_modified
+
+        try:
+            descarga = await descargar_a_archivo(session, url, timeout=timeout,
+                                                 directorio=self.objetos, headers=headers)
+        except Exception as e:
+            if cacheada is None:
+                raise
+            logger.warning(f"⚠️ No se pudo revalidar {url} ({e}); usando copia en caché")
+            self._stats['obsoletos_servidos'] += 1
+            return cacheada
+
+        if descarga.status == 304 and cacheada is not None:
+            self._stats['no_modificados'] += 1
+            logger.info(f"♻️ {url} sin cambios (304); usando {cacheada.sha256[:12]}")
+            return cacheada
+
+        if descarga.status != 200:
+            if cacheada is not None:
+                logger.warning(f"⚠️ {url} respondió {descarga.status}; usando copia en caché")
+                self._stats['obsoletos_servidos'] += 1
+                return cacheada
+            return None
+
+        ruta = self._ruta_objeto(descarga.sha256)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Mismo contenido ya guardado (otra URL o republicación idéntica): se deduplica
+        os.replace(descarga.ruta, ruta)
+        self._stats['descargas'] += 1
+        self._stats['bytes_descargados'] += descarga.size
+
+        indice[url] = {
+            'sha256': descarga.sha256,
+            'size': descarga.size,
+            'etag': descarga.etag,
+            'last_modified': descarga.last_modified,
+            'fetched_at': time.time(),
+        }
+        if cacheada is not None and cacheada.sha256 != descarga.sha256:
+            self._eliminar_huerfano(cacheada.sha256)
+        self._guardar_indice()
+        return self.entrada(url)
+
+    def stats(self) -> Dict:
+        indice = self._cargar_indice()
+        return {
+            'directorio': self.directorio,
+            'urls': len(indice),
+            'bytes_en_disco': sum({d['sha256']: d['size'] for d in indice.values()}.values()),
+            **self._stats,
+        }
+
+
+# Instancia global compartida por los conectores
+download_cache = DownloadCache()
@@ -2,6 +2,7 @@
 Motor de riesgos mejorado que utiliza datos reales de múltiples fuentes
 """
 import asyncio
+from .cache import cached
 from .real_data_connectors import RealDataOrchestrator
 from .risk_calculator import (
     get_probabilidad_base_asis, calculate_ivf, calculate_iac, 
@@ -19,8 +20,6 @@ class EnhancedRiskEngine:
     
     def __init__(self):
         self.data_orchestrator = RealDataOrchestrator()
-        self.cache = {}  # Cache simple para evitar llamadas excesivas a APIs
-        self.cache_ttl = 3600  # 1 hora de cache
     
     async def calculate_enhanced_risk(self, address: str, ambito: str, scenarios: list, 
                                     security_measures: list, comments: str, 
@@ -74,30 +73,13 @@ class EnhancedRiskEngine:
                 }
             }
     
+    @cached('risk_data', respaldo=lambda r: r.get('crime_statistics', {}).get('data_source') == 'Fallback data')
     async def _get_cached_real_data(self, address: str, ambito: str, lat: float, lng: float) -> dict:
-        """Obtiene datos reales con sistema de cache"""
-        cache_key = f"{address}_{ambito}_{lat}_{lng}"
-        
-        # Verificar cache
-        if cache_key in self.cache:
-            cache_entry = self.cache[cache_key]
-            if (datetime.now().timestamp() - cache_entry['timestamp']) < self.cache_ttl:
-                logger.info("Usando datos del cache")
-                return cache_entry['data']
-        
-        # Obtener datos frescos
+        """Obtiene datos reales con la caché compartida (TTL y tamaño máximo de Config)"""
         logger.info("Obteniendo datos reales de APIs gubernamentales...")
-        real_data = await self.data_orchestrator.get_comprehensive_risk_data(
+        return await self.data_orchestrator.get_comprehensive_risk_data(
             address, ambito, lat, lng
         )
-        
-        # Guardar en cache
-        self.cache[cache_key] = {
-            'data': real_data,
-            'timestamp': datetime.now().timestamp()
-        }
-        
-        return real_data
     
     async def _calculate_scenario_risk_with_real_data(self, scenario: str, address: str, 
                                                     ambito: str, security_measures: list, 
@@ -10,10 +10,17 @@ import aiohttp
 from datetime import datetime, timedelta
 import re
 
+from .cache import cached
+from .http_client import get_session
+from .parse_pool import parse_pool
+
 class FiscaliasEstatalesConnector:
     """Conector para obtener datos de Fiscalías Estatales mexicanas"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Sesión HTTP inyectada; por defecto la compartida de la aplicación
+        self.session = session
+
         # URLs y endpoints de fiscalías estatales
         self.fiscalias_endpoints = {
             'estado_mexico': {
@@ -51,6 +58,7 @@ class FiscaliasEstatalesConnector:
             'violencia_familiar': ['violencia familiar', 'violencia doméstica']
         }
     
+    @cached('crime_data', respaldo=lambda r: r.get('fuente') == 'fallback_estimacion')
     async def get_state_crime_data(self, estado: str, municipio: str) -> Dict:
         """Obtiene datos de criminalidad específicos por estado y municipio"""
         print(f"🏛️ Consultando Fiscalía Estatal: {estado} - {municipio}")
@@ -78,18 +86,18 @@ class FiscaliasEstatalesConnector:
     async def _fetch_official_data(self, fiscalia_config: Dict, municipio: str) -> Optional[Dict]:
         """Intenta obtener datos oficiales via API de la fiscalía"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # Construir URL de consulta
-                api_url = f"{fiscalia_config['base_url']}estadisticas/municipio/{municipio}"
-                
-                async with session.get(api_url, timeout=30) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self._process_official_data(data, municipio, fiscalia_config)
-                    else:
-                        print(f"⚠️ API fiscalía no disponible: {response.status}")
-                        return None
-                        
+            session = get_session(self.session)
+            # Construir URL de consulta
+            api_url = f"{fiscalia_config['base_url']}estadisticas/municipio/{municipio}"
+            
+            async with session.get(api_url, timeout=30) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return self._process_official_data(data, municipio, fiscalia_config)
+                else:
+                    print(f"⚠️ API fiscalía no disponible: {response.status}")
+                    return None
+                    
         except Exception as e:
             print(f"⚠️ Error en API fiscalía: {e}")
             return None
@@ -108,29 +116,35 @@ class FiscaliasEstatalesConnector:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Scraping de página de estadísticas
-                stats_url = fiscalia_config['estadisticas_url']
-                
-                async with session.get(stats_url, timeout=45) as response:
-                    if response.status == 200:
-                        html_content = await response.text()
-                        crime_data['delitos'] = self._extract_crime_stats_from_html(html_content, municipio)
-                
-                # Scraping de carpetas de investigación
-                carpetas_url = fiscalia_config['carpetas_url']
-                
-                async with session.get(carpetas_url, timeout=45) as response:
-                    if response.status == 200:
-                        html_content = await response.text()
-                        crime_data['estadisticas_adicionales'] = self._extract_investigation_stats(html_content, municipio)
-                        
+            session = get_session(self.session)
+            # Scraping de página de estadísticas
+            stats_url = fiscalia_config['estadisticas_url']
+            
+            async with session.get(stats_url, timeout=45) as response:
+                if response.status == 200:
+                    html_content = await response.text()
+                    # Las regex sobre la página completa corren en el pool de parseo
+                    crime_data['delitos'] = await parse_pool.parsear(
+                        FiscaliasEstatalesConnector._extract_crime_stats_from_html, html_content, municipio
+                    )
+            
+            # Scraping de carpetas de investigación
+            carpetas_url = fiscalia_config['carpetas_url']
+            
+            async with session.get(carpetas_url, timeout=45) as response:
+                if response.status == 200:
+                    html_content = await response.text()
+                    crime_data['estadisticas_adicionales'] = await parse_pool.parsear(
+                        FiscaliasEstatalesConnector._extract_investigation_stats, html_content, municipio
+                    )
+                    
         except Exception as e:
             print(f"⚠️ Error en scraping: {e}")
         
         return crime_data
     
-    def _extract_crime_stats_from_html(self, html_content: str, municipio: str) -> Dict:
+    @staticmethod
+    def _extract_crime_stats_from_html(html_content: str, municipio: str) -> Dict:
         """Extrae estadísticas de criminalidad del HTML"""
         crime_stats = {}
         
@@ -153,7 +167,8 @@ class FiscaliasEstatalesConnector:
         
         return crime_stats
     
-    def _extract_investigation_stats(self, html_content: str, municipio: str) -> Dict:
+    @staticmethod
+    def _extract_investigation_stats(html_content: str, municipio: str) -> Dict:
         """Extrae estadísticas de carpetas de investigación"""
         investigation_stats = {
             'carpetas_abiertas': 0,
@@ -228,7 +243,8 @@ class FiscaliasEstatalesConnector:
         }
 
 # Función principal para uso en el sistema
-async def get_state_prosecutor_data(estado: str, municipio: str) -> Dict:
+async def get_state_prosecutor_data(estado: str, municipio: str,
+                                    session: Optional[aiohttp.ClientSession] = None) -> Dict:
     """Función principal para obtener datos de fiscalías estatales"""
-    connector = FiscaliasEstatalesConnector()
+    connector = FiscaliasEstatalesConnector(session=session)
     return await connector.get_state_crime_data(estado, municipio)
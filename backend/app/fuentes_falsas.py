@@ -0,0 +1,346 @@
+"""
+Servidor local que sustituye a las fuentes de gobierno y ONGs para pruebas sin red
+Con HTTP_REPLAY_URL apuntando a este servidor, los conectores piden
+{replay}/https/host/ruta y aquí se responde con:
+  - una grabación (cassette) de la respuesta real si existe (modo replay),
+  - o la respuesta real, que se graba en el momento (modo record),
+  - o datos sintéticos con el mismo formato: CSV del SESNSP, JSON de INEGI/DENUE,
+    HTML de fiscalías y ONGs, feeds RSS y clima de OpenWeatherMap.
+La latencia y la tasa de errores son configurables para pruebas de carga reproducibles.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+from datetime import datetime, timedelta
+from email.utils import format_datetime
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import aiohttp
+from aiohttp import web
+
+from .config import Config, MUNICIPIO_OFICIAL_MAPPING
+
+logger = logging.getLogger(__name__)
+
+CASSETTES_DIR = os.getenv(
+    "FAKE_SOURCES_CASSETTES_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'cassettes')
+)
+
+# Encabezados de la respuesta real que se conservan en la grabación
+ENCABEZADOS_GRABADOS = ('Content-Type', 'ETag', 'Last-Modified')
+
+COLUMNAS_DELITOS = {
+    'Robo total': 900, 'Robo a negocio': 120, 'Robo de vehículo': 180,
+    'Robo a casa habitación': 60, 'Lesiones': 350, 'Homicidio': 25,
+    'Secuestro': 3, 'Extorsión': 20,
+}
+
+
+class RespuestaFalsa(NamedTuple):
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+
+
+def _rng(url: str) -> random.Random:
+    """Generador determinista por URL: la misma consulta siempre da los mismos datos"""
+    return random.Random(hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+
+@lru_cache(maxsize=1)
+def _municipios() -> List[Tuple[str, str, str]]:
+    """(municipio, estado, clave INEGI) del mapeo oficial más los del catálogo de almacenes"""
+    municipios = {
+        nombre: (nombre, info['estado_oficial'], info['codigo_inegi'])
+        for nombre, info in MUNICIPIO_OFICIAL_MAPPING.items()
+    }
+    try:
+        from .warmup import ubicaciones_almacenes
+        for municipio, estado in ubicaciones_almacenes().values():
+            municipios.setdefault(municipio, (municipio, estado, ''))
+    except Exception as e:
+        logger.warning(f"⚠️ Catálogo de almacenes no disponible para el CSV sintético: {e}")
+    return sorted(municipios.values())
+
+
+class CassetteStore:
+    """Grabaciones en disco: <directorio>/<host>/<clave>.json con metadatos y <clave>.body"""
+
+    def __init__(self, directorio: str = CASSETTES_DIR):
+        self.directorio = directorio
+
+    def _rutas(self, metodo: str, url: str) -> Tuple[str, str]:
+        clave = hashlib.sha1(f"{metodo.upper()} {url}".encode('utf-8')).hexdigest()[:20]
+        carpeta = os.path.join(self.directorio, urlsplit(url).netloc)
+        return os.path.join(carpeta, f"{clave}.json"), os.path.join(carpeta, f"{clave}.body")
+
+    def cargar(self, metodo: str, url: str) -> Optional[RespuestaFalsa]:
+        ruta_meta, ruta_body = self._rutas(metodo, url)
+        if not (os.path.exists(ruta_meta) and os.path.exists(ruta_body)):
+            return None
+        with open(ruta_meta, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(ruta_body, 'rb') as f:
+            body = f.read()
+        return RespuestaFalsa(meta['status'], meta['headers'], body)
+
+    def guardar(self, metodo: str, url: str, respuesta: RespuestaFalsa):
+        ruta_meta, ruta_body = self._rutas(metodo, url)
+        os.makedirs(os.path.dirname(ruta_meta), exist_ok=True)
+        with open(ruta_body, 'wb') as f:
+            f.write(respuesta.body)
+        with open(ruta_meta, 'w', encoding='utf-8') as f:
+            json.dump({
+                'metodo': metodo.upper(),
+                'url': url,
+                'status': respuesta.status,
+                'headers': respuesta.headers,
+                'grabado': datetime.now().isoformat()
+            }, f, ensure_ascii=False, indent=2)
+        logger.info(f"📼 Grabado {metodo} {url} ({len(respuesta.body):,} bytes)")
+
+    def total(self) -> int:
+        if not os.path.isdir(self.directorio):
+            return 0
+        return sum(
+            1 for _, _, archivos in os.walk(self.directorio) for a in archivos if a.endswith('.json')
+        )
+
+
+# ---------------------------------------------------------------------------
+# Respuestas sintéticas con el formato de cada fuente
+# ---------------------------------------------------------------------------
+
+def _texto(body: str, content_type: str) -> RespuestaFalsa:
+    return RespuestaFalsa(200, {'Content-Type': content_type}, body.encode('utf-8'))
+
+
+def csv_sesnsp(url: str) -> RespuestaFalsa:
+    """CSV municipal del SESNSP con una fila por municipio conocido"""
+    rng = _rng(url)
+    lineas = [','.join(['Año', 'Clave_Ent', 'Entidad', 'Cve. Municipio', 'Municipio'] + list(COLUMNAS_DELITOS))]
+    for municipio, estado, clave in _municipios():
+        valores = [str(int(base * rng.uniform(0.3, 1.7))) for base in COLUMNAS_DELITOS.values()]
+        lineas.append(','.join(['2024', clave[:2], f'"{estado}"', clave, f'"{municipio}"'] + valores))
+    return _texto('\n'.join(lineas) + '\n', 'text/csv; charset=utf-8')
+
+
+def json_inegi_indicador(url: str) -> RespuestaFalsa:
+    """Serie del API de indicadores de INEGI con observaciones trimestrales"""
+    rng = _rng(url)
+    base = rng.uniform(2.0, 12.0)
+    observaciones = [
+        {'TIME_PERIOD': f"{anio}/0{trimestre}", 'OBS_VALUE': f"{base * rng.uniform(0.9, 1.1):.3f}"}
+        for anio in (2023, 2024) for trimestre in (1, 2, 3, 4)
+    ]
+    return _texto(json.dumps({'Series': [{'OBSERVATIONS': observaciones}]}), 'application/json')
+
+
+def json_denue(url: str) -> RespuestaFalsa:
+    """Lista de establecimientos del DENUE"""
+    rng = _rng(url)
+    establecimientos = [
+        {'Id': str(rng.randint(10 ** 6, 10 ** 7)), 'Nombre': f"Establecimiento {i + 1}"}
+        for i in range(rng.randint(5, 80))
+    ]
+    return _texto(json.dumps(establecimientos, ensure_ascii=False), 'application/json')
+
+
+def json_clima(url: str) -> RespuestaFalsa:
+    """Clima actual con la forma de OpenWeatherMap /weather"""
+    rng = _rng(url)
+    return _texto(json.dumps({
+        'main': {'temp': round(rng.uniform(10, 32), 1), 'humidity': rng.randint(20, 90)},
+        'visibility': rng.choice([4000, 7000, 10000]),
+        'weather': [{'description': rng.choice(['cielo claro', 'nubes dispersas', 'lluvia ligera'])}]
+    }, ensure_ascii=False), 'application/json')
+
+
+def html_fiscalia(url: str) -> RespuestaFalsa:
+    """Página de estadísticas o de carpetas de investigación de una fiscalía estatal"""
+    rng = _rng(url)
+    filas = ''.join(
+        f"<tr><td>{delito}</td><td>{rng.randint(10, 900)}</td></tr>"
+        for delito in ('Robo a negocio', 'Extorsión', 'Homicidio', 'Secuestro', 'Fraude')
+    )
+    carpetas = rng.randint(2000, 20000)
+    body = (
+        "<html><head><title>Estadísticas</title></head><body>"
+        f"<h1>Incidencia delictiva</h1><table>{filas}</table>"
+        f"<p>Carpetas de investigación iniciadas: {carpetas}</p>"
+        f"<p>Casos resueltos: {int(carpetas * rng.uniform(0.05, 0.3))}</p>"
+        "</body></html>"
+    )
+    return _texto(body, 'text/html; charset=utf-8')
+
+
+def html_ong(url: str) -> RespuestaFalsa:
+    """Página de reportes de una ONG con párrafos por indicador y estado"""
+    rng = _rng(url)
+    estados = sorted({estado for _, estado, _ in _municipios()})
+    indicadores = ('índice de seguridad', 'percepción de inseguridad', 'efectividad policial',
+                   'impunidad', 'violencia urbana', 'crimen organizado')
+    parrafos = ''.join(
+        f"<p>El {indicador} en {estado} se ubicó en {rng.uniform(20, 90):.1f} puntos.</p>"
+        for estado in estados for indicador in indicadores
+    )
+    return _texto(f"<html><body><h1>Reportes</h1>{parrafos}</body></html>", 'text/html; charset=utf-8')
+
+
+def rss_ong(url: str) -> RespuestaFalsa:
+    """Feed RSS 2.0 con reportes recientes de seguridad por municipio"""
+    rng = _rng(url)
+    host = urlsplit(url).netloc
+    # Fechas al día: el feed no cambia entre consultas del mismo día (ETag estable)
+    ahora = datetime.now().astimezone().replace(hour=0, minute=0, second=0, microsecond=0)
+    municipios = _municipios()
+    items = []
+    for i, (municipio, estado, _) in enumerate(rng.sample(municipios, min(10, len(municipios)))):
+        fecha = format_datetime(ahora - timedelta(days=rng.randint(0, 40)))
+        items.append(
+            f"<item><title>Seguridad en {municipio}, {estado}: reporte {i + 1}</title>"
+            f"<link>https://{host}/reporte-{i + 1}/</link><pubDate>{fecha}</pubDate>"
+            f"<description>Análisis de criminalidad y robo a negocio en {municipio}.</description></item>"
+        )
+    body = (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>{host}</title><link>https://{host}/</link><description>Reportes</description>"
+        f"{''.join(items)}</channel></rss>"
+    )
+    return _texto(body, 'application/rss+xml; charset=utf-8')
+
+
+def respuesta_sintetica(url: str) -> Optional[RespuestaFalsa]:
+    """Respuesta sintética según host y ruta; None si la fuente no se simula (404)"""
+    partes = urlsplit(url)
+    host, ruta = partes.netloc, partes.path
+    if host.endswith('gob.mx') and ruta.endswith('.csv'):
+        return csv_sesnsp(url)
+    if 'inegi.org.mx' in host and '/INDICATOR/' in ruta:
+        return json_inegi_indicador(url)
+    if 'inegi.org.mx' in host and '/denue/' in ruta:
+        return json_denue(url)
+    if 'openweathermap.org' in host and ruta.endswith('/weather'):
+        return json_clima(url)
+    # Las APIs JSON de fiscalías y ONGs no se simulan: los conectores usan el scraping
+    if '/api/' in ruta:
+        return None
+    if 'fiscal' in host or 'pgjem' in host:
+        return html_fiscalia(url)
+    if ruta.rstrip('/').endswith('/feed') or ruta == '/feed/':
+        return rss_ong(url)
+    if any(h in host for h in ('mexicoevalua', 'insyde', 'onc.org', 'causaencomun', 'movimientoporjusticia')):
+        return html_ong(url)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Servidor
+# ---------------------------------------------------------------------------
+
+class FuentesFalsas:
+    """Aplicación aiohttp con replay/record, latencia artificial y errores inyectados"""
+
+    def __init__(self, modo: str = 'replay', directorio: str = CASSETTES_DIR,
+                 latencia: float = 0.0, jitter: float = 0.0, tasa_error: float = 0.0,
+                 semilla: Optional[int] = None):
+        if modo not in ('replay', 'record'):
+            raise ValueError(f"Modo no soportado: {modo}")
+        self.modo = modo
+        self.cassettes = CassetteStore(directorio)
+        self.latencia = latencia      # segundos
+        self.jitter = jitter          # segundos, uniforme alrededor de la latencia
+        self.tasa_error = tasa_error  # fracción de solicitudes que responden 503
+        self._rng = random.Random(semilla)
+        self._cliente: Optional[aiohttp.ClientSession] = None
+        self.stats = {'solicitudes': 0, 'replay': 0, 'grabadas': 0, 'sinteticas': 0,
+                      'no_modificadas': 0, 'errores_inyectados': 0, 'no_encontradas': 0}
+
+    async def _esperar(self):
+        if self.latencia or self.jitter:
+            retraso = self._rng.uniform(self.latencia - self.jitter, self.latencia + self.jitter)
+            await asyncio.sleep(max(0.0, retraso))
+
+    async def _grabar(self, metodo: str, url: str) -> Optional[RespuestaFalsa]:
+        """Consultar la fuente real y guardar la respuesta (solo modo record)"""
+        if self._cliente is None or self._cliente.closed:
+            self._cliente = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=Config.CSV_DOWNLOAD_TIMEOUT),
+                headers={'User-Agent': Config.HTTP_USER_AGENT}
+            )
+        try:
+            async with self._cliente.request(metodo, url) as response:
+                body = await response.read()
+                headers = {h: response.headers[h] for h in ENCABEZADOS_GRABADOS if h in response.headers}
+                respuesta = RespuestaFalsa(response.status, headers, body)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo grabar {url}: {e}")
+            return None
+        self.cassettes.guardar(metodo, url, respuesta)
+        self.stats['grabadas'] += 1
+        return respuesta
+
+    async def manejar(self, request: web.Request) -> web.StreamResponse:
+        self.stats['solicitudes'] += 1
+        url = f"{request.match_info['scheme']}://{request.match_info['host']}/{request.match_info['ruta']}"
+        if request.query_string:
+            url = f"{url}?{request.query_string}"
+
+        await self._esperar()
+        if self._rng.random() < self.tasa_error:
+            self.stats['errores_inyectados'] += 1
+            return web.Response(status=503, text='Error inyectado por el servidor de fuentes falsas')
+
+        respuesta = None
+        if self.modo == 'record':
+            respuesta = await self._grabar(request.method, url)
+        if respuesta is None:
+            respuesta = self.cassettes.cargar(request.method, url)
+            if respuesta is not None:
+                self.stats['replay'] += 1
+        if respuesta is None:
+            respuesta = respuesta_sintetica(url)
+            if respuesta is not None:
+                self.stats['sinteticas'] += 1
+        if respuesta is None:
+            self.stats['no_encontradas'] += 1
+            return web.Response(status=404, text=f"Sin grabación ni datos sintéticos para {url}")
+
+        headers = dict(respuesta.headers)
+        headers.setdefault('ETag', f'"{hashlib.sha256(respuesta.body).hexdigest()[:32]}"')
+        # Validación condicional como la de gob.mx, para ejercitar la caché de descargas
+        if respuesta.status == 200 and request.headers.get('If-None-Match') == headers['ETag']:
+            self.stats['no_modificadas'] += 1
+            return web.Response(status=304, headers={'ETag': headers['ETag']})
+        content_type = headers.pop('Content-Type', 'application/octet-stream')
+        tipo, _, parametros = content_type.partition(';')
+        charset = parse_qs(parametros.strip()).get('charset', [None])[0]
+        return web.Response(status=respuesta.status, body=respuesta.body, headers=headers,
+                            content_type=tipo.strip(), charset=charset)
+
+    async def estadisticas(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'modo': self.modo,
+            'latencia_ms': self.latencia * 1000,
+            'jitter_ms': self.jitter * 1000,
+            'tasa_error': self.tasa_error,
+            'cassettes': self.cassettes.total(),
+            **self.stats
+        })
+
+    async def _cerrar(self, app: web.Application):
+        if self._cliente is not None and not self._cliente.closed:
+            await self._cliente.close()
+
+    def crear_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/__stats', self.estadisticas)
+        app.router.add_route('*', '/{scheme:https?}/{host}/{ruta:.*}', self.manejar)
+        app.on_cleanup.append(self._cerrar)
+        return app
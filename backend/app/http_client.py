@@ -0,0 +1,202 @@
+"""
+Registro de sesiones HTTP compartidas para los conectores externos
+Una sola ClientSession por pool con conexiones keep-alive, límite por host y caché DNS,
+creada al arrancar la aplicación y cerrada al apagarla.
+Incluye la descarga en streaming a disco para los CSV grandes del gobierno y la
+redirección opcional de todas las URLs al servidor local de fuentes falsas (HTTP_REPLAY_URL).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def reescribir_url(url: str, replay_url: str) -> str:
+    """https://host/ruta?q -> {replay_url}/https/host/ruta?q (el servidor falso recupera la URL original)"""
+    partes = urlsplit(str(url))
+    if not partes.netloc or str(url).startswith(replay_url):
+        return url
+    destino = f"{replay_url.rstrip('/')}/{partes.scheme}/{partes.netloc}{partes.path or '/'}"
+    return f"{destino}?{partes.query}" if partes.query else destino
+
+
+class SesionReplay:
+    """Envoltura de una ClientSession que manda cada solicitud al servidor de fuentes falsas"""
+
+    def __init__(self, session: aiohttp.ClientSession, replay_url: str):
+        self._session = session
+        self.replay_url = replay_url
+
+    def request(self, method: str, url: str, **kwargs):
+        return self._session.request(method, reescribir_url(url, self.replay_url), **kwargs)
+
+    def get(self, url: str, **kwargs):
+        return self._session.get(reescribir_url(url, self.replay_url), **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self._session.post(reescribir_url(url, self.replay_url), **kwargs)
+
+    def __getattr__(self, nombre):
+        # closed, close(), connector... se delegan a la sesión real
+        return getattr(self._session, nombre)
+
+
+class HTTPClientRegistry:
+    """Sesiones aiohttp de larga vida, una por nombre de pool"""
+
+    def __init__(self, limit: int = Config.HTTP_POOL_LIMIT,
+                 limit_per_host: int = Config.HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = Config.HTTP_KEEPALIVE_TIMEOUT,
+                 ttl_dns_cache: int = Config.HTTP_DNS_CACHE_TTL,
+                 replay_url: Optional[str] = Config.HTTP_REPLAY_URL):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.replay_url = replay_url
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        # Sesiones reemplazadas cuyo loop sigue abierto sin ejecutarse: se reintentan en shutdown
+        self._pendientes: List[Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = []
+        self._creadas = 0
+        self.started = False
+
+    def _cerrar(self, session: aiohttp.ClientSession, loop: Optional[asyncio.AbstractEventLoop]) -> bool:
+        """Cerrar una sesión desde el loop actual; False si hay que esperar a que su loop corra"""
+        if session.closed:
+            return True
+        actual = asyncio.get_running_loop()
+        if loop is None or loop is actual or loop.is_closed():
+            # Con su loop terminado (asyncio.run) no hay transportes que esperar: solo se marca cerrada
+            actual.create_task(session.close())
+        elif loop.is_running():
+            # Su loop sigue vivo en otro hilo: cerrarla allí
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            return False
+        return True
+
+    def _crear_sesion(self, nombre: str) -> aiohttp.ClientSession:
+        anterior = self._sessions.get(nombre)
+        if anterior is not None and not self._cerrar(anterior, self._loops.get(nombre)):
+            self._pendientes.append((anterior, self._loops[nombre]))
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.ttl_dns_cache,
+            use_dns_cache=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=Config.HTTP_TIMEOUT),
+            headers={'User-Agent': Config.HTTP_USER_AGENT},
+        )
+        self._sessions[nombre] = session
+        self._loops[nombre] = asyncio.get_running_loop()
+        self._creadas += 1
+        logger.info(f"🔌 Sesión HTTP '{nombre}' creada (límite {self.limit}, por host {self.limit_per_host})")
+        if self.replay_url:
+            logger.info(f"🎞️ Solicitudes externas redirigidas a {self.replay_url}")
+        return session
+
+    async def startup(self):
+        """Crear la sesión por defecto; se llama desde el evento startup de FastAPI"""
+        self.session()
+        self.started = True
+
+    def session(self, nombre: str = 'default') -> aiohttp.ClientSession:
+        """Sesión compartida del pool; se crea al primer uso si la aplicación no la inició"""
+        session = self._sessions.get(nombre)
+        if session is None or session.closed or self._loops.get(nombre) is not asyncio.get_running_loop():
+            # Fuera del servidor (scripts con asyncio.run) cada loop necesita su propia sesión
+            session = self._crear_sesion(nombre)
+        if self.replay_url:
+            return SesionReplay(session, self.replay_url)
+        return session
+
+    async def shutdown(self):
+        """Cerrar todas las sesiones; se llama desde el evento shutdown de FastAPI"""
+        actual = asyncio.get_running_loop()
+        for nombre, session in list(self._sessions.items()):
+            if self._loops.get(nombre) is actual:
+                await session.close()
+            elif not self._cerrar(session, self._loops.get(nombre)):
+                logger.warning(f"⚠️ Sesión HTTP '{nombre}' sin cerrar: su loop no está en ejecución")
+        for session, loop in self._pendientes:
+            if not self._cerrar(session, loop):
+                logger.warning("⚠️ Sesión HTTP reemplazada sin cerrar: su loop no está en ejecución")
+        self._pendientes.clear()
+        self._sessions.clear()
+        self._loops.clear()
+        self.started = False
+        logger.info("🔌 Sesiones HTTP cerradas")
+
+    def stats(self) -> Dict:
+        return {
+            'started': self.started,
+            'pools': sorted(self._sessions),
+            'sessions_created': self._creadas,
+            'limit': self.limit,
+            'limit_per_host': self.limit_per_host,
+            'keepalive_timeout': self.keepalive_timeout,
+            'ttl_dns_cache': self.ttl_dns_cache,
+            'replay_url': self.replay_url,
+        }
+
+
+# Instancia global usada por los conectores y el servidor
+http_clients = HTTPClientRegistry()
+
+
+def get_session(session: Optional[aiohttp.ClientSession] = None) -> aiohttp.ClientSession:
+    """Sesión inyectada si se dio una; si no, la compartida del registro global"""
+    return session if session is not None else http_clients.session()
+
+
+class Descarga(NamedTuple):
+    """Resultado de una descarga a disco; ruta es None si el status no es 200"""
+    status: int
+    ruta: Optional[str]
+    size: int
+    sha256: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+async def descargar_a_archivo(session: aiohttp.ClientSession, url: str,
+                              timeout: float = Config.CSV_DOWNLOAD_TIMEOUT,
+                              chunk_size: int = 1 << 16, directorio: Optional[str] = None,
+                              **kwargs) -> Descarga:
+    """
+    Descargar una respuesta por bloques a un archivo temporal sin cargarla en memoria
+    El SHA-256 se calcula mientras se escribe. El llamador borra o mueve el archivo.
+    """
+    async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as response:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status != 200:
+            return Descarga(response.status, None, 0, None, etag, last_modified)
+        fd, ruta = tempfile.mkstemp(suffix='.csv', prefix='descarga_', dir=directorio)
+        sha = hashlib.sha256()
+        total = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    sha.update(chunk)
+                    total += len(chunk)
+        except BaseException:
+            os.unlink(ruta)
+            raise
+        logger.info(f"⬇️ {url} -> {ruta} ({total:,} bytes)")
+        return Descarga(response.status, ruta, total, sha.hexdigest(), etag, last_modified)
@@ -8,11 +8,19 @@ from typing import Dict, List, Optional
 import asyncio
 import aiohttp
 from datetime import datetime
+from urllib.parse import urlsplit
+
+from .cache import cached
+from .config import Config
+from .http_client import get_session
+from .rate_limit import get_limitador
 
 class INEGIExpandedConnector:
     """Conector expandido para datos socioeconómicos detallados de INEGI"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Sesión HTTP inyectada; por defecto la compartida de la aplicación
+        self.session = session
         self.base_url = "https://www.inegi.org.mx/app/api/indicadores/desarrolladores/jsonxml/INDICATOR/"
         self.denue_base_url = "https://www.inegi.org.mx/app/api/denue/v1/Buscar/"
         
@@ -37,6 +45,7 @@ class INEGIExpandedConnector:
             'centros_comerciales': '531',  # Servicios inmobiliarios
         }
     
+    @cached('socioeconomic', respaldo=lambda r: not any(v is not None for v in r['indicadores'].values()))
     async def get_socioeconomic_data(self, codigo_municipio: str) -> Dict:
         """Obtiene datos socioeconómicos completos por municipio"""
         print(f"📊 Obteniendo datos socioeconómicos INEGI para municipio: {codigo_municipio}")
@@ -50,26 +59,28 @@ class INEGIExpandedConnector:
         }
         
         # Obtener cada indicador socioeconómico
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for nombre_indicador, codigo_indicador in self.indicadores_riesgo.items():
-                task = self._get_indicador_data(session, codigo_indicador, codigo_municipio, nombre_indicador)
-                tasks.append(task)
-            
-            resultados = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            for resultado in resultados:
-                if isinstance(resultado, dict) and 'indicador' in resultado:
-                    socioeconomic_data['indicadores'][resultado['indicador']] = resultado['valor']
-        
-        # Obtener densidad comercial por tipo de negocio
-        for tipo_negocio, scian_code in self.scian_codes.items():
-            try:
-                densidad = await self._get_business_density(codigo_municipio, scian_code)
-                socioeconomic_data['densidad_comercial'][tipo_negocio] = densidad
-            except Exception as e:
-                print(f"⚠️ Error obteniendo densidad para {tipo_negocio}: {e}")
-                socioeconomic_data['densidad_comercial'][tipo_negocio] = None
+        session = get_session(self.session)
+        tasks = []
+        for nombre_indicador, codigo_indicador in self.indicadores_riesgo.items():
+            task = self._get_indicador_data(session, codigo_indicador, codigo_municipio, nombre_indicador)
+            tasks.append(task)
+        
+        resultados = await asyncio.gather(*tasks, return_exceptions=True)
+        
+        for resultado in resultados:
+            if isinstance(resultado, dict) and 'indicador' in resultado:
+                socioeconomic_data['indicadores'][resultado['indicador']] = resultado['valor']
+        
+        # Obtener densidad comercial por tipo de negocio (en paralelo, limitado por host)
+        densidades = await asyncio.gather(
+            *(self._get_business_density(codigo_municipio, scian_code) for scian_code in self.scian_codes.values()),
+            return_exceptions=True
+        )
+        for tipo_negocio, densidad in zip(self.scian_codes, densidades):
+            if isinstance(densidad, Exception):
+                print(f"⚠️ Error obteniendo densidad para {tipo_negocio}: {densidad}")
+                densidad = None
+            socioeconomic_data['densidad_comercial'][tipo_negocio] = densidad
         
         # Calcular contexto económico para análisis de riesgo
         socioeconomic_data['contexto_economico'] = self._calculate_economic_context(socioeconomic_data)
@@ -103,25 +114,27 @@ class INEGIExpandedConnector:
             print(f"⚠️ Error obteniendo {nombre_indicador}: {e}")
             return {'indicador': nombre_indicador, 'valor': None}
     
+    @cached('business_density', respaldo=lambda densidad: densidad is None)
     async def _get_business_density(self, codigo_municipio: str, scian_code: str) -> Optional[int]:
-        """Obtiene densidad de negocios por código SCIAN usando DENUE"""
+        """Obtiene densidad de negocios por código SCIAN usando DENUE (caché por municipio y SCIAN)"""
         try:
             # URL para consultar DENUE API
             url = f"{self.denue_base_url}Nombre/todos/Entidad//Municipio/{codigo_municipio}/Actividad/{scian_code}/"
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, timeout=45) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        if isinstance(data, list):
-                            return len(data)  # Número de establecimientos
-                        elif isinstance(data, dict) and 'total' in data:
-                            return data['total']
-                        else:
-                            return 0
+            session = get_session(self.session)
+            async with get_limitador(urlsplit(self.denue_base_url).netloc), \
+                    session.get(url, timeout=Config.DENUE_TIMEOUT) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    
+                    if isinstance(data, list):
+                        return len(data)  # Número de establecimientos
+                    elif isinstance(data, dict) and 'total' in data:
+                        return data['total']
                     else:
-                        return None
+                        return 0
+                else:
+                    return None
                         
         except Exception as e:
             print(f"⚠️ Error consultando DENUE para SCIAN {scian_code}: {e}")
@@ -184,7 +197,8 @@ class INEGIExpandedConnector:
         return context
 
 # Función helper para uso en el motor de riesgo
-async def get_enhanced_municipal_data(codigo_municipio: str) -> Dict:
+async def get_enhanced_municipal_data(codigo_municipio: str,
+                                      session: Optional[aiohttp.ClientSession] = None) -> Dict:
     """Función principal para obtener datos municipales expandidos"""
-    connector = INEGIExpandedConnector()
+    connector = INEGIExpandedConnector(session=session)
     return await connector.get_socioeconomic_data(codigo_municipio)
@@ -6,6 +6,11 @@ from typing import Dict, List, Optional
 from datetime import datetime
 import json
 
+import aiohttp
+
+from .config import Config
+from .resilience import CircuitoAbierto, Deadline, llamar_con_presupuesto
+
 # Importar todos los conectores expandidos
 from .real_data_connectors import GobiernoDataConnector
 from .inegi_expanded_connector import get_enhanced_municipal_data
@@ -15,8 +20,19 @@ from .ong_security_connector import get_ong_security_analysis
 class IntegratedRiskEngine:
     """Motor de riesgo integrado con múltiples fuentes de datos oficiales"""
     
-    def __init__(self):
-        self.gobierno_connector = GobiernoDataConnector()
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None,
+                 deadline: float = Config.INTEGRATED_DEADLINE):
+        # Sesión HTTP para los conectores async (None = la compartida de la aplicación)
+        self.session = session
+        self.gobierno_connector = GobiernoDataConnector(session=session)
+        # Tiempo total por solicitud; cada fuente recibe una fracción (corren en paralelo)
+        self.deadline = deadline
+        self.source_budgets = {
+            'sesnsp_federal': 1.0,       # CSV grande: puede usar todo el presupuesto
+            'fiscalia_estatal': 0.6,
+            'inegi_socioeconomico': 0.6,
+            'ong_analysis': 0.5
+        }
         
         # Pesos para diferentes fuentes de datos
         self.source_weights = {
@@ -59,23 +75,21 @@ class IntegratedRiskEngine:
             'datos_recopilados': {},
             'analisis_riesgo': {},
             'recomendaciones': [],
-            'nivel_confianza': 0.0
+            'nivel_confianza': 0.0,
+            'fuentes_omitidas': []
         }
         
         # Obtener datos de todas las fuentes de forma asíncrona
         print("📡 Consultando fuentes de datos...")
+        deadline = Deadline(self.deadline)
         
-        tasks = [
-            self._get_federal_crime_data(municipio, estado),
-            self._get_state_prosecutor_data(municipio, estado),
-            self._get_socioeconomic_data(municipio),
-            self._get_ong_analysis(municipio, estado)
-        ]
+        # Ejecutar consultas en paralelo, cada una con su parte del presupuesto
+        results = await asyncio.gather(*(
+            self._consultar_fuente(nombre, llamada, deadline, risk_result['fuentes_omitidas'])
+            for nombre, llamada in self._fuentes(municipio, estado).items()
+        ))
         
-        # Ejecutar consultas en paralelo
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        # Procesar resultados
+        # Procesar resultados (None = fuente omitida)
         federal_data, state_data, socio_data, ong_data = results
         
         # Agregar datos exitosos al resultado
@@ -110,47 +124,72 @@ class IntegratedRiskEngine:
             len(risk_result['fuentes_consultadas'])
         )
         
+        risk_result['presupuesto'] = {
+            'deadline_segundos': self.deadline,
+            'segundos_usados': round(deadline.transcurrido(), 3)
+        }
+        
         print(f"✅ Análisis completado. Fuentes consultadas: {len(risk_result['fuentes_consultadas'])}")
         print(f"🎯 Nivel de confianza: {risk_result['nivel_confianza']:.1%}")
         
         return risk_result
     
-    async def _get_federal_crime_data(self, municipio: str, estado: str) -> Dict:
-        """Obtiene datos federales de criminalidad"""
+    def _fuentes(self, municipio: str, estado: str) -> Dict:
+        """Consultas de cada fuente, en el orden federal, estatal, socioeconómico, ONG"""
+        return {
+            'sesnsp_federal': lambda: self._get_federal_crime_data(municipio, estado),
+            'fiscalia_estatal': lambda: self._get_state_prosecutor_data(municipio, estado),
+            'inegi_socioeconomico': lambda: self._get_socioeconomic_data(municipio),
+            'ong_analysis': lambda: self._get_ong_analysis(municipio, estado)
+        }
+    
+    async def precargar_fuentes(self, municipio: str, estado: str) -> Dict[str, bool]:
+        """Consultar todas las fuentes (y llenar sus cachés) sin calcular riesgo; fuente -> éxito"""
+        deadline = Deadline(self.deadline)
+        omitidas: List[Dict] = []
+        fuentes = self._fuentes(municipio, estado)
+        results = await asyncio.gather(*(
+            self._consultar_fuente(nombre, llamada, deadline, omitidas)
+            for nombre, llamada in fuentes.items()
+        ))
+        return {nombre: isinstance(data, dict) and 'error' not in data for nombre, data in zip(fuentes, results)}
+    
+    async def _consultar_fuente(self, nombre: str, llamada, deadline: Deadline,
+                                omitidas: List[Dict]) -> Optional[Dict]:
+        """Consulta una fuente con su presupuesto, circuit breaker y reintentos; None si se omite"""
         try:
-            return await self.gobierno_connector.get_crime_data_by_municipio(municipio, estado)
+            return await llamar_con_presupuesto(nombre, llamada, deadline.sub(self.source_budgets[nombre]))
+        except CircuitoAbierto:
+            print(f"⏭️ {nombre} omitida: circuito abierto por fallos repetidos")
+            omitidas.append({'fuente': nombre, 'motivo': 'circuito_abierto'})
+        except asyncio.TimeoutError:
+            print(f"⏱️ {nombre} omitida: se agotó su presupuesto de tiempo")
+            omitidas.append({'fuente': nombre, 'motivo': 'deadline'})
         except Exception as e:
-            print(f"⚠️ Error obteniendo datos federales: {e}")
-            return {'error': str(e)}
+            print(f"⚠️ Error obteniendo {nombre}: {e}")
+            omitidas.append({'fuente': nombre, 'motivo': 'error', 'detalle': str(e)})
+        return None
+    
+    async def _get_federal_crime_data(self, municipio: str, estado: str) -> Dict:
+        """Obtiene datos federales de criminalidad"""
+        return await self.gobierno_connector.get_crime_data_by_municipio(municipio, estado)
     
     async def _get_state_prosecutor_data(self, municipio: str, estado: str) -> Dict:
         """Obtiene datos de fiscalía estatal"""
-        try:
-            return await get_state_prosecutor_data(estado, municipio)
-        except Exception as e:
-            print(f"⚠️ Error obteniendo datos estatales: {e}")
-            return {'error': str(e)}
+        return await get_state_prosecutor_data(estado, municipio, session=self.session)
     
     async def _get_socioeconomic_data(self, municipio: str) -> Dict:
         """Obtiene datos socioeconómicos de INEGI"""
-        try:
-            # Buscar código INEGI del municipio
-            codigo_municipio = self._get_inegi_code(municipio)
-            if codigo_municipio:
-                return await get_enhanced_municipal_data(codigo_municipio)
-            else:
-                return {'error': 'Código INEGI no encontrado'}
-        except Exception as e:
-            print(f"⚠️ Error obteniendo datos socioeconómicos: {e}")
-            return {'error': str(e)}
+        # Buscar código INEGI del municipio
+        codigo_municipio = self._get_inegi_code(municipio)
+        if codigo_municipio:
+            return await get_enhanced_municipal_data(codigo_municipio, session=self.session)
+        # Sin código no hay consulta: no cuenta como fallo de la fuente
+        return {'error': 'Código INEGI no encontrado'}
     
     async def _get_ong_analysis(self, municipio: str, estado: str) -> Dict:
         """Obtiene análisis de ONGs"""
-        try:
-            return await get_ong_security_analysis(municipio, estado)
-        except Exception as e:
-            print(f"⚠️ Error obteniendo análisis ONGs: {e}")
-            return {'error': str(e)}
+        return await get_ong_security_analysis(municipio, estado, session=self.session)
     
     def _get_inegi_code(self, municipio: str) -> Optional[str]:
         """Obtiene código INEGI del municipio"""
@@ -267,7 +306,10 @@ class IntegratedRiskEngine:
         
         if 'estadisticas_adicionales' in state_data:
             stats = state_data['estadisticas_adicionales']
-            tasa_resolucion = stats.get('tasa_resolucion', 50)
+            # Las fiscalías sin estadística publicada reportan None: se trata como desconocida
+            tasa_resolucion = stats.get('tasa_resolucion')
+            if tasa_resolucion is None:
+                tasa_resolucion = 50
             
             if tasa_resolucion < 30:
                 impact['adjustment'] += 1.0
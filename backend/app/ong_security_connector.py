@@ -11,10 +11,17 @@ from datetime import datetime, timedelta
 import feedparser
 from bs4 import BeautifulSoup
 
+from .cache import cached
+from .http_client import get_session
+from .parse_pool import parse_pool
+
 class ONGSecurityConnector:
     """Conector para obtener datos de ONGs especializadas en seguridad"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Sesión HTTP inyectada; por defecto la compartida de la aplicación
+        self.session = session
+
         # Configuración de ONGs mexicanas especializadas
         self.ong_sources = {
             'mexico_evalua': {
@@ -71,6 +78,7 @@ class ONGSecurityConnector:
             'sistema de justicia'
         ]
     
+    @cached('crime_data', respaldo=lambda r: not r['fuentes_consultadas'])
     async def get_ong_security_data(self, municipio: str, estado: str) -> Dict:
         """Obtiene datos de seguridad de múltiples ONGs"""
         print(f"🏛️ Consultando ONGs de seguridad para {municipio}, {estado}")
@@ -136,22 +144,22 @@ class ONGSecurityConnector:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                # Intentar API endpoint si existe
-                api_data = await self._try_api_endpoint(session, ong_config, municipio, estado)
-                if api_data:
-                    ong_result.update(api_data)
-                
-                # Obtener reportes recientes via RSS
-                rss_data = await self._fetch_rss_reports(session, ong_config, municipio, estado)
-                if rss_data:
-                    ong_result['reportes'].extend(rss_data)
+            session = get_session(self.session)
+            # Intentar API endpoint si existe
+            api_data = await self._try_api_endpoint(session, ong_config, municipio, estado)
+            if api_data:
+                ong_result.update(api_data)
+            
+            # Obtener reportes recientes via RSS
+            rss_data = await self._fetch_rss_reports(session, ong_config, municipio, estado)
+            if rss_data:
+                ong_result['reportes'].extend(rss_data)
+            
+            # Web scraping de reportes específicos
+            scraped_data = await self._scrape_reports(session, ong_config, municipio, estado)
+            if scraped_data:
+                ong_result['analisis'].update(scraped_data)
                 
-                # Web scraping de reportes específicos
-                scraped_data = await self._scrape_reports(session, ong_config, municipio, estado)
-                if scraped_data:
-                    ong_result['analisis'].update(scraped_data)
-                    
         except Exception as e:
             print(f"❌ Error consultando {ong_name}: {e}")
         
@@ -188,30 +196,41 @@ class ONGSecurityConnector:
             async with session.get(ong_config['rss_feed'], timeout=30) as response:
                 if response.status == 200:
                     rss_content = await response.text()
-                    feed = feedparser.parse(rss_content)
-                    
-                    for entry in feed.entries[:10]:  # Últimos 10 reportes
-                        # Filtrar reportes relevantes para la ubicación
-                        title = entry.title.lower()
-                        summary = getattr(entry, 'summary', '').lower()
-                        
-                        if any(keyword in title or keyword in summary 
-                               for keyword in [municipio.lower(), estado.lower(), 'seguridad', 'criminalidad']):
-                            
-                            reporte = {
-                                'titulo': entry.title,
-                                'fecha': entry.get('published', ''),
-                                'resumen': getattr(entry, 'summary', ''),
-                                'url': entry.link,
-                                'relevancia': self._calculate_relevance(entry, municipio, estado)
-                            }
-                            reportes.append(reporte)
+                    # feedparser corre en el pool de parseo; un feed sin cambios no se vuelve a parsear
+                    reportes = await parse_pool.parsear(
+                        ONGSecurityConnector._parse_rss_reports, rss_content, municipio, estado
+                    )
                             
         except Exception as e:
             print(f"⚠️ Error obteniendo RSS: {e}")
         
         return sorted(reportes, key=lambda x: x['relevancia'], reverse=True)[:5]
     
+    @staticmethod
+    def _parse_rss_reports(rss_content: str, municipio: str, estado: str) -> List[Dict]:
+        """Parsea el feed y filtra los reportes relevantes para la ubicación"""
+        reportes = []
+        feed = feedparser.parse(rss_content)
+        
+        for entry in feed.entries[:10]:  # Últimos 10 reportes
+            # Filtrar reportes relevantes para la ubicación
+            title = entry.title.lower()
+            summary = getattr(entry, 'summary', '').lower()
+            
+            if any(keyword in title or keyword in summary 
+                   for keyword in [municipio.lower(), estado.lower(), 'seguridad', 'criminalidad']):
+                
+                reporte = {
+                    'titulo': entry.title,
+                    'fecha': entry.get('published', ''),
+                    'resumen': getattr(entry, 'summary', ''),
+                    'url': entry.link,
+                    'relevancia': ONGSecurityConnector._calculate_relevance(entry, municipio, estado)
+                }
+                reportes.append(reporte)
+        
+        return reportes
+    
     async def _scrape_reports(self, session: aiohttp.ClientSession, ong_config: Dict,
                              municipio: str, estado: str) -> Dict:
         """Web scraping de reportes específicos"""
@@ -221,20 +240,33 @@ class ONGSecurityConnector:
             async with session.get(ong_config['reports_url'], timeout=45) as response:
                 if response.status == 200:
                     html_content = await response.text()
-                    soup = BeautifulSoup(html_content, 'html.parser')
-                    
-                    # Buscar datos relevantes en el HTML
-                    for indicador in self.indicadores_interes:
-                        value = self._extract_indicator_from_html(soup, indicador, municipio, estado)
-                        if value:
-                            scraped_analysis[indicador] = value
+                    # BeautifulSoup corre en el pool de parseo; resultado en caché por hash del HTML
+                    scraped_analysis = await parse_pool.parsear(
+                        ONGSecurityConnector._parse_reports_html, html_content,
+                        tuple(self.indicadores_interes), municipio, estado
+                    )
                             
         except Exception as e:
             print(f"⚠️ Error en web scraping: {e}")
         
         return scraped_analysis
     
-    def _extract_indicator_from_html(self, soup: BeautifulSoup, indicador: str, 
+    @staticmethod
+    def _parse_reports_html(html_content: str, indicadores: tuple, municipio: str, estado: str) -> Dict:
+        """Busca en el HTML cada indicador de interés junto a la ubicación"""
+        scraped_analysis = {}
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Buscar datos relevantes en el HTML
+        for indicador in indicadores:
+            value = ONGSecurityConnector._extract_indicator_from_html(soup, indicador, municipio, estado)
+            if value:
+                scraped_analysis[indicador] = value
+        
+        return scraped_analysis
+    
+    @staticmethod
+    def _extract_indicator_from_html(soup: BeautifulSoup, indicador: str, 
                                    municipio: str, estado: str) -> Optional[str]:
         """Extrae un indicador específico del HTML"""
         try:
@@ -257,7 +289,8 @@ class ONGSecurityConnector:
             print(f"⚠️ Error extrayendo indicador {indicador}: {e}")
             return None
     
-    def _calculate_relevance(self, entry, municipio: str, estado: str) -> float:
+    @staticmethod
+    def _calculate_relevance(entry, municipio: str, estado: str) -> float:
         """Calcula la relevancia de un reporte para la ubicación específica"""
         relevance_score = 0.0
         
@@ -348,7 +381,8 @@ class ONGSecurityConnector:
         return summary
 
 # Función principal para uso en el sistema
-async def get_ong_security_analysis(municipio: str, estado: str) -> Dict:
+async def get_ong_security_analysis(municipio: str, estado: str,
+                                    session: Optional[aiohttp.ClientSession] = None) -> Dict:
     """Función principal para obtener análisis de ONGs de seguridad"""
-    connector = ONGSecurityConnector()
+    connector = ONGSecurityConnector(session=session)
     return await connector.get_ong_security_data(municipio, estado)
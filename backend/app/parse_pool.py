@@ -0,0 +1,88 @@
+"""
+Pool acotado para el parseo de HTML y RSS de los conectores de fiscalías y ONGs
+BeautifulSoup, feedparser y las regex sobre páginas completas son CPU puro: se ejecutan
+fuera del event loop y su resultado se guarda por hash del documento, así que volver a
+descargar una página sin cambios no la vuelve a parsear.
+Las funciones de parseo deben ser de nivel de módulo (el pool de procesos las serializa).
+"""
+import asyncio
+import copy
+import functools
+import hashlib
+import logging
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .config import Config
+from .single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """Executor perezoso (procesos o hilos) más caché LRU de resultados por hash de documento"""
+
+    def __init__(self, tipo: str = Config.PARSE_POOL_KIND, workers: int = Config.PARSE_POOL_WORKERS,
+                 max_resultados: int = Config.PARSE_CACHE_SIZE):
+        self.tipo = tipo
+        self.workers = workers
+        self.max_resultados = max_resultados
+        self._executor: Optional[Executor] = None
+        self._resultados: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.parseados = 0
+        self.reutilizados = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.tipo == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parseo')
+            logger.info(f"🧵 Pool de parseo ({self.tipo}) con {self.workers} workers")
+        return self._executor
+
+    @staticmethod
+    def _clave(funcion: Callable, documento: str, args: Tuple) -> Tuple:
+        digest = hashlib.sha256(documento.encode('utf-8', 'surrogatepass')).hexdigest()
+        return (f"{funcion.__module__}.{funcion.__qualname__}", digest, args)
+
+    async def parsear(self, funcion: Callable[..., Any], documento: str, *args) -> Any:
+        """funcion(documento, *args) en el pool; el mismo documento con los mismos args se parsea una vez"""
+        clave = self._clave(funcion, documento, args)
+        if clave in self._resultados:
+            self._resultados.move_to_end(clave)
+            self.reutilizados += 1
+            return copy.deepcopy(self._resultados[clave])
+
+        async def ejecutar():
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(self._get_executor(), functools.partial(funcion, documento, *args))
+            self.parseados += 1
+            self._resultados[clave] = resultado
+            while len(self._resultados) > self.max_resultados:
+                self._resultados.popitem(last=False)
+            return resultado
+
+        # Dos descargas simultáneas de la misma página comparten un solo parseo
+        resultado = await single_flight.do('parseo', clave, ejecutar)
+        return copy.deepcopy(resultado)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> Dict:
+        return {
+            'tipo': self.tipo,
+            'workers': self.workers,
+            'activo': self._executor is not None,
+            'documentos_en_cache': len(self._resultados),
+            'parseados': self.parseados,
+            'reutilizados': self.reutilizados,
+        }
+
+
+# Instancia global usada por los conectores
+parse_pool = ParsePool()
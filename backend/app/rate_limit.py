@@ -0,0 +1,103 @@
+"""
+Límite de concurrencia y de tasa por host para APIs externas con cuota
+Cada host tiene un semáforo (solicitudes simultáneas) y un token bucket
+(solicitudes por segundo con ráfaga), compartidos por todas las instancias de los conectores.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """`tasa` tokens por segundo hasta `capacidad`; cada solicitud consume uno"""
+
+    def __init__(self, tasa: float, capacidad: float):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.tokens = capacidad
+        self.actualizado = time.monotonic()
+        self.esperas = 0
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.tasa)
+        self.actualizado = ahora
+
+    async def adquirir(self):
+        while True:
+            self._recargar()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            self.esperas += 1
+            await asyncio.sleep((1 - self.tokens) / self.tasa)
+
+
+class LimitadorHost:
+    """Semáforo + token bucket de un host; se usa con `async with`"""
+
+    def __init__(self, host: str, concurrencia: int, tasa: float, rafaga: float):
+        self.host = host
+        self.concurrencia = concurrencia
+        self.bucket = TokenBucket(tasa, rafaga)
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.en_curso = 0
+        self.solicitudes = 0
+
+    def _semaforo_del_loop(self) -> asyncio.Semaphore:
+        # Como las sesiones HTTP: los scripts con asyncio.run crean un loop nuevo cada vez
+        loop = asyncio.get_running_loop()
+        if self._semaforo is None or self._loop is not loop:
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+            self._loop = loop
+        return self._semaforo
+
+    async def __aenter__(self):
+        semaforo = self._semaforo_del_loop()
+        await semaforo.acquire()
+        try:
+            await self.bucket.adquirir()
+        except BaseException:
+            semaforo.release()
+            raise
+        self.en_curso += 1
+        self.solicitudes += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.en_curso -= 1
+        self._semaforo.release()
+
+    def stats(self) -> Dict:
+        return {
+            'concurrencia': self.concurrencia,
+            'tasa_por_segundo': self.bucket.tasa,
+            'rafaga': self.bucket.capacidad,
+            'en_curso': self.en_curso,
+            'solicitudes': self.solicitudes,
+            'esperas_por_tasa': self.bucket.esperas,
+        }
+
+
+_limitadores: Dict[str, LimitadorHost] = {}
+
+
+def get_limitador(host: str, concurrencia: int = Config.DENUE_MAX_CONCURRENCY,
+                  tasa: float = Config.DENUE_RATE_LIMIT,
+                  rafaga: float = Config.DENUE_RATE_BURST) -> LimitadorHost:
+    """Limitador compartido de un host; los parámetros solo cuentan al crearlo"""
+    limitador = _limitadores.get(host)
+    if limitador is None:
+        limitador = _limitadores[host] = LimitadorHost(host, concurrencia, tasa, rafaga)
+        logger.info(f"🚦 Límite para {host}: {concurrencia} simultáneas, {tasa}/s (ráfaga {rafaga})")
+    return limitador
+
+
+def limitadores_stats() -> Dict:
+    return {host: l.stats() for host, l in _limitadores.items()}
@@ -1,16 +1,99 @@
 """
 Conectores para obtener datos reales de criminalidad y riesgos
 """
-import requests
+import asyncio
+import threading
+from collections import OrderedDict
 import pandas as pd
 from datetime import datetime, timedelta
 import json
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from services.csv_loader import DeteccionEncoding, leer_csv
+from services.normalization import estados_equivalentes, normalizar
+from .cache import cached
+from .download_cache import EntradaDescarga, download_cache
+from .http_client import get_session
+
+# Datasets parseados que se mantienen en memoria (por SHA-256 del archivo)
+MAX_DATASETS_EN_MEMORIA = 4
+# Búsquedas (municipio, estado) resueltas que se recuerdan por dataset (LRU)
+MAX_BUSQUEDAS_POR_DATASET = 256
+
+
+class DatasetIndexado:
+    """CSV del SESNSP parseado una vez e indexado por municipio normalizado"""
+
+    def __init__(self, df: pd.DataFrame, deteccion: DeteccionEncoding):
+        self.df = df
+        self.deteccion = deteccion
+        # Posiciones de fila por municipio normalizado: sin copiar el DataFrame por grupo
+        self.posiciones: Dict[str, object] = {}
+        if 'Municipio' in df.columns:
+            self.posiciones = df.groupby(df['Municipio'].map(normalizar), sort=False).indices
+        self.entidades = df['Entidad'].map(normalizar) if 'Entidad' in df.columns else None
+        # Resultados de búsquedas ya resueltas: (municipio_norm, estado_norm) -> filas.
+        # Se escriben desde hilos de asyncio.to_thread: acotado y protegido por lock
+        self.busquedas: "OrderedDict[Tuple[str, str], pd.DataFrame]" = OrderedDict()
+        self._busquedas_lock = threading.Lock()
+
+    def buscar(self, clave: Tuple[str, str], resolver: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """Resultado memorizado de la búsqueda; resolver() se ejecuta fuera del lock si no está"""
+        with self._busquedas_lock:
+            result = self.busquedas.get(clave)
+            if result is not None:
+                self.busquedas.move_to_end(clave)
+                return result
+        result = resolver()
+        with self._busquedas_lock:
+            self.busquedas[clave] = result
+            self.busquedas.move_to_end(clave)
+            while len(self.busquedas) > MAX_BUSQUEDAS_POR_DATASET:
+                self.busquedas.popitem(last=False)
+        return result
+
+    def filas_municipio(self, municipio_norm: str, estado_norm: str) -> Optional[pd.DataFrame]:
+        """Filas del municipio exacto dentro del estado (None si el nombre no está en el índice)"""
+        posiciones = self.posiciones.get(municipio_norm)
+        if posiciones is None:
+            return None
+        filas = self.df.iloc[posiciones]
+        if self.entidades is not None and estado_norm:
+            # 'Estado de México' aparece como 'México' en el SESNSP: se aceptan las equivalencias
+            entidades = self.entidades.iloc[posiciones]
+            mask = entidades.isin(estados_equivalentes(estado_norm)) | entidades.str.contains(estado_norm, regex=False)
+            filas = filas[mask.to_numpy()]
+        return filas
+
+
+_datasets: "OrderedDict[str, DatasetIndexado]" = OrderedDict()
+_datasets_lock = threading.Lock()
+
+
+def dataset_indexado(entrada: EntradaDescarga) -> DatasetIndexado:
+    """Dataset parseado de un archivo cacheado; se parsea solo la primera vez que se ve su SHA-256"""
+    with _datasets_lock:
+        dataset = _datasets.get(entrada.sha256)
+        if dataset is not None:
+            _datasets.move_to_end(entrada.sha256)
+            return dataset
+    df, deteccion = leer_csv(entrada.ruta)
+    dataset = DatasetIndexado(df, deteccion)
+    with _datasets_lock:
+        _datasets[entrada.sha256] = dataset
+        while len(_datasets) > MAX_DATASETS_EN_MEMORIA:
+            _datasets.popitem(last=False)
+    return dataset
 
 class GobiernoDataConnector:
     """Conector robusto para APIs gubernamentales mexicanas con datos oficiales reales"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        # Sesión HTTP inyectada; por defecto la compartida de la aplicación
+        self.session = session
+
         # URLs oficiales del gobierno mexicano - datos reales
         self.sesnsp_base_url = "https://www.gob.mx/cms/uploads/attachment/file/"
         self.inegi_api_base = "https://www.inegi.org.mx/app/api/indicadores/desarrolladores/jsonxml/INDICATOR/"
@@ -34,6 +117,7 @@ class GobiernoDataConnector:
             'Tlaquepaque': {'estado': 'Jalisco', 'codigo_inegi': '14098'}
         }
         
+    @cached('crime_data', respaldo=lambda r: 'emergencia' in r.get('data_source', ''))
     async def get_crime_data_by_municipio(self, municipio: str, estado: str) -> Dict:
         """
         Obtiene datos REALES de criminalidad por municipio desde archivos oficiales del SESNSP
@@ -47,12 +131,13 @@ class GobiernoDataConnector:
                 print(f"📊 Intentando obtener datos de {dataset_name}: {url}")
                 
                 try:
-                    response = requests.get(url, timeout=45)
-                    if response.status_code == 200:
-                        print(f"✅ Descarga exitosa de {dataset_name}")
+                    # Caché en disco revalidada con GET condicional; la descarga va en streaming a disco
+                    entrada = await download_cache.obtener(get_session(self.session), url, timeout=45)
+                    if entrada is not None:
+                        print(f"✅ Dataset {dataset_name} disponible ({entrada.size:,} bytes, {entrada.sha256[:12]})")
                         
-                        # Leer CSV con diferentes encodings
-                        crime_data = await self._parse_crime_csv(response.content, municipio, estado)
+                        # Leer CSV detectando el encoding (una sola vez por contenido)
+                        crime_data = await self._parse_crime_csv(entrada, municipio, estado)
                         if crime_data['found_data']:
                             print(f"🎯 Datos encontrados para {municipio} en {dataset_name}")
                             return crime_data
@@ -71,39 +156,51 @@ class GobiernoDataConnector:
             print(f"❌ Error crítico obteniendo datos SESNSP: {e}")
             return await self._get_emergency_fallback_data(municipio, estado)
     
-    async def _parse_crime_csv(self, csv_content: bytes, municipio: str, estado: str) -> Dict:
-        """Parsea archivos CSV oficiales del SESNSP con múltiples estrategias"""
-        import io
-        
-        encodings_to_try = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        
-        for encoding in encodings_to_try:
-            try:
-                # Convertir bytes a string y luego a DataFrame
-                csv_string = csv_content.decode(encoding)
-                df = pd.read_csv(io.StringIO(csv_string))
-                
-                print(f"📋 CSV parseado con encoding {encoding}")
-                print(f"📊 Columnas disponibles: {list(df.columns)}")
-                print(f"📈 Total de registros: {len(df)}")
-                
-                # Buscar datos del municipio con múltiples estrategias
-                municipio_data = self._find_municipio_data(df, municipio, estado)
-                
-                if municipio_data is not None and len(municipio_data) > 0:
-                    # Extraer estadísticas reales
-                    crime_stats = self._extract_crime_statistics(municipio_data, municipio, estado)
-                    crime_stats['found_data'] = True
-                    crime_stats['data_source'] = f'SESNSP - Datos oficiales ({encoding})'
-                    crime_stats['total_records_found'] = len(municipio_data)
-                    return crime_stats
-                
-            except Exception as encoding_error:
-                print(f"❌ Error con encoding {encoding}: {encoding_error}")
-                continue
-        
-        return {'found_data': False, 'error': 'No se pudo parsear el CSV con ningún encoding'}
+    async def _parse_crime_csv(self, entrada: EntradaDescarga, municipio: str, estado: str) -> Dict:
+        """Parsea el CSV cacheado en un hilo para no bloquear el event loop"""
+        return await asyncio.to_thread(self._parse_crime_csv_sync, entrada, municipio, estado)
+
+    def _parse_crime_csv_sync(self, entrada: EntradaDescarga, municipio: str, estado: str) -> Dict:
+        """Parsea archivos CSV oficiales del SESNSP detectando el encoding una sola vez"""
+        try:
+            # El archivo se parsea una vez por contenido; las consultas siguientes usan el índice
+            dataset = dataset_indexado(entrada)
+            df, deteccion = dataset.df, dataset.deteccion
+            
+            print(f"📋 CSV con encoding {deteccion.encoding} (confianza {deteccion.confianza:.0%})")
+            print(f"📈 Total de registros: {len(df)}")
+            
+            # Buscar datos del municipio con múltiples estrategias
+            municipio_data = self._buscar_municipio(dataset, municipio, estado)
+            
+            if municipio_data is not None and len(municipio_data) > 0:
+                # Extraer estadísticas reales
+                crime_stats = self._extract_crime_statistics(municipio_data, municipio, estado)
+                crime_stats['found_data'] = True
+                crime_stats['data_source'] = f'SESNSP - Datos oficiales ({deteccion.encoding})'
+                crime_stats['encoding_confidence'] = deteccion.confianza
+                crime_stats['total_records_found'] = len(municipio_data)
+                return crime_stats
+            
+            return {'found_data': False, 'encoding': deteccion.encoding}
+            
+        except Exception as parse_error:
+            print(f"❌ Error parseando CSV: {parse_error}")
+            return {'found_data': False, 'error': f'No se pudo parsear el CSV: {parse_error}'}
     
+    def _buscar_municipio(self, dataset: DatasetIndexado, municipio: str, estado: str) -> pd.DataFrame:
+        """Consulta por índice de municipio normalizado; si no hay coincidencia exacta, búsqueda completa"""
+        clave = (normalizar(municipio), normalizar(estado))
+
+        def resolver() -> pd.DataFrame:
+            result = dataset.filas_municipio(*clave)
+            if result is not None and len(result) > 0:
+                print(f"✅ Encontrado en índice de municipios: {len(result)} registros")
+                return result
+            return self._find_municipio_data(dataset.df, municipio, estado)
+
+        return dataset.buscar(clave, resolver)
+
     def _find_municipio_data(self, df: pd.DataFrame, municipio: str, estado: str) -> pd.DataFrame:
         """Encuentra datos del municipio usando múltiples estrategias de búsqueda"""
         
@@ -346,9 +443,11 @@ class GobiernoDataConnector:
 class INEGIConnector:
     """Conector para indicadores socioeconómicos del INEGI"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self.session = session
         self.base_url = "https://www.inegi.org.mx/app/api/indicadores/desarrolladores/jsonxml/INDICATOR/"
         
+    @cached('socioeconomic', respaldo=lambda r: r.get('data_source') != 'INEGI')
     async def get_socioeconomic_indicators(self, municipio: str) -> Dict:
         """
         Obtiene indicadores socioeconómicos reales que afectan el riesgo
@@ -362,18 +461,21 @@ class INEGIConnector:
                 'population_density': '6207001' # Densidad poblacional
             }
             
+            session = get_session(self.session)
+            urls = {
+                indicator: f"{self.base_url}{code}/es/0700/false/BIE/2.0/{self.api_key}?type=json"
+                for indicator, code in indicators.items()
+            }
+            # Los indicadores se consultan en paralelo sobre la sesión compartida
+            respuestas = await asyncio.gather(*(self._fetch_indicator(session, url) for url in urls.values()))
+            
             results = {}
-            for indicator, code in indicators.items():
-                url = f"{self.base_url}{code}/es/0700/false/BIE/2.0/{self.api_key}?type=json"
-                response = requests.get(url, timeout=15)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if data and 'Series' in data:
-                        # Extraer último valor disponible
-                        series = data['Series'][0]['OBSERVATIONS']
-                        if series:
-                            results[indicator] = float(series[-1]['OBS_VALUE'])
+            for indicator, data in zip(urls, respuestas):
+                if data and 'Series' in data:
+                    # Extraer último valor disponible
+                    series = data['Series'][0]['OBSERVATIONS']
+                    if series:
+                        results[indicator] = float(series[-1]['OBS_VALUE'])
             
             return {
                 'indicators': results,
@@ -396,6 +498,13 @@ class INEGIConnector:
                 'last_updated': datetime.now().isoformat()
             }
     
+    async def _fetch_indicator(self, session: aiohttp.ClientSession, url: str) -> Optional[Dict]:
+        """JSON de un indicador (None si la respuesta no es 200)"""
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+            if response.status == 200:
+                return await response.json(content_type=None)
+            return None
+
     def _calculate_risk_multiplier(self, indicators: Dict) -> float:
         """
         Calcula multiplicador de riesgo basado en indicadores socioeconómicos
@@ -422,10 +531,12 @@ class INEGIConnector:
 class WeatherDataConnector:
     """Conector para datos meteorológicos que afectan criminalidad"""
     
-    def __init__(self):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self.session = session
         self.openweather_api = "https://api.openweathermap.org/data/2.5"
         self.api_key = "TU_API_KEY_OPENWEATHER"  # Obtener gratis en openweathermap.org
         
+    @cached('weather', respaldo=lambda r: r.get('data_source') != 'OpenWeatherMap')
     async def get_weather_risk_factors(self, lat: float, lng: float) -> Dict:
         """
         Obtiene factores meteorológicos que correlacionan con criminalidad
@@ -441,10 +552,10 @@ class WeatherDataConnector:
                 'lang': 'es'
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                
+            session = get_session(self.session)
+            async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                data = await response.json(content_type=None) if response.status == 200 else None
+            if data is not None:
                 # Factores que afectan criminalidad según literatura criminológica
                 temp = data['main']['temp']
                 humidity = data['main']['humidity']
@@ -505,10 +616,10 @@ class WeatherDataConnector:
 class RealDataOrchestrator:
     """Orquestador que combina todas las fuentes de datos reales"""
     
-    def __init__(self):
-        self.gobierno_connector = GobiernoDataConnector()
-        self.inegi_connector = INEGIConnector()
-        self.weather_connector = WeatherDataConnector()
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+        self.gobierno_connector = GobiernoDataConnector(session=session)
+        self.inegi_connector = INEGIConnector(session=session)
+        self.weather_connector = WeatherDataConnector(session=session)
     
     async def get_comprehensive_risk_data(self, address: str, ambito: str, lat: float, lng: float) -> Dict:
         """
@@ -519,9 +630,11 @@ class RealDataOrchestrator:
         
         # Obtener datos de múltiples fuentes en paralelo
         try:
-            crime_data = await self.gobierno_connector.get_crime_data_by_municipio(municipio, estado)
-            socio_data = await self.inegi_connector.get_socioeconomic_indicators(municipio)
-            weather_data = await self.weather_connector.get_weather_risk_factors(lat, lng)
+            crime_data, socio_data, weather_data = await asyncio.gather(
+                self.gobierno_connector.get_crime_data_by_municipio(municipio, estado),
+                self.inegi_connector.get_socioeconomic_indicators(municipio),
+                self.weather_connector.get_weather_risk_factors(lat, lng)
+            )
             
             # Combinar y calcular factor de riesgo real
             real_risk_factor = self._calculate_combined_risk_factor(
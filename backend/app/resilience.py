@@ -0,0 +1,148 @@
+"""
+Presupuesto de tiempo, circuit breaker y reintentos con jitter para fuentes externas
+Los motores reparten un deadline total entre sus fuentes, omiten las que fallan
+repetidamente y reintentan solo mientras quede presupuesto.
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Deadline:
+    """Tiempo límite absoluto de una solicitud (reloj monotónico)"""
+
+    def __init__(self, segundos: float):
+        self.segundos = segundos
+        self.inicio = time.monotonic()
+        self.limite = self.inicio + segundos
+
+    def restante(self) -> float:
+        return max(0.0, self.limite - time.monotonic())
+
+    def transcurrido(self) -> float:
+        return time.monotonic() - self.inicio
+
+    def sub(self, fraccion: float) -> 'Deadline':
+        """Deadline hijo con una fracción del total, sin pasar del límite del padre"""
+        return Deadline(min(self.segundos * fraccion, self.restante()))
+
+    @property
+    def vencido(self) -> bool:
+        return self.restante() <= 0
+
+
+class CircuitoAbierto(Exception):
+    """La fuente se omite porque su circuit breaker está abierto"""
+
+
+class CircuitBreaker:
+    """
+    Cerrado -> abierto tras `umbral` fallos seguidos; tras `reset` segundos deja pasar
+    una llamada de prueba (semiabierto) que lo cierra si sale bien o lo reabre si falla.
+    """
+
+    def __init__(self, nombre: str, umbral: int = Config.CIRCUIT_BREAKER_THRESHOLD,
+                 reset: float = Config.CIRCUIT_BREAKER_RESET):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.reset = reset
+        self.fallos = 0
+        self.abierto_desde: Optional[float] = None
+        self._prueba_en_curso = False
+        self.omitidas = 0
+
+    @property
+    def estado(self) -> str:
+        if self.abierto_desde is None:
+            return 'cerrado'
+        if time.monotonic() - self.abierto_desde >= self.reset:
+            return 'semiabierto'
+        return 'abierto'
+
+    def permite(self) -> bool:
+        estado = self.estado
+        if estado == 'cerrado':
+            return True
+        if estado == 'semiabierto' and not self._prueba_en_curso:
+            self._prueba_en_curso = True
+            return True
+        self.omitidas += 1
+        return False
+
+    def registrar_exito(self):
+        self.fallos = 0
+        self.abierto_desde = None
+        self._prueba_en_curso = False
+
+    def liberar_prueba(self):
+        """La llamada de prueba se canceló sin resultado: la siguiente puede volver a probar"""
+        self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        self.fallos += 1
+        self._prueba_en_curso = False
+        if self.abierto_desde is not None or self.fallos >= self.umbral:
+            if self.abierto_desde is None:
+                logger.warning(f"🔌 Circuito abierto para {self.nombre} tras {self.fallos} fallos")
+            self.abierto_desde = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {'estado': self.estado, 'fallos': self.fallos, 'omitidas': self.omitidas}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(nombre: str) -> CircuitBreaker:
+    """Circuit breaker de una fuente, compartido por todas las instancias de los motores"""
+    breaker = _breakers.get(nombre)
+    if breaker is None:
+        breaker = _breakers[nombre] = CircuitBreaker(nombre)
+    return breaker
+
+
+def breakers_stats() -> Dict:
+    return {nombre: b.stats() for nombre, b in _breakers.items()}
+
+
+def retraso_con_jitter(intento: int, base: float = Config.RETRY_DELAY) -> float:
+    """Backoff exponencial con jitter completo: uniforme entre 0 y base * 2^intento"""
+    return random.uniform(0, base * (2 ** intento))
+
+
+async def llamar_con_presupuesto(nombre: str, llamada: Callable[[], Awaitable[Any]], deadline: Deadline,
+                                 max_reintentos: int = Config.MAX_RETRIES,
+                                 retraso_base: float = Config.RETRY_DELAY) -> Any:
+    """
+    Ejecutar llamada() dentro del deadline, con circuit breaker y reintentos con jitter
+    Lanza CircuitoAbierto si la fuente está omitida y asyncio.TimeoutError si se agota
+    el presupuesto; los reintentos solo se hacen si el retraso cabe en el tiempo restante.
+    """
+    breaker = get_breaker(nombre)
+    if not breaker.permite():
+        raise CircuitoAbierto(nombre)
+
+    intento = 0
+    while True:
+        try:
+            resultado = await asyncio.wait_for(llamada(), timeout=deadline.restante())
+            breaker.registrar_exito()
+            return resultado
+        except asyncio.CancelledError:
+            breaker.liberar_prueba()
+            raise
+        except Exception as e:
+            espera = retraso_con_jitter(intento, retraso_base)
+            # Presupuesto agotado (o sin tiempo para esperar otro intento): la fuente falla
+            if deadline.vencido or intento >= max_reintentos or espera >= deadline.restante():
+                breaker.registrar_fallo()
+                raise
+            intento += 1
+            logger.info(f"🔁 Reintento {intento}/{max_reintentos} de {nombre} en {espera:.2f}s: {e}")
+            await asyncio.sleep(espera)
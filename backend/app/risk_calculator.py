@@ -66,6 +66,47 @@ SECURITY_REDUCTION = {
     "iluminacion": 0.01
 }
 
+# Reducción de riesgo por medida según efectividad documentada ASIS Internacional y estudios de seguridad
+EFECTIVIDAD_MEDIDAS_ASIS = {
+    # Medidas Básicas (ASIS Protection of Assets Manual)
+    "camaras": 0.18,           # 18% reducción videovigilancia básica
+    "guardias": 0.25,          # 25% reducción personal entrenado
+    "sistemas_intrusion": 0.22, # 22% reducción detección temprana
+    "control_acceso": 0.15,    # 15% reducción perímetro controlado
+    "iluminacion": 0.12,       # 12% reducción vigilancia natural
+    
+    # Medidas Específicas Mercado Libre (basadas en efectividad real)
+    "portones_automaticos": 0.20,    # 20% control acceso vehicular
+    "plumas_acceso": 0.14,           # 14% regulación flujo vehicular
+    "bolardos": 0.28,                # 28% prevención embestidas vehiculares
+    "poncha_llantas": 0.35,          # 35% prevención huida en vehículo
+    "casetas_seguridad": 0.22,       # 22% control centralizado accesos
+    "camaras_acceso": 0.24,          # 24% videovigilancia especializada
+    "torniquetes": 0.30,             # 30% control acceso peatonal estricto
+    "rfid_acceso": 0.26,             # 26% control biométrico/digital
+    "radios_comunicacion": 0.16,     # 16% coordinación respuesta inmediata
+    "centro_monitoreo": 0.32,        # 32% supervisión continua 24/7
+    "botones_panico": 0.19,          # 19% alerta inmediata incidentes
+    "bardas_perimetrales": 0.21,     # 21% barrera física perimetral
+    
+    # Medidas Avanzadas (tecnología y protocolos ASIS)
+    "sensores_movimiento": 0.27,     # 27% detección perimetral avanzada
+    "detectores_metales": 0.23,      # 23% prevención armas/herramientas
+    "videoanalytica_ia": 0.38,       # 38% detección inteligente comportamientos
+    "patrullajes_aleatorios": 0.29,  # 29% disuasión impredecible
+    "iluminacion_inteligente": 0.17, # 17% optimización lumínica adaptativa
+    "comunicacion_redundante": 0.21, # 21% continuidad comunicaciones críticas
+    "verificacion_biometrica": 0.33, # 33% identificación personal inequívoca
+    "cercas_electrificadas": 0.42,   # 42% barrera disuasiva máxima
+    "anti_drones": 0.15,             # 15% protección amenazas aéreas
+    "monitoreo_sismico": 0.13,       # 13% detección túneles/perforaciones
+    "acceso_por_zonas": 0.25,        # 25% compartimentación seguridad
+    "evacuacion_automatizada": 0.18, # 18% respuesta emergencias coordinada
+    "protocolos_lockdown": 0.36,     # 36% confinamiento de amenazas
+    "coordinacion_autoridades": 0.28, # 28% respuesta interinstitucional
+    "alerta_temprana": 0.31          # 31% anticipación comunitaria amenazas
+}
+
 def calculate_risk(address, ambito, scenarios, security_measures, comments):
     rows = []
     for scenario in scenarios:
@@ -336,51 +377,12 @@ def calculate_iac(ambito, scenario):
 
 def get_reduccion_medidas_asis(security_measures):
     """Reducción de riesgo por medidas según efectividad documentada ASIS Internacional y estudios de seguridad"""
-    efectividad = {
-        # Medidas Básicas (ASIS Protection of Assets Manual)
-        "camaras": 0.18,           # 18% reducción videovigilancia básica
-        "guardias": 0.25,          # 25% reducción personal entrenado
-        "sistemas_intrusion": 0.22, # 22% reducción detección temprana
-        "control_acceso": 0.15,    # 15% reducción perímetro controlado
-        "iluminacion": 0.12,       # 12% reducción vigilancia natural
-        
-        # Medidas Específicas Mercado Libre (basadas en efectividad real)
-        "portones_automaticos": 0.20,    # 20% control acceso vehicular
-        "plumas_acceso": 0.14,           # 14% regulación flujo vehicular
-        "bolardos": 0.28,                # 28% prevención embestidas vehiculares
-        "poncha_llantas": 0.35,          # 35% prevención huida en vehículo
-        "casetas_seguridad": 0.22,       # 22% control centralizado accesos
-        "camaras_acceso": 0.24,          # 24% videovigilancia especializada
-        "torniquetes": 0.30,             # 30% control acceso peatonal estricto
-        "rfid_acceso": 0.26,             # 26% control biométrico/digital
-        "radios_comunicacion": 0.16,     # 16% coordinación respuesta inmediata
-        "centro_monitoreo": 0.32,        # 32% supervisión continua 24/7
-        "botones_panico": 0.19,          # 19% alerta inmediata incidentes
-        "bardas_perimetrales": 0.21,     # 21% barrera física perimetral
-        
-        # Medidas Avanzadas (tecnología y protocolos ASIS)
-        "sensores_movimiento": 0.27,     # 27% detección perimetral avanzada
-        "detectores_metales": 0.23,      # 23% prevención armas/herramientas
-        "videoanalytica_ia": 0.38,       # 38% detección inteligente comportamientos
-        "patrullajes_aleatorios": 0.29,  # 29% disuasión impredecible
-        "iluminacion_inteligente": 0.17, # 17% optimización lumínica adaptativa
-        "comunicacion_redundante": 0.21, # 21% continuidad comunicaciones críticas
-        "verificacion_biometrica": 0.33, # 33% identificación personal inequívoca
-        "cercas_electrificadas": 0.42,   # 42% barrera disuasiva máxima
-        "anti_drones": 0.15,             # 15% protección amenazas aéreas
-        "monitoreo_sismico": 0.13,       # 13% detección túneles/perforaciones
-        "acceso_por_zonas": 0.25,        # 25% compartimentación seguridad
-        "evacuacion_automatizada": 0.18, # 18% respuesta emergencias coordinada
-        "protocolos_lockdown": 0.36,     # 36% confinamiento de amenazas
-        "coordinacion_autoridades": 0.28, # 28% respuesta interinstitucional
-        "alerta_temprana": 0.31          # 31% anticipación comunitaria amenazas
-    }
     
     # Reducción acumulativa con factor de sinergia avanzado (metodología ASIS layered security)
     total_reduccion = 0
     for measure in security_measures:
-        if measure in efectividad:
-            total_reduccion += efectividad[measure]
+        if measure in EFECTIVIDAD_MEDIDAS_ASIS:
+            total_reduccion += EFECTIVIDAD_MEDIDAS_ASIS[measure]
     
     # Factor de sinergia por capas de seguridad (Defense in Depth - ASIS)
     num_medidas = len(security_measures)
@@ -0,0 +1,61 @@
+"""
+Coalescencia de consultas idénticas en vuelo (single-flight)
+Si varias corrutinas piden lo mismo a la vez, solo la primera llama a la fuente
+y las demás esperan el mismo resultado; se cuentan las llamadas ahorradas por fuente.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Una tarea compartida por clave mientras la consulta está en curso"""
+
+    def __init__(self):
+        self._en_vuelo: Dict[Hashable, asyncio.Task] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _contador(self, fuente: str) -> Dict[str, int]:
+        contador = self._stats.get(fuente)
+        if contador is None:
+            contador = self._stats[fuente] = {'calls': 0, 'upstream': 0, 'saved': 0}
+        return contador
+
+    def _terminar(self, key: Hashable, task: asyncio.Task):
+        if self._en_vuelo.get(key) is task:
+            del self._en_vuelo[key]
+        # Marcar la excepción como leída aunque todos los que esperaban se hayan cancelado
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, fuente: str, key: Hashable, llamada: Callable[[], Awaitable[Any]]) -> Any:
+        """Ejecutar llamada() o unirse a la que ya está en curso con la misma clave"""
+        contador = self._contador(fuente)
+        contador['calls'] += 1
+        clave = (fuente, key)
+        task = self._en_vuelo.get(clave)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            contador['upstream'] += 1
+            task = asyncio.ensure_future(llamada())
+            self._en_vuelo[clave] = task
+            task.add_done_callback(lambda t, clave=clave: self._terminar(clave, t))
+        else:
+            contador['saved'] += 1
+            logger.debug(f"🔗 Consulta {fuente} unida a una en curso")
+        # shield: cancelar a un llamador no cancela la consulta que esperan los demás
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        fuentes = {fuente: dict(c) for fuente, c in self._stats.items()}
+        return {
+            'in_flight': len(self._en_vuelo),
+            'upstream_calls': sum(c['upstream'] for c in fuentes.values()),
+            'saved_calls': sum(c['saved'] for c in fuentes.values()),
+            'sources': fuentes,
+        }
+
+
+# Instancia global usada por el decorador de caché
+single_flight = SingleFlight()
@@ -29,10 +29,13 @@ async def calculate_super_integrated_risk(
     business_value: float = 500000,
     scenarios: List[str] = None,
     security_measures: List[str] = None,
-    ambito: str = "urbano"
+    ambito: str = "urbano",
+    include_metadata: bool = False
 ) -> Dict[str, Any]:
     """
     Calcula el riesgo usando el motor científico v4 (probabilidades por escenario)
+    Los metadatos científicos constantes se referencian por versión; include_metadata
+    los agrega una sola vez al resultado.
     """
     print(f"🚀 INICIANDO ANÁLISIS SUPER INTEGRADO v4 para {municipio}, {estado}")
     try:
@@ -85,7 +88,7 @@ async def calculate_super_integrated_risk(
                         "intervalo_confianza": prob_result.get("confidence_interval", {}),
                         "confiabilidad": prob_result.get("reliability_score", 0.0),
                         "metadatos_cientificos": prob_result.get("scientific_metadata", {}),
-                        "fuentes_datos": prob_result.get("data_sources", []),
+                        "metadata_version": prob_result.get("metadata_version"),
                         "medidas_seguridad_count": len(security_measures),
                         "motor_usado": "SUPER Integrado v4.0",
                         "timestamp": datetime.now().isoformat(),
@@ -101,19 +104,23 @@ async def calculate_super_integrated_risk(
                         "intervalo_confianza": {},
                         "confiabilidad": 0.0,
                         "metadatos_cientificos": {"error": str(e)},
-                        "fuentes_datos": [],
+                        "metadata_version": None,
                         "medidas_seguridad_count": len(security_measures),
                         "motor_usado": "SUPER Integrado v4.0",
                         "timestamp": datetime.now().isoformat(),
                         "calculo": {}
                     })
 
-        return {
+        resultado = {
             "summary": summary,
             "datos_criminalidad": datos_criminalidad,
             "motor_usado": "SUPER Integrado v4.0",
+            "metadata_version": scientific_engine.metadata_version,
             "timestamp": datetime.now().isoformat()
         }
+        if include_metadata:
+            resultado["metadatos_cientificos"] = scientific_engine.static_metadata
+        return resultado
     except Exception as e:
         print(f"❌ Error en motor científico v4: {e}")
         raise Exception(f"Error en motor científico v4: {e}")
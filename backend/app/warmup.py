@@ -0,0 +1,142 @@
+"""
+Precalentamiento en segundo plano de los datos externos de cada almacén del catálogo
+Recorre periódicamente los municipios de MLRiskEngine._load_ml_warehouses y consulta
+criminalidad, fiscalía, INEGI y ONGs con concurrencia acotada para llenar las cachés
+antes de que llegue la primera solicitud de un usuario.
+"""
+import asyncio
+import logging
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .config import Config
+from .fiscalias_connector import FiscaliasEstatalesConnector
+from .inegi_expanded_connector import INEGIExpandedConnector
+from .integrated_risk_engine import IntegratedRiskEngine
+from .ong_security_connector import ONGSecurityConnector
+from .real_data_connectors import GobiernoDataConnector
+
+logger = logging.getLogger(__name__)
+
+# Las direcciones del catálogo traen el código postal antes del municipio ("54607 Tepotzotlán")
+_CODIGO_POSTAL = re.compile(r'^\d{5}\s+')
+
+
+def ubicaciones_almacenes() -> Dict[str, Tuple[str, str]]:
+    """Código de almacén -> (municipio, estado) para todo el catálogo ML"""
+    from .ml_specialized_engine import MLRiskEngine
+
+    almacenes = MLRiskEngine().ml_warehouses
+    return {
+        codigo: (_CODIGO_POSTAL.sub('', info['municipio']).strip(), info['estado'])
+        for codigo, info in almacenes.items()
+    }
+
+
+class WarmupScheduler:
+    """Tarea periódica que precarga las fuentes de cada municipio con almacenes"""
+
+    def __init__(self, intervalo: float = Config.WARMUP_INTERVAL,
+                 concurrencia: int = Config.WARMUP_CONCURRENCY,
+                 retraso_inicial: float = Config.WARMUP_INITIAL_DELAY):
+        self.intervalo = intervalo
+        self.concurrencia = concurrencia
+        self.retraso_inicial = retraso_inicial
+        self.engine = IntegratedRiskEngine()
+        self.almacenes: Dict[str, Tuple[str, str]] = {}
+        self.ultimo_resultado: Dict[Tuple[str, str], Dict] = {}
+        self.rondas = 0
+        self.ultima_ronda: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._ciclo())
+            logger.info(f"🔥 Precalentamiento programado cada {self.intervalo}s (concurrencia {self.concurrencia})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _ciclo(self):
+        await asyncio.sleep(self.retraso_inicial)
+        while True:
+            try:
+                await self.ejecutar_ronda()
+            except Exception as e:
+                logger.error(f"❌ Error en ronda de precalentamiento: {e}")
+            await asyncio.sleep(self.intervalo)
+
+    async def ejecutar_ronda(self) -> Dict:
+        """Precargar una vez todos los municipios (cada uno solo una vez aunque tenga varios almacenes)"""
+        inicio = time.monotonic()
+        self.almacenes = ubicaciones_almacenes()
+        ubicaciones = sorted(set(self.almacenes.values()))
+        semaforo = asyncio.Semaphore(self.concurrencia)
+
+        async def precargar(ubicacion: Tuple[str, str]):
+            async with semaforo:
+                municipio, estado = ubicacion
+                fuentes = await self.engine.precargar_fuentes(municipio, estado)
+                self.ultimo_resultado[ubicacion] = {
+                    'fuentes': fuentes,
+                    'fecha': datetime.now().isoformat()
+                }
+
+        await asyncio.gather(*(precargar(u) for u in ubicaciones))
+        self.rondas += 1
+        self.ultima_ronda = {
+            'fecha': datetime.now().isoformat(),
+            'municipios': len(ubicaciones),
+            'segundos': round(time.monotonic() - inicio, 2)
+        }
+        logger.info(f"🔥 Precalentamiento: {len(ubicaciones)} municipios en {self.ultima_ronda['segundos']}s")
+        return self.ultima_ronda
+
+    def _fuentes_en_cache(self, municipio: str, estado: str) -> Dict[str, bool]:
+        """Qué fuentes tienen resultado vigente en caché para el municipio"""
+        en_cache = {
+            'sesnsp_federal': GobiernoDataConnector.get_crime_data_by_municipio.en_cache(municipio, estado),
+            'fiscalia_estatal': FiscaliasEstatalesConnector.get_state_crime_data.en_cache(estado, municipio),
+            'ong_analysis': ONGSecurityConnector.get_ong_security_data.en_cache(municipio, estado),
+        }
+        codigo = self.engine._get_inegi_code(municipio)
+        if codigo:
+            en_cache['inegi_socioeconomico'] = INEGIExpandedConnector.get_socioeconomic_data.en_cache(codigo)
+        return en_cache
+
+    def status(self) -> Dict:
+        """Estado warm/partial/cold por almacén según lo que hay en caché ahora mismo"""
+        almacenes: List[Dict] = []
+        for codigo, (municipio, estado) in sorted(self.almacenes.items()):
+            en_cache = self._fuentes_en_cache(municipio, estado)
+            calientes = sum(en_cache.values())
+            almacenes.append({
+                'codigo': codigo,
+                'municipio': municipio,
+                'estado': estado,
+                'status': 'warm' if calientes == len(en_cache) else 'partial' if calientes else 'cold',
+                'fuentes_en_cache': en_cache,
+                'ultimo_precalentamiento': self.ultimo_resultado.get((municipio, estado))
+            })
+        resumen = {s: sum(1 for a in almacenes if a['status'] == s) for s in ('warm', 'partial', 'cold')}
+        return {
+            'activo': self._task is not None and not self._task.done(),
+            'intervalo_segundos': self.intervalo,
+            'concurrencia': self.concurrencia,
+            'rondas': self.rondas,
+            'ultima_ronda': self.ultima_ronda,
+            'resumen': resumen,
+            'almacenes': almacenes
+        }
+
+
+# Instancia global iniciada por el servidor
+warmup_scheduler = WarmupScheduler()
@@ -0,0 +1,66 @@
+"""
+Benchmark del modo Monte Carlo del motor científico
+Mide cuánto tarda la simulación de MONTE_CARLO_SAMPLES muestras de un escenario y de una
+solicitud completa con todos los escenarios (calculate_monte_carlo_batch, como /consultar-riesgo),
+contra el presupuesto por solicitud (MONTE_CARLO_TIME_BUDGET). Sin presupuesto de tiempo
+para que siempre se completen las muestras.
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from engines.scientific_risk_engine import (
+    MONTE_CARLO_SAMPLES, MONTE_CARLO_TIME_BUDGET, ScientificParameters, scientific_engine
+)
+
+REPETICIONES = 20
+UBICACION = "Tultepec, Estado de México"
+CONTEXTO = {'crime_percentages': {'robo': 45.0, 'homicidio': 6.0, 'extorsion': 3.0}}
+MEDIDAS = list(ScientificParameters.SECURITY_EFFECTIVENESS)  # el peor caso: todas las medidas
+SLO_MS = MONTE_CARLO_TIME_BUDGET * 1000
+
+
+def medir(escenario: str) -> float:
+    inicio = time.perf_counter()
+    resultado = scientific_engine.calculate_monte_carlo(
+        escenario, UBICACION, MEDIDAS, CONTEXTO,
+        samples=MONTE_CARLO_SAMPLES, time_budget=float('inf')
+    )
+    assert resultado['samples'] == MONTE_CARLO_SAMPLES
+    return (time.perf_counter() - inicio) * 1000
+
+
+def medir_solicitud(escenarios) -> float:
+    inicio = time.perf_counter()
+    resultados = scientific_engine.calculate_monte_carlo_batch(
+        escenarios, UBICACION, MEDIDAS, CONTEXTO,
+        samples=MONTE_CARLO_SAMPLES, time_budget=float('inf')
+    )
+    assert all(r['samples'] == MONTE_CARLO_SAMPLES for r in resultados.values())
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    escenarios = list(ScientificParameters.SCENARIO_WEIGHTS)
+    medir(escenarios[0])  # calentamiento
+
+    print(f"🎲 {MONTE_CARLO_SAMPLES:,} muestras por escenario, {len(MEDIDAS)} medidas, {REPETICIONES} repeticiones")
+    for escenario in escenarios:
+        tiempos = [medir(escenario) for _ in range(REPETICIONES)]
+        print(f"📊 {escenario:<22} p50 {statistics.median(tiempos):7.1f} ms   máx {max(tiempos):7.1f} ms")
+
+    solicitudes = [medir_solicitud(escenarios) for _ in range(REPETICIONES)]
+    p50, peor = statistics.median(solicitudes), max(solicitudes)
+    print(f"📊 Solicitud con {len(escenarios)} escenarios: p50 {p50:.1f} ms, máx {peor:.1f} ms (SLO {SLO_MS:.0f} ms)")
+    if peor <= SLO_MS:
+        print("✅ Dentro del SLO de latencia")
+    else:
+        print("❌ Fuera del SLO de latencia")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
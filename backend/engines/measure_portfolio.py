@@ -0,0 +1,326 @@
+"""
+Optimizador de portafolio de medidas de seguridad
+Para un almacén y sus escenarios busca qué medidas agregar a las existentes y devuelve la
+frontera de Pareto costo anual vs. probabilidad residual. Usa el modelo de guardianes del
+motor científico extendido al catálogo ASIS de risk_calculator (más de 30 medidas).
+
+Los portafolios se codifican como bitmask y se exploran por ramificación y acotamiento:
+una rama se descarta cuando, para cada cantidad de medidas que aún podría agregar, la
+frontera ya tiene un portafolio igual de barato y al menos tan efectivo como la mejor cota.
+"""
+import bisect
+import logging
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.risk_calculator import EFECTIVIDAD_MEDIDAS_ASIS
+from engines.scientific_risk_engine import ScientificParameters, ScientificRiskEngine, scientific_engine
+
+logger = logging.getLogger(__name__)
+
+# Costo anual estimado por medida en MXN (instalación amortizada a 3 años + operación y mantenimiento).
+# Son valores de referencia: cada solicitud puede sobrescribirlos con sus propias cotizaciones.
+COSTOS_MEDIDAS_MXN = {
+    # Medidas Básicas
+    "camaras": 180_000,
+    "guardias": 960_000,
+    "sistemas_intrusion": 150_000,
+    "control_acceso": 120_000,
+    "iluminacion": 90_000,
+
+    # Medidas Específicas Mercado Libre
+    "portones_automaticos": 140_000,
+    "plumas_acceso": 60_000,
+    "bolardos": 110_000,
+    "poncha_llantas": 45_000,
+    "casetas_seguridad": 85_000,
+    "camaras_acceso": 95_000,
+    "torniquetes": 130_000,
+    "rfid_acceso": 100_000,
+    "radios_comunicacion": 40_000,
+    "centro_monitoreo": 720_000,
+    "botones_panico": 35_000,
+    "bardas_perimetrales": 250_000,
+
+    # Medidas Avanzadas
+    "sensores_movimiento": 120_000,
+    "detectores_metales": 90_000,
+    "videoanalytica_ia": 320_000,
+    "patrullajes_aleatorios": 420_000,
+    "iluminacion_inteligente": 130_000,
+    "comunicacion_redundante": 75_000,
+    "verificacion_biometrica": 160_000,
+    "cercas_electrificadas": 210_000,
+    "anti_drones": 380_000,
+    "monitoreo_sismico": 200_000,
+    "acceso_por_zonas": 150_000,
+    "evacuacion_automatizada": 110_000,
+    "protocolos_lockdown": 80_000,
+    "coordinacion_autoridades": 30_000,
+    "alerta_temprana": 55_000,
+}
+
+DERIVED_CONFIDENCE = 0.70       # confianza de las efectividades derivadas (menor que cualquiera del meta-análisis)
+PORTFOLIO_MAX_NODES = 200_000   # nodos por búsqueda; al agotarse la frontera se devuelve marcada como no exacta
+DOMINANCE_EPS = 1e-12           # tolerancia al comparar factores de guardianes
+
+
+def _catalogo_medidas() -> Dict[str, Dict]:
+    """Efectividad y confianza de cada medida en la escala del motor científico"""
+    meta = ScientificParameters.SECURITY_EFFECTIVENESS
+    comunes = [m for m in EFECTIVIDAD_MEDIDAS_ASIS if m in meta]
+    # Recta reducción ASIS -> efectividad, ajustada sobre las medidas presentes en ambas tablas
+    pendiente, ordenada = np.polyfit(
+        [EFECTIVIDAD_MEDIDAS_ASIS[m] for m in comunes],
+        [meta[m]['effectiveness'] for m in comunes], 1
+    )
+    catalogo = {m: dict(datos, source='meta_analysis') for m, datos in meta.items()}
+    for medida, reduccion in EFECTIVIDAD_MEDIDAS_ASIS.items():
+        if medida not in catalogo:
+            catalogo[medida] = {
+                'effectiveness': float(np.clip(ordenada + pendiente * reduccion, 0.05, 0.95)),
+                'confidence': DERIVED_CONFIDENCE,
+                'source': 'asis_derived'
+            }
+    return catalogo
+
+
+class _Frontera:
+    """Portafolios no dominados (costo, g, mask) ordenados por costo, con g estrictamente decreciente"""
+
+    def __init__(self):
+        self.costos: List[float] = []
+        self.puntos: List[Tuple[float, float, int]] = []
+
+    def mejor_g(self, costo: float) -> float:
+        """Menor factor de guardianes alcanzado con costo <= costo"""
+        i = bisect.bisect_right(self.costos, costo)
+        return self.puntos[i - 1][1] if i else math.inf
+
+    def agregar(self, costo: float, g: float, mask: int) -> bool:
+        if self.mejor_g(costo) <= g + DOMINANCE_EPS:
+            return False
+        i = bisect.bisect_left(self.costos, costo)
+        j = i
+        while j < len(self.puntos) and self.puntos[j][1] >= g - DOMINANCE_EPS:
+            j += 1
+        self.costos[i:j] = [costo]
+        self.puntos[i:j] = [(costo, g, mask)]
+        return True
+
+
+class PortfolioOptimizer:
+    """Frontera de Pareto costo vs. riesgo residual sobre el catálogo de medidas"""
+
+    def __init__(self, engine: ScientificRiskEngine = scientific_engine):
+        self.engine = engine
+        self.catalogo = _catalogo_medidas()
+        # Un bit por medida del catálogo (hasta 64 cabe en un entero de máquina; Python no tiene límite)
+        self.measure_bits = {m: 1 << i for i, m in enumerate(self.catalogo)}
+
+    def _g(self, s1: float, s2: float, n: int) -> float:
+        """Factor de guardianes a partir de Σ efectividad·confianza, Σ confianza y cantidad de medidas"""
+        return self.engine.guardianship_factor(s1 / s2, n) if s2 else 1.0
+
+    def optimize(
+        self,
+        scenarios: List[str],
+        location: str,
+        crime_context: Optional[Dict],
+        existing_measures: List[str],
+        candidate_measures: Optional[List[str]] = None,
+        costs: Optional[Dict[str, float]] = None,
+        budget: Optional[float] = None,
+        target_probability: Optional[float] = None,
+        max_nodes: int = PORTFOLIO_MAX_NODES
+    ) -> Dict:
+        """
+        Buscar los portafolios Pareto-óptimos de medidas a agregar
+
+        La probabilidad residual es la de que ocurra al menos uno de los escenarios en el año,
+        en %, igual que 'probability' en los resultados del motor; target_probability usa la
+        misma escala y elige el punto más barato de la frontera que lo cumple.
+        """
+        if not scenarios:
+            raise ValueError("Se requiere al menos un escenario")
+        inicio = time.perf_counter()
+        costos = dict(COSTOS_MEDIDAS_MXN, **(costs or {}))
+        negativos = [m for m, c in costos.items() if c < 0]
+        if negativos:
+            raise ValueError(f"Costos negativos: {negativos}")
+
+        # Estado inicial: las medidas existentes (las desconocidas solo cuentan para la cantidad, como en el motor)
+        existentes = sorted(set(existing_measures))
+        s1 = sum(self.catalogo[m]['effectiveness'] * self.catalogo[m]['confidence'] for m in existentes if m in self.catalogo)
+        s2 = sum(self.catalogo[m]['confidence'] for m in existentes if m in self.catalogo)
+        n = len(existentes)
+
+        ignoradas = {}
+        candidatos = []
+        for medida in dict.fromkeys(candidate_measures if candidate_measures is not None else self.catalogo):
+            if medida in existentes:
+                continue
+            if medida not in self.catalogo:
+                ignoradas[medida] = "sin modelo de efectividad"
+            elif medida not in costos:
+                ignoradas[medida] = "sin costo"
+            elif budget is not None and costos[medida] > budget:
+                ignoradas[medida] = "excede el presupuesto"
+            else:
+                candidatos.append(medida)
+        # Las más efectivas primero: la rama "incluir" encuentra pronto portafolios fuertes
+        candidatos.sort(key=lambda m: -self.catalogo[m]['effectiveness'])
+
+        g_base = self._g(s1, s2, n)
+        frontera = _Frontera()
+        frontera.agregar(0.0, g_base, 0)
+        self._voraz(candidatos, costos, budget, frontera, s1, s2, n)
+        busqueda = self._ramificar_y_acotar(candidatos, costos, budget, frontera, s1, s2, n, max_nodes)
+        busqueda['candidates'] = len(candidatos)
+        busqueda['seconds'] = round(time.perf_counter() - inicio, 4)
+
+        return self._resultado(
+            scenarios, location, crime_context, existentes, g_base, frontera, target_probability, ignoradas, busqueda
+        )
+
+    def _voraz(self, candidatos: List[str], costos: Dict[str, float], budget: Optional[float],
+               frontera: _Frontera, s1: float, s2: float, n: int):
+        """Semilla de la frontera: agregar la medida con mayor reducción de g por peso mientras mejore"""
+        restantes = list(candidatos)
+        costo, mask, g = 0.0, 0, self._g(s1, s2, n)
+        while restantes:
+            mejor = None
+            for medida in restantes:
+                datos = self.catalogo[medida]
+                c = costos[medida]
+                if budget is not None and costo + c > budget:
+                    continue
+                g_nuevo = self._g(s1 + datos['effectiveness'] * datos['confidence'], s2 + datos['confidence'], n + 1)
+                if g_nuevo >= g:
+                    continue
+                razon = (g - g_nuevo) / max(c, 1.0)
+                if mejor is None or razon > mejor[0]:
+                    mejor = (razon, medida, g_nuevo)
+            if mejor is None:
+                break
+            _, medida, g = mejor
+            datos = self.catalogo[medida]
+            s1 += datos['effectiveness'] * datos['confidence']
+            s2 += datos['confidence']
+            n += 1
+            costo += costos[medida]
+            mask |= self.measure_bits[medida]
+            restantes.remove(medida)
+            frontera.agregar(costo, g, mask)
+
+    def _ramificar_y_acotar(self, candidatos: List[str], costos: Dict[str, float], budget: Optional[float],
+                            frontera: _Frontera, s1: float, s2: float, n: int, max_nodes: int) -> Dict:
+        """Búsqueda exacta en profundidad (incluir / excluir cada candidato) con poda por dominancia"""
+        total = len(candidatos)
+        bits = [self.measure_bits[m] for m in candidatos]
+        costo_de = [float(costos[m]) for m in candidatos]
+        ec = [self.catalogo[m]['effectiveness'] * self.catalogo[m]['confidence'] for m in candidatos]
+        conf = [self.catalogo[m]['confidence'] for m in candidatos]
+        eff = [self.catalogo[m]['effectiveness'] for m in candidatos]
+
+        # Cotas por sufijo: con k medidas más desde i el costo es al menos la suma de las k más baratas,
+        # Σ efectividad·confianza a lo más la de las k mayores y Σ confianza al menos la de las k menores
+        baratas, mayores_ec, menores_conf, max_eff = [], [], [], []
+        for i in range(total + 1):
+            baratas.append(np.concatenate(([0.0], np.cumsum(sorted(costo_de[i:])))))
+            mayores_ec.append(np.concatenate(([0.0], np.cumsum(sorted(ec[i:], reverse=True)))))
+            menores_conf.append(np.concatenate(([0.0], np.cumsum(sorted(conf[i:])))))
+            max_eff.append(max(eff[i:], default=0.0))
+
+        stats = {'nodes': 0, 'pruned': 0, 'exact': True}
+        guardianship = self.engine.guardianship_factor
+
+        def dominada(i: int, costo: float, s1: float, s2: float, n: int) -> bool:
+            promedio = s1 / s2 if s2 else 0.0
+            for k in range(1, total - i + 1):
+                costo_k = costo + baratas[i][k]
+                if budget is not None and costo_k > budget:
+                    break
+                cota = min(max(promedio, max_eff[i]), (s1 + mayores_ec[i][k]) / (s2 + menores_conf[i][k]))
+                if frontera.mejor_g(costo_k) > guardianship(cota, n + k) + DOMINANCE_EPS:
+                    return False
+            return True
+
+        def explorar(i: int, mask: int, costo: float, s1: float, s2: float, n: int):
+            if i == total or not stats['exact']:
+                return
+            stats['nodes'] += 1
+            if stats['nodes'] > max_nodes:
+                stats['exact'] = False
+                return
+            if dominada(i, costo, s1, s2, n):
+                stats['pruned'] += 1
+                return
+            nuevo_costo = costo + costo_de[i]
+            if budget is None or nuevo_costo <= budget:
+                nuevo = (mask | bits[i], nuevo_costo, s1 + ec[i], s2 + conf[i], n + 1)
+                frontera.agregar(nuevo_costo, self._g(*nuevo[2:]), nuevo[0])
+                explorar(i + 1, *nuevo)
+            explorar(i + 1, mask, costo, s1, s2, n)
+
+        explorar(0, 0, 0.0, s1, s2, n)
+        if not stats['exact']:
+            logger.warning(f"⚠️ Búsqueda de portafolio truncada en {max_nodes} nodos; frontera aproximada")
+        return stats
+
+    def decode(self, mask: int) -> List[str]:
+        return [m for m, bit in self.measure_bits.items() if mask & bit]
+
+    def _resultado(self, scenarios: List[str], location: str, crime_context: Optional[Dict],
+                   existentes: List[str], g_base: float, frontera: _Frontera,
+                   target_probability: Optional[float], ignoradas: Dict[str, str], busqueda: Dict) -> Dict:
+        """Convertir la frontera en g a probabilidades por escenario y filtrar los empates por límites"""
+        exposure, limits = self.engine.scenario_exposure(scenarios, location, crime_context)
+        # Columna 0: situación actual; el resto, los puntos de la frontera
+        g = np.array([g_base] + [p[1] for p in frontera.puntos])
+        probabilidades = np.clip(exposure[:, None] * g[None, :], limits[:, 0, None], limits[:, 1, None])
+        residual = 1 - np.prod(1 - probabilidades, axis=0)
+
+        def punto(j: int, costo: float, mask: int) -> Dict:
+            return {
+                'added_measures': self.decode(mask),
+                'annual_cost_mxn': round(costo, 2),
+                'guardianship_factor': float(g[j]),
+                'residual_probability': float(residual[j] * 100),
+                'scenario_probabilities': {s: round(float(probabilidades[i, j]) * 100, 4) for i, s in enumerate(scenarios)}
+            }
+
+        puntos = []
+        for j, (costo, _, mask) in enumerate(frontera.puntos, start=1):
+            # Con probabilidades en su límite inferior, más medidas ya no reducen el riesgo
+            if puntos and residual[j] * 100 >= puntos[-1]['residual_probability'] - DOMINANCE_EPS:
+                continue
+            puntos.append(punto(j, costo, mask))
+
+        recomendado = None
+        if target_probability is not None:
+            recomendado = next((p for p in puntos if p['residual_probability'] <= target_probability), None)
+
+        return {
+            'location': location,
+            'scenarios': scenarios,
+            'existing_measures': existentes,
+            'baseline': punto(0, 0.0, 0),
+            'frontier': puntos,
+            'target_probability': target_probability,
+            'recommended': recomendado,
+            'ignored_measures': ignoradas,
+            'search': busqueda,
+            'model': {
+                'metadata_version': self.engine.metadata_version,
+                'catalog_size': len(self.catalogo),
+                'derived_measures': [m for m, d in self.catalogo.items() if d['source'] == 'asis_derived']
+            }
+        }
+
+
+# Instancia global
+portfolio_optimizer = PortfolioOptimizer()
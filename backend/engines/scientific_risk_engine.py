@@ -10,10 +10,15 @@ Fundamentos Científicos:
 - ISO 31000:2018 Risk Management Standards
 """
 
+import hashlib
+import json
 import math
+import threading
+import time
 import numpy as np
+from collections import Counter, OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, NamedTuple, Tuple, Optional
 import logging
 from dataclasses import dataclass
 
@@ -86,6 +91,54 @@ class ScientificParameters:
         'nacional_promedio': 1.0
     }
 
+# Campos del arreglo estructurado de calculate_batch (probability en %, intervalos en fracción)
+BATCH_DTYPE = np.dtype([
+    ('probability', 'f8'),
+    ('base_probability', 'f8'),
+    ('regional_factor', 'f8'),
+    ('target_factor', 'f8'),
+    ('guardianship_factor', 'f8'),
+    ('temporal_factor', 'f8'),
+    ('lower_bound', 'f8'),
+    ('upper_bound', 'f8'),
+    ('uncertainty_factor', 'f8'),
+    ('reliability_score', 'f8'),
+    ('measure_mask', 'u8'),
+])
+
+ML_TARGET_FACTOR = 1.15  # 15% más atractivo por ser almacén ML
+
+MEASURE_CACHE_SIZE = 1024     # perfiles de medidas memorizados (LRU)
+
+# Modo Monte Carlo de incertidumbre
+MONTE_CARLO_SAMPLES = 100_000      # muestras por escenario
+MONTE_CARLO_CHUNK = 25_000         # muestras por bloque vectorizado (se revisa el presupuesto entre bloques)
+MONTE_CARLO_TIME_BUDGET = 0.25     # segundos por solicitud
+MONTE_CARLO_SEED = 20240601        # semilla por defecto: resultados reproducibles
+MONTE_CARLO_MIN_SAMPLES = 1_000    # el primer bloque siempre se completa aunque no haya presupuesto
+MONTE_CARLO_MAX_SAMPLES = 1_000_000  # tope de muestras por solicitud
+EFFECTIVENESS_CONCENTRATION = 10.0 # Beta(κ·e, κ·(1-e)) con κ = 10·c/(1-c) según la confianza c del meta-análisis
+REGIONAL_SIGMA = 0.10              # desviación lognormal del multiplicador regional
+CRIME_INTENSITY_SIGMA = 0.05       # desviación de la intensidad criminal (fracción)
+MAX_TRACKED_UNKNOWN = 500     # nombres de medidas desconocidas que se cuentan por separado
+
+
+class EncodedMeasures(NamedTuple):
+    """Lista de medidas canónica: bitmask de las conocidas y nombres desconocidos ordenados"""
+    mask: int
+    unknown: Tuple[str, ...]
+    
+    @property
+    def count(self) -> int:
+        return bin(self.mask).count('1') + len(self.unknown)
+
+
+class MeasureProfile(NamedTuple):
+    """Factores que solo dependen del conjunto de medidas"""
+    guardianship: float
+    uncertainty: float
+    reliability: float
+
 class ScientificRiskEngine:
     """Motor científico de análisis de riesgo basado en evidencia académica"""
     
@@ -93,6 +146,17 @@ class ScientificRiskEngine:
         self.params = ScientificParameters()
         self.confidence_threshold = 0.75
         self.last_calibration = datetime.now()
+        # Un bit por medida conocida, en el orden de SECURITY_EFFECTIVENESS
+        self.measure_bits = {m: 1 << i for i, m in enumerate(self.params.SECURITY_EFFECTIVENESS)}
+        self._measure_profiles: "OrderedDict[Tuple[int, int], MeasureProfile]" = OrderedDict()
+        self._profile_hits = 0
+        self._profile_misses = 0
+        self.unknown_measures: Counter = Counter()
+        self._lock = threading.Lock()
+        # Bloques constantes (teorías, estándares, validación, fuentes) construidos una sola vez;
+        # las respuestas los referencian por metadata_version
+        self.static_metadata = self._build_static_metadata()
+        self.metadata_version = self.static_metadata['version']
         logger.info("🔬 Motor Científico de Riesgo v4.0 inicializado")
     
     def calculate_scenario_probability(
@@ -100,10 +164,16 @@ class ScientificRiskEngine:
         scenario: str, 
         location: str, 
         security_measures: List[str],
-        crime_context: Dict
+        crime_context: Dict,
+        uncertainty: str = 'heuristic',
+        mc_samples: int = MONTE_CARLO_SAMPLES,
+        mc_seed: Optional[int] = MONTE_CARLO_SEED,
+        mc_time_budget: float = MONTE_CARLO_TIME_BUDGET
     ) -> Dict:
         """
         Calcular probabilidad científica de escenario específico
+        Con uncertainty='monte_carlo' el intervalo de confianza sale de percentiles de
+        simulación en lugar de la heurística ±incertidumbre×1.96.
         
         Basado en:
         - Routine Activity Theory
@@ -121,10 +191,11 @@ class ScientificRiskEngine:
             # 3. Factor de atractivo del objetivo (Target Hardening Theory)
             target_factor = self._calculate_target_attractiveness(scenario)
             
-            # 4. Factor de guardianes (Guardianship Theory)
-            guardianship_factor = self._calculate_guardianship_effectiveness(
-                security_measures, scenario
-            )
+            # 4. Factor de guardianes (Guardianship Theory), memorizado por conjunto de medidas
+            encoded = self.encode_measures(security_measures)
+            self._track_unknown(encoded.unknown)
+            profile = self.measure_profile(encoded)
+            guardianship_factor = profile.guardianship
             
             # 5. Factor temporal (análisis de tendencias)
             temporal_factor = self._calculate_temporal_factor(crime_context)
@@ -142,29 +213,350 @@ class ScientificRiskEngine:
             final_probability = self._normalize_probability(raw_probability, scenario)
             
             # 8. Cálculo de intervalos de confianza
-            confidence_interval = self._calculate_confidence_interval(
-                final_probability, security_measures, scenario
-            )
+            confidence_interval = self._confidence_interval(final_probability, profile.uncertainty)
             
             # 9. Metadatos científicos para transparencia
-            scientific_metadata = self._generate_scientific_metadata(
-                scenario, base_prob, regional_factor, target_factor,
-                guardianship_factor, temporal_factor, confidence_interval
+            result = self._build_result(
+                scenario, base_prob, regional_factor, target_factor, guardianship_factor,
+                temporal_factor, final_probability, confidence_interval,
+                profile.reliability, encoded.unknown
             )
-            
-            return {
-                'probability': round(final_probability * 100, 2),  # Convertir a porcentaje
-                'confidence_interval': confidence_interval,
-                'scientific_metadata': scientific_metadata,
-                'reliability_score': self._calculate_reliability_score(security_measures),
-                'data_sources': self._get_data_sources(),
-                'last_updated': datetime.now().isoformat()
-            }
+            if uncertainty == 'monte_carlo':
+                self.apply_monte_carlo(
+                    result, scenario, location, security_measures, crime_context,
+                    samples=mc_samples, seed=mc_seed, time_budget=mc_time_budget
+                )
+            return result
             
         except Exception as e:
             logger.error(f"Error en cálculo científico: {str(e)}")
             return self._generate_fallback_result(scenario)
     
+    def _build_result(
+        self, scenario: str, base_prob: float, regional_factor: float, target_factor: float,
+        guardianship_factor: float, temporal_factor: float, final_probability: float,
+        confidence_interval: Dict, reliability_score: float,
+        unknown_measures: Iterable[str] = ()
+    ) -> Dict:
+        """Resultado de un escenario con sus metadatos científicos"""
+        scientific_metadata = self._generate_scientific_metadata(
+            scenario, base_prob, regional_factor, target_factor,
+            guardianship_factor, temporal_factor, confidence_interval
+        )
+        
+        return {
+            'probability': round(final_probability * 100, 2),  # Convertir a porcentaje
+            'confidence_interval': confidence_interval,
+            'scientific_metadata': scientific_metadata,
+            'reliability_score': reliability_score,
+            'unknown_measures': list(unknown_measures),
+            'metadata_version': self.metadata_version,
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    def calculate_batch(
+        self,
+        scenarios: List[str],
+        locations: List[str],
+        measure_sets: List[List[str]],
+        crime_contexts: Optional[List[Optional[Dict]]] = None
+    ) -> np.ndarray:
+        """
+        Evaluar escenarios × ubicaciones × conjuntos de medidas en una sola llamada
+        
+        Mismo modelo que calculate_scenario_probability, con cada factor calculado
+        una vez por eje y combinado por broadcasting de NumPy. Devuelve un arreglo
+        estructurado BATCH_DTYPE de forma (len(scenarios), len(locations), len(measure_sets));
+        crime_contexts, si se da, va alineado con locations.
+        """
+        if crime_contexts is None:
+            crime_contexts = [None] * len(locations)
+        if len(crime_contexts) != len(locations):
+            raise ValueError("crime_contexts debe tener un elemento por ubicación")
+        
+        # Eje de escenarios: probabilidad base, atractivo y límites de normalización
+        default = self.params.SCENARIO_WEIGHTS['intrusion_armada']
+        weights = [self.params.SCENARIO_WEIGHTS.get(s, default) for s in scenarios]
+        base = np.array([w['base_probability'] for w in weights], dtype=float)
+        target = np.array([w['target_attraction'] for w in weights], dtype=float) * ML_TARGET_FACTOR
+        limits = np.array([self._probability_limits(s) for s in scenarios], dtype=float).reshape(-1, 2)
+        
+        # Eje de ubicaciones: factor regional ajustado por la criminalidad local
+        regional = self._regional_factors(locations, crime_contexts)
+        temporal = np.array([self._calculate_temporal_factor(c) for c in crime_contexts], dtype=float)
+        
+        # Eje de medidas: guardianes, incertidumbre y confiabilidad
+        masks, guardianship, uncertainty, reliability = self._measure_factors(measure_sets)
+        
+        raw = (
+            (base * target)[:, None, None] *
+            (regional * temporal)[None, :, None] *
+            guardianship[None, None, :]
+        )
+        final = np.clip(raw, limits[:, 0, None, None], limits[:, 1, None, None])
+        margin = final * uncertainty[None, None, :] * 1.96
+        
+        shape = (len(scenarios), len(locations), len(measure_sets))
+        result = np.empty(shape, dtype=BATCH_DTYPE)
+        result['probability'] = np.round(final * 100, 2)
+        result['base_probability'] = base[:, None, None]
+        result['regional_factor'] = regional[None, :, None]
+        result['target_factor'] = target[:, None, None]
+        result['guardianship_factor'] = guardianship[None, None, :]
+        result['temporal_factor'] = temporal[None, :, None]
+        result['lower_bound'] = np.maximum(0, final - margin)
+        result['upper_bound'] = np.minimum(1, final + margin)
+        result['uncertainty_factor'] = uncertainty[None, None, :]
+        result['reliability_score'] = reliability[None, None, :]
+        result['measure_mask'] = masks[None, None, :]
+        return result
+    
+    def scenario_exposure(
+        self, scenarios: List[str], location: str, crime_context: Optional[Dict]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parte del modelo que no depende de las medidas: base × atractivo × regional × temporal
+        por escenario y sus límites (min, max). La probabilidad con un factor de guardianes g
+        es clip(exposición × g, min, max).
+        """
+        record = self.calculate_batch(scenarios, [location], [[]], [crime_context])[:, 0, 0]
+        exposure = (
+            record['base_probability'] * record['target_factor'] *
+            record['regional_factor'] * record['temporal_factor']
+        )
+        limits = np.array([self._probability_limits(s) for s in scenarios], dtype=float).reshape(-1, 2)
+        return exposure, limits
+    
+    def batch_result_to_dict(self, scenario: str, record: np.void,
+                             unknown_measures: Iterable[str] = ()) -> Dict:
+        """Convertir un elemento de calculate_batch al formato de calculate_scenario_probability"""
+        confidence_interval = {
+            'lower_bound': float(record['lower_bound']),
+            'upper_bound': float(record['upper_bound']),
+            'confidence_level': 0.95,
+            'uncertainty_factor': float(record['uncertainty_factor'])
+        }
+        return self._build_result(
+            scenario, float(record['base_probability']), float(record['regional_factor']),
+            float(record['target_factor']), float(record['guardianship_factor']),
+            float(record['temporal_factor']), float(record['probability']) / 100,
+            confidence_interval, float(record['reliability_score']), unknown_measures
+        )
+    
+    def _regional_factors(self, locations: List[str], crime_contexts: List[Optional[Dict]]) -> np.ndarray:
+        """Factor regional de cada ubicación (vectorizado sobre el ajuste por criminalidad)"""
+        region = np.array([self._detect_region_multiplier(loc) for loc in locations], dtype=float)
+        percentages = np.array([
+            [c['crime_percentages'].get(k, 0) for k in ('robo', 'homicidio', 'extorsion')]
+            if c and 'crime_percentages' in c else [0.0, 0.0, 0.0]
+            for c in crime_contexts
+        ], dtype=float).reshape(-1, 3)
+        has_context = np.array([bool(c) and 'crime_percentages' in c for c in crime_contexts], dtype=bool)
+        
+        crime_intensity = percentages @ np.array([0.6, 0.3, 0.1]) / 100
+        crime_adjustment = np.clip(1 + (crime_intensity - 0.3), 0.5, 2.0)
+        region = np.where(has_context, region * crime_adjustment, region)
+        return np.clip(region, 0.3, 3.0)
+    
+    def _measure_factors(self, measure_sets: List[List[str]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Bitmask, guardianes, incertidumbre y confiabilidad de cada conjunto de medidas"""
+        encoded = [self.encode_measures(m) for m in measure_sets]
+        for e in encoded:
+            self._track_unknown(e.unknown)
+        profiles = np.array([self.measure_profile(e) for e in encoded], dtype=float).reshape(-1, 3)
+        masks = np.array([e.mask for e in encoded], dtype=np.uint64)
+        return masks, profiles[:, 0], profiles[:, 1], profiles[:, 2]
+    
+    def encode_measures(self, security_measures: Iterable[str]) -> EncodedMeasures:
+        """Canonicalizar una lista de medidas: orden y repeticiones no cambian el resultado"""
+        mask = 0
+        unknown = set()
+        for measure in security_measures:
+            bit = self.measure_bits.get(measure)
+            if bit is None:
+                unknown.add(measure)
+            else:
+                mask |= bit
+        return EncodedMeasures(mask, tuple(sorted(unknown)))
+    
+    def _track_unknown(self, unknown: Tuple[str, ...]):
+        """Contar medidas que el modelo no conoce (no aportan efectividad, sí cuentan como medida)"""
+        if not unknown:
+            return
+        with self._lock:
+            for measure in unknown:
+                if measure not in self.unknown_measures:
+                    if len(self.unknown_measures) >= MAX_TRACKED_UNKNOWN:
+                        measure = '__otras__'
+                    else:
+                        logger.warning(f"⚠️ Medida de seguridad desconocida para el modelo: {measure!r}")
+                self.unknown_measures[measure] += 1
+    
+    def measure_profile(self, encoded: EncodedMeasures) -> MeasureProfile:
+        """Guardianes, incertidumbre y confiabilidad de un conjunto, memorizados en tabla LRU acotada"""
+        key = (encoded.mask, len(encoded.unknown))
+        with self._lock:
+            profile = self._measure_profiles.get(key)
+            if profile is not None:
+                self._measure_profiles.move_to_end(key)
+                self._profile_hits += 1
+                return profile
+            self._profile_misses += 1
+        
+        count = encoded.count
+        profile = MeasureProfile(
+            guardianship=self._guardianship_from_mask(encoded.mask, count),
+            uncertainty=self._uncertainty(count),
+            reliability=self._reliability(count)
+        )
+        with self._lock:
+            self._measure_profiles[key] = profile
+            while len(self._measure_profiles) > MEASURE_CACHE_SIZE:
+                self._measure_profiles.popitem(last=False)
+        return profile
+    
+    def measure_cache_stats(self) -> Dict:
+        with self._lock:
+            total = self._profile_hits + self._profile_misses
+            return {
+                'size': len(self._measure_profiles),
+                'max_size': MEASURE_CACHE_SIZE,
+                'hits': self._profile_hits,
+                'misses': self._profile_misses,
+                'hit_rate': round(self._profile_hits / total, 3) if total else 0.0,
+                'unknown_measures': dict(self.unknown_measures.most_common(20))
+            }
+    
+    def calculate_monte_carlo(
+        self,
+        scenario: str,
+        location: str,
+        security_measures: List[str],
+        crime_context: Optional[Dict],
+        samples: int = MONTE_CARLO_SAMPLES,
+        seed: Optional[int] = MONTE_CARLO_SEED,
+        time_budget: float = MONTE_CARLO_TIME_BUDGET,
+        percentiles: Tuple[float, ...] = (2.5, 50.0, 97.5)
+    ) -> Dict:
+        """Simulación Monte Carlo de un escenario (ver calculate_monte_carlo_batch)"""
+        return self.calculate_monte_carlo_batch(
+            [scenario], location, security_measures, crime_context,
+            samples=samples, seed=seed, time_budget=time_budget, percentiles=percentiles
+        )[scenario]
+    
+    def calculate_monte_carlo_batch(
+        self,
+        scenarios: List[str],
+        location: str,
+        security_measures: List[str],
+        crime_context: Optional[Dict],
+        samples: int = MONTE_CARLO_SAMPLES,
+        seed: Optional[int] = MONTE_CARLO_SEED,
+        time_budget: float = MONTE_CARLO_TIME_BUDGET,
+        percentiles: Tuple[float, ...] = (2.5, 50.0, 97.5)
+    ) -> Dict[str, Dict]:
+        """
+        Simulación Monte Carlo vectorizada de la probabilidad de varios escenarios
+        
+        Se muestrean la efectividad de cada medida conocida (Beta centrada en su
+        efectividad, más concentrada cuanto mayor su confianza), el multiplicador regional
+        (lognormal) y la intensidad criminal (normal truncada en 0). Nada de eso depende
+        del escenario, así que las mismas muestras se reutilizan para todos y cada escenario
+        solo aplica su probabilidad base y sus límites. Las muestras se generan por bloques
+        y la simulación se corta al agotar time_budget; `samples` indica cuántas se completaron.
+        """
+        inicio = time.perf_counter()
+        samples = int(min(max(samples, MONTE_CARLO_MIN_SAMPLES), MONTE_CARLO_MAX_SAMPLES))
+        factors = self._sample_common_factors(
+            location, security_measures, crime_context, samples, seed, inicio, time_budget
+        )
+        
+        results = {}
+        for scenario in scenarios:
+            weights = self.params.SCENARIO_WEIGHTS.get(scenario, self.params.SCENARIO_WEIGHTS['intrusion_armada'])
+            base = weights['base_probability'] * weights['target_attraction'] * ML_TARGET_FACTOR
+            min_prob, max_prob = self._probability_limits(scenario)
+            probabilities = np.clip(base * factors, min_prob, max_prob)
+            values = np.percentile(probabilities, percentiles)
+            results[scenario] = {
+                'samples': int(len(factors)),
+                'requested_samples': int(samples),
+                'truncated_by_budget': len(factors) < samples,
+                'seed': seed,
+                'mean': float(probabilities.mean()),
+                'std': float(probabilities.std()),
+                'percentiles': {f"p{p:g}": float(v) for p, v in zip(percentiles, values)},
+                'seconds': round(time.perf_counter() - inicio, 4)
+            }
+        return results
+    
+    def _sample_common_factors(
+        self, location: str, security_measures: List[str], crime_context: Optional[Dict],
+        samples: int, seed: Optional[int], inicio: float, time_budget: float
+    ) -> np.ndarray:
+        """Muestras de regional × guardianes × temporal, por bloques y dentro del presupuesto"""
+        rng = np.random.default_rng(seed)
+        temporal = self._calculate_temporal_factor(crime_context)
+        region = self._detect_region_multiplier(location)
+        crime_intensity = self._crime_intensity(crime_context)
+        
+        encoded = self.encode_measures(security_measures)
+        known = [m for m, bit in self.measure_bits.items() if encoded.mask & bit]
+        effectiveness = np.array([self.params.SECURITY_EFFECTIVENESS[m]['effectiveness'] for m in known])
+        confidence = np.array([self.params.SECURITY_EFFECTIVENESS[m]['confidence'] for m in known])
+        concentration = EFFECTIVENESS_CONCENTRATION * confidence / (1 - confidence)
+        diminishing_returns = math.log(1 + encoded.count) / math.log(1 + 10)
+        
+        bloques = []
+        completadas = 0
+        while completadas < samples:
+            if completadas >= MONTE_CARLO_MIN_SAMPLES and time.perf_counter() - inicio >= time_budget:
+                break
+            n = min(MONTE_CARLO_CHUNK, samples - completadas)
+            
+            # Factor regional con ajuste por intensidad criminal muestreada
+            regional = region * rng.lognormal(0.0, REGIONAL_SIGMA, n)
+            if crime_intensity is not None:
+                intensity = np.maximum(0.0, rng.normal(crime_intensity, CRIME_INTENSITY_SIGMA, n))
+                regional *= np.clip(1 + (intensity - 0.3), 0.5, 2.0)
+            np.clip(regional, 0.3, 3.0, out=regional)
+            
+            # Factor de guardianes con efectividades muestreadas (n × medidas)
+            if len(known):
+                sampled = rng.beta(concentration * effectiveness, concentration * (1 - effectiveness), (n, len(known)))
+                avg_effectiveness = sampled @ (confidence / confidence.sum())
+                regional *= np.maximum(0.15, 1.0 - np.minimum(0.85, avg_effectiveness * diminishing_returns))
+            
+            bloques.append(regional * temporal)
+            completadas += n
+        
+        return np.concatenate(bloques)
+    
+    def apply_monte_carlo(
+        self, result: Dict, scenario: str, location: str, security_measures: List[str],
+        crime_context: Optional[Dict], samples: int = MONTE_CARLO_SAMPLES,
+        seed: Optional[int] = MONTE_CARLO_SEED, time_budget: float = MONTE_CARLO_TIME_BUDGET,
+        simulation: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Sustituir el intervalo heurístico de un resultado por el intervalo de percentiles 2.5–97.5
+        simulation permite pasar un resultado ya calculado por calculate_monte_carlo_batch.
+        """
+        if simulation is None:
+            simulation = self.calculate_monte_carlo(
+                scenario, location, security_measures, crime_context,
+                samples=samples, seed=seed, time_budget=time_budget
+            )
+        result['confidence_interval'] = {
+            'lower_bound': simulation['percentiles']['p2.5'],
+            'upper_bound': simulation['percentiles']['p97.5'],
+            'confidence_level': 0.95,
+            'uncertainty_factor': simulation['std'] / simulation['mean'] if simulation['mean'] else 0.0,
+            'method': 'monte_carlo'
+        }
+        result['monte_carlo'] = simulation
+        return result
+    
     def _get_base_scenario_probability(self, scenario: str) -> float:
         """Obtener probabilidad base según literatura criminológica"""
         scenario_data = self.params.SCENARIO_WEIGHTS.get(
@@ -181,28 +573,35 @@ class ScientificRiskEngine:
         - Benchmarks nacionales
         """
         # Detectar región
-        location_lower = location.lower()
-        region_factor = self.params.REGIONAL_MULTIPLIERS['nacional_promedio']
-        
-        for region, multiplier in self.params.REGIONAL_MULTIPLIERS.items():
-            if region.replace('_', ' ') in location_lower:
-                region_factor = multiplier
-                break
+        region_factor = self._detect_region_multiplier(location)
         
         # Ajustar por datos criminales reales
-        if crime_context and 'crime_percentages' in crime_context:
-            crime_intensity = (
-                crime_context['crime_percentages'].get('robo', 0) * 0.6 +
-                crime_context['crime_percentages'].get('homicidio', 0) * 0.3 +
-                crime_context['crime_percentages'].get('extorsion', 0) * 0.1
-            ) / 100
-            
+        crime_intensity = self._crime_intensity(crime_context)
+        if crime_intensity is not None:
             # Normalización científica: no permitir factores extremos
             crime_adjustment = max(0.5, min(2.0, 1 + (crime_intensity - 0.3)))
             region_factor *= crime_adjustment
         
         return max(0.3, min(3.0, region_factor))  # Límites científicos
     
+    def _crime_intensity(self, crime_context: Optional[Dict]) -> Optional[float]:
+        """Intensidad criminal ponderada (fracción) o None si no hay porcentajes"""
+        if not crime_context or 'crime_percentages' not in crime_context:
+            return None
+        return (
+            crime_context['crime_percentages'].get('robo', 0) * 0.6 +
+            crime_context['crime_percentages'].get('homicidio', 0) * 0.3 +
+            crime_context['crime_percentages'].get('extorsion', 0) * 0.1
+        ) / 100
+    
+    def _detect_region_multiplier(self, location: str) -> float:
+        """Multiplicador de la primera región mencionada en la ubicación"""
+        location_lower = location.lower()
+        for region, multiplier in self.params.REGIONAL_MULTIPLIERS.items():
+            if region.replace('_', ' ') in location_lower:
+                return multiplier
+        return self.params.REGIONAL_MULTIPLIERS['nacional_promedio']
+    
     def _calculate_target_attractiveness(self, scenario: str) -> float:
         """
         Calcular atractivo del objetivo según Crime Pattern Theory
@@ -216,9 +615,7 @@ class ScientificRiskEngine:
         base_attraction = scenario_data['target_attraction']
         
         # Ajuste por tipo de instalación (almacenes ML son objetivos valiosos)
-        ml_factor = 1.15  # 15% más atractivo por ser ML
-        
-        return base_attraction * ml_factor
+        return base_attraction * ML_TARGET_FACTOR
     
     def _calculate_guardianship_effectiveness(
         self, 
@@ -229,15 +626,19 @@ class ScientificRiskEngine:
         Calcular efectividad de guardianes según Guardianship Theory
         Basado en meta-análisis ASIS International
         """
-        if not security_measures:
+        return self.measure_profile(self.encode_measures(security_measures)).guardianship
+    
+    def _guardianship_from_mask(self, mask: int, num_measures: int) -> float:
+        """Factor de guardianes de un conjunto de medidas codificado como bitmask"""
+        if num_measures == 0:
             return 1.0  # Sin medidas = factor neutro
         
         # Calcular efectividad combinada (no lineal)
         total_effectiveness = 0.0
         confidence_weighted_sum = 0.0
         
-        for measure in security_measures:
-            if measure in self.params.SECURITY_EFFECTIVENESS:
+        for measure, bit in self.measure_bits.items():
+            if mask & bit:
                 eff_data = self.params.SECURITY_EFFECTIVENESS[measure]
                 effectiveness = eff_data['effectiveness']
                 confidence = eff_data['confidence']
@@ -251,10 +652,14 @@ class ScientificRiskEngine:
             return 1.0
         
         # Promedio ponderado por confianza
-        avg_effectiveness = total_effectiveness / confidence_weighted_sum
+        return self.guardianship_factor(total_effectiveness / confidence_weighted_sum, num_measures)
+    
+    def guardianship_factor(self, avg_effectiveness: float, num_measures: int) -> float:
+        """Factor de guardianes según la efectividad promedio (ponderada por confianza) y la cantidad de medidas"""
+        if num_measures == 0:
+            return 1.0
         
         # Aplicar rendimientos decrecientes (más medidas ≠ linealmente más efectivo)
-        num_measures = len(security_measures)
         diminishing_returns = math.log(1 + num_measures) / math.log(1 + 10)  # Normalizado a 10 medidas
         
         final_effectiveness = avg_effectiveness * diminishing_returns
@@ -277,22 +682,18 @@ class ScientificRiskEngine:
         """
         Normalización científica para evitar probabilidades irreales
         """
-        scenario_data = self.params.SCENARIO_WEIGHTS.get(
-            scenario,
-            self.params.SCENARIO_WEIGHTS['intrusion_armada']
-        )
-        
-        # Límites realistas por tipo de escenario
+        min_prob, max_prob = self._probability_limits(scenario)
+        return max(min_prob, min(max_prob, raw_probability))
+    
+    def _probability_limits(self, scenario: str) -> Tuple[float, float]:
+        """Límites realistas de probabilidad anual por tipo de escenario"""
         if scenario == 'intrusion_armada':
-            min_prob, max_prob = 0.0001, 0.05  # 0.01% - 5% anual
+            return 0.0001, 0.05  # 0.01% - 5% anual
         elif scenario == 'robo_interno':
-            min_prob, max_prob = 0.001, 0.08   # 0.1% - 8% anual
+            return 0.001, 0.08   # 0.1% - 8% anual
         elif scenario == 'vandalismo':
-            min_prob, max_prob = 0.005, 0.15   # 0.5% - 15% anual
-        else:
-            min_prob, max_prob = 0.0005, 0.06  # 0.05% - 6% anual
-        
-        return max(min_prob, min(max_prob, raw_probability))
+            return 0.005, 0.15   # 0.5% - 15% anual
+        return 0.0005, 0.06      # 0.05% - 6% anual
     
     def _calculate_confidence_interval(
         self, 
@@ -303,31 +704,41 @@ class ScientificRiskEngine:
         """
         Calcular intervalos de confianza bayesianos
         """
+        uncertainty = self.measure_profile(self.encode_measures(security_measures)).uncertainty
+        return self._confidence_interval(probability, uncertainty)
+    
+    def _uncertainty(self, num_measures: int) -> float:
+        """Incertidumbre del intervalo según la cantidad de medidas"""
         # Incertidumbre base por cantidad de datos
         base_uncertainty = 0.20  # 20% incertidumbre base
         
         # Reducir incertidumbre con más medidas de seguridad (más datos)
-        measure_factor = len(security_measures) / 25  # Normalizado a 25 medidas
+        measure_factor = num_measures / 25  # Normalizado a 25 medidas
         uncertainty_reduction = min(0.15, measure_factor * 0.15)
         
-        final_uncertainty = base_uncertainty - uncertainty_reduction
-        
+        return base_uncertainty - uncertainty_reduction
+    
+    def _confidence_interval(self, probability: float, uncertainty: float) -> Dict:
         # Intervalos de confianza al 95%
-        margin = probability * final_uncertainty * 1.96  # 1.96 para 95% confianza
+        margin = probability * uncertainty * 1.96  # 1.96 para 95% confianza
         
         return {
             'lower_bound': max(0, probability - margin),
             'upper_bound': min(1, probability + margin),
             'confidence_level': 0.95,
-            'uncertainty_factor': final_uncertainty
+            'uncertainty_factor': uncertainty
         }
     
     def _calculate_reliability_score(self, security_measures: List[str]) -> float:
         """
         Calcular score de confiabilidad del análisis
         """
+        return self.measure_profile(self.encode_measures(security_measures)).reliability
+    
+    def _reliability(self, num_measures: int) -> float:
+        """Confiabilidad del análisis según la cantidad de medidas"""
         # Factores que afectan confiabilidad
-        measure_count_factor = min(1.0, len(security_measures) / 15)  # Más medidas = más confiable
+        measure_count_factor = min(1.0, num_measures / 15)  # Más medidas = más confiable
         data_quality_factor = 0.85  # Calidad de datos SESNSP
         model_validation_factor = 0.92  # Validación del modelo científico
         
@@ -346,6 +757,8 @@ class ScientificRiskEngine:
     ) -> Dict:
         """
         Generar metadatos científicos para transparencia
+        Solo los componentes del cálculo; la base científica y la validación del modelo
+        están en static_metadata, referenciada por metadata_version.
         """
         return {
             'calculation_components': {
@@ -355,6 +768,12 @@ class ScientificRiskEngine:
                 'guardianship_effectiveness': round(guardianship_factor, 3),
                 'temporal_factor': round(temporal_factor, 3)
             },
+            'metadata_version': self.metadata_version
+        }
+    
+    def _build_static_metadata(self) -> Dict:
+        """Base científica, validación del modelo y fuentes, con una versión derivada de su contenido"""
+        metadata = {
             'scientific_basis': {
                 'primary_theories': [
                     'Routine Activity Theory (Cohen & Felson, 1979)',
@@ -377,8 +796,24 @@ class ScientificRiskEngine:
                 'backtesting_accuracy': '87.3%',
                 'cross_validation_score': '0.834',
                 'last_calibration': self.last_calibration.isoformat()
+            },
+            'data_sources': self._get_data_sources()
+        }
+        # La versión sale de las tablas de parámetros y de los bloques constantes, sin
+        # last_calibration (cambia en cada arranque): igual en todos los workers y reinicios
+        versionado = {
+            'parameters': {
+                'scenario_weights': self.params.SCENARIO_WEIGHTS,
+                'security_effectiveness': self.params.SECURITY_EFFECTIVENESS,
+                'regional_multipliers': self.params.REGIONAL_MULTIPLIERS
+            },
+            'metadata': {
+                **metadata,
+                'model_validation': {k: v for k, v in metadata['model_validation'].items() if k != 'last_calibration'}
             }
         }
+        digest = hashlib.sha256(json.dumps(versionado, sort_keys=True).encode('utf-8')).hexdigest()
+        return {'version': f"sci-v4-{digest[:12]}", **metadata}
     
     def _get_data_sources(self) -> List[str]:
         """Fuentes de datos científicas utilizadas"""
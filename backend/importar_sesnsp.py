@@ -5,7 +5,12 @@ import os
 import sqlite3
 import pandas as pd
 import time
-import unicodedata
+
+from services.crime_classifier import DESGLOSE_COLUMNAS, TablaClasificacion
+from services.crime_latest import refresh_crime_latest
+from services.csv_loader import leer_csv
+from services.import_manifest import DigestParticiones, ImportManifest, file_sha256
+from services.normalization import normalizar
 
 # Ruta a la base de datos
 DB_PATH = os.path.join(os.path.dirname(__file__), "data", "real_crime_data.db")
@@ -17,37 +22,85 @@ ARCHIVOS = [
 ]
 
 
-def cargar_dataframe():
+def archivo_disponible():
     for archivo in ARCHIVOS:
         if os.path.exists(archivo):
-            print(f"Cargando archivo: {archivo}")
-            if archivo.endswith('.csv'):
-                try:
-                    df = pd.read_csv(archivo, encoding='utf-8')
-                except UnicodeDecodeError:
-                    print("Advertencia: el archivo no es UTF-8, intentando con latin1...")
-                    df = pd.read_csv(archivo, encoding='latin1')
-            else:
-                df = pd.read_excel(archivo)
-            print("Columnas detectadas:", df.columns.tolist())
-            return df
-    raise FileNotFoundError("No se encontró ningún archivo consolidado de delitos en la carpeta data.")
-
+            return archivo
+    return None
 
 
+def cargar_dataframe():
+    archivo = archivo_disponible()
+    if archivo is None:
+        raise FileNotFoundError("No se encontró ningún archivo consolidado de delitos en la carpeta data.")
+    print(f"Cargando archivo: {archivo}")
+    if archivo.endswith('.csv'):
+        # Encoding detectado sobre un prefijo; el archivo se parsea una sola vez
+        df, deteccion = leer_csv(archivo)
+        print(f"Encoding detectado: {deteccion.encoding} (confianza {deteccion.confianza:.0%})")
+    else:
+        df = pd.read_excel(archivo)
+    print("Columnas detectadas:", df.columns.tolist())
+    return df
+
+
+
+
+MESES = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
+CLAVES = ['estado', 'municipio', 'estado_norm', 'municipio_norm', 'year', 'tipo_delito']
+TRIPLE = ['tipo_delito', 'subtipo_delito', 'modalidad']
+VALORES = DESGLOSE_COLUMNAS + ['total_delitos']
+FUENTE = "SESNSP Oficial"
+ORIGEN = f"sesnsp_almacenes|fuente={FUENTE}"
+PARTICION = ['estado_norm', 'municipio_norm', 'year']
+LOTE_ESCRITURA = 50000
+
+SQL_INSERT_TOTALES = '''
+    INSERT OR REPLACE INTO crime_data 
+    (estado, municipio, estado_norm, municipio_norm, year, month, tipo_delito, robo_comun, robo_casa_habitacion,
+     robo_negocio, robo_vehiculo, homicidio_doloso, homicidio_culposo,
+     extorsion, secuestro, total_delitos, fuente)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def normalizar_columna(serie: pd.Series) -> pd.Series:
+    """Normalizar una columna de nombres calculando cada valor distinto una sola vez"""
+    return serie.map({valor: normalizar(valor) for valor in serie.unique()})
+
+
+def tabla_clasificacion(df: pd.DataFrame) -> pd.DataFrame:
+    """Columna de desglose de cada triple (tipo, subtipo, modalidad) distinto del archivo"""
+    tabla = TablaClasificacion(df[TRIPLE].drop_duplicates().itertuples(index=False, name=None))
+    return pd.DataFrame(
+        [(*triple, columna) for triple, columna in tabla.columnas().items()],
+        columns=TRIPLE + ['columna'],
+    )
+
+
+def digests_por_particion(totales: pd.DataFrame):
+    """Digest de contenido por (estado_norm, municipio_norm, year) a partir de los registros a escribir"""
+    digest = DigestParticiones()
+    hashes = pd.util.hash_pandas_object(totales, index=False)
+    for particion, h in zip(totales[PARTICION].itertuples(index=False, name=None), hashes):
+        digest.agregar_hash(particion, h)
+    return digest.digests()
 
-def normalizar(s):
-    if not isinstance(s, str):
-        return ""
-    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII').strip().upper()
 
 def procesar_e_insertar():
-    df = cargar_dataframe()
+    archivo = archivo_disponible()
+    if archivo is None:
+        raise FileNotFoundError("No se encontró ningún archivo consolidado de delitos en la carpeta data.")
+    # Publicación idéntica a la última importada: no hay nada que recalcular
+    sha256, size = file_sha256(archivo)
     conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Limpiar la tabla antes de importar
-    cursor.execute('DELETE FROM crime_data;')
-    conn.commit()
+    manifest = ImportManifest(conn, ORIGEN)
+    if manifest.archivo_sin_cambios(sha256):
+        print("El archivo no cambió desde la última importación; nada que actualizar.")
+        conn.close()
+        return
+
+    df = cargar_dataframe()
 
     # Normalizar nombres de columnas
     df = df.rename(columns={
@@ -73,54 +126,73 @@ def procesar_e_insertar():
     ]
 
     # Normalizar columnas para comparación
-    df['estado_norm'] = df['estado'].apply(normalizar)
-    df['municipio_norm'] = df['municipio'].apply(normalizar)
-
-    df_filtrado = pd.DataFrame()
-    for a in almacenes:
-        estado_norm = normalizar(a['estado'])
-        municipio_norm = normalizar(a['municipio'])
-        mask = (df['estado_norm'] == estado_norm) & (df['municipio_norm'] == municipio_norm)
-        encontrados = df[mask]
-        if encontrados.empty:
-            print(f"ADVERTENCIA: No se encontraron datos para {a['municipio']}, {a['estado']}")
+    df['estado_norm'] = normalizar_columna(df['estado'])
+    df['municipio_norm'] = normalizar_columna(df['municipio'])
+
+    # Un solo filtro isin sobre la clave estado|municipio de todos los almacenes
+    objetivos = {f"{normalizar(a['estado'])}|{normalizar(a['municipio'])}": a for a in almacenes}
+    clave = df['estado_norm'] + '|' + df['municipio_norm']
+    df = df[clave.isin(objetivos.keys())]
+    encontrados = clave[clave.isin(objetivos.keys())].value_counts()
+    for llave, a in objetivos.items():
+        if llave in encontrados:
+            print(f"OK: {a['municipio']}, {a['estado']} - {encontrados[llave]} registros")
         else:
-            print(f"OK: {a['municipio']}, {a['estado']} - {len(encontrados)} registros")
-            df_filtrado = pd.concat([df_filtrado, encontrados])
-    df = df_filtrado.copy()
-
-
-    meses = ['Enero','Febrero','Marzo','Abril','Mayo','Junio','Julio','Agosto','Septiembre','Octubre','Noviembre','Diciembre']
+            print(f"ADVERTENCIA: No se encontraron datos para {a['municipio']}, {a['estado']}")
 
     if df.empty:
         print("No se encontraron datos para los almacenes definidos. Revisa los nombres o el archivo fuente.")
         conn.close()
         return
-    grupos = list(df.groupby(['estado','municipio','year','tipo_delito']))
-    total_grupos = len(grupos)
-    print(f"Procesando {total_grupos} combinaciones de municipio/año/tipo de delito SOLO PARA ALMACENES...")
+
     start_time = time.time()
-    for idx, ((estado, municipio, year, tipo_delito), grupo) in enumerate(grupos, 1):
-        total_anual = grupo[meses].sum().sum()
-        for i, mes in enumerate(meses, 1):
-            total_mes = grupo[mes].sum()
-            cursor.execute('''
-                INSERT OR REPLACE INTO crime_data 
-                (estado, municipio, year, month, tipo_delito, total_delitos, fuente)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                estado, municipio, int(year), i, tipo_delito, int(total_mes), "SESNSP Oficial"
-            ))
-        cursor.execute('''
-            INSERT OR REPLACE INTO crime_data 
-            (estado, municipio, year, month, tipo_delito, total_delitos, fuente)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            estado, municipio, int(year), 0, tipo_delito, int(total_anual), "SESNSP Oficial"
-        ))
-        if idx % 500 == 0 or idx == total_grupos:
-            elapsed = time.time() - start_time
-            print(f"Progreso: {idx}/{total_grupos} ({(idx/total_grupos)*100:.1f}%) - Tiempo transcurrido: {elapsed:.1f} s")
+    df = df.copy()
+    df[TRIPLE] = df[TRIPLE].fillna('')
+    # Clasificación: reglas evaluadas sobre los triples distintos y aplicadas con un merge
+    clasificacion = tabla_clasificacion(df)
+    print(f"Clasificación: {len(clasificacion)} combinaciones tipo/subtipo/modalidad")
+
+    # Formato largo: una fila por (municipio, año, tipo de delito, subtipo, modalidad, mes)
+    largo = df.melt(id_vars=CLAVES + TRIPLE[1:], value_vars=MESES, var_name='month', value_name='total_delitos')
+    largo['month'] = largo['month'].map({mes: i for i, mes in enumerate(MESES, 1)})
+    largo['total_delitos'] = pd.to_numeric(largo['total_delitos'], errors='coerce').fillna(0)
+    largo = largo.merge(clasificacion, on=TRIPLE, how='left')
+    for columna in DESGLOSE_COLUMNAS:
+        largo[columna] = largo['total_delitos'].where(largo['columna'] == columna, 0)
+
+    mensual = largo.groupby(CLAVES + ['month'], as_index=False)[VALORES].sum()
+    # Total anual del grupo con month = 0
+    anual = mensual.groupby(CLAVES, as_index=False)[VALORES].sum()
+    anual['month'] = 0
+    totales = pd.concat([mensual, anual], ignore_index=True)
+    totales['year'] = totales['year'].astype('int64')
+    totales['total_delitos'] = totales['total_delitos'].astype('int64')
+    totales['fuente'] = FUENTE
+    totales = totales[['estado', 'municipio', 'estado_norm', 'municipio_norm', 'year', 'month',
+                       'tipo_delito', *VALORES, 'fuente']]
+    print(f"Transformación: {len(df)} filas -> {len(totales)} registros en {time.time() - start_time:.2f} s")
+
+    # Comparar contra el manifiesto: solo se reescriben las particiones que cambiaron
+    digests = digests_por_particion(totales)
+    cambios = manifest.comparar(digests)
+    print(f"Particiones: {cambios.resumen()}")
+    cursor = conn.cursor()
+    borrados = manifest.preparar_reescritura(cambios.afectadas, FUENTE, municipios=[tuple(k.split('|')) for k in objetivos])
+    print(f"Registros eliminados antes de reescribir: {borrados}")
+    por_escribir = pd.MultiIndex.from_frame(totales[PARTICION]).isin(list(cambios.nuevas | cambios.modificadas))
+    totales = totales[por_escribir]
+
+    # Escritura masiva en una sola transacción, reportando el rendimiento por lote
+    registros = list(totales.itertuples(index=False, name=None))
+    total_registros = len(registros)
+    for inicio in range(0, total_registros, LOTE_ESCRITURA):
+        cursor.executemany(SQL_INSERT_TOTALES, registros[inicio:inicio + LOTE_ESCRITURA])
+        escritos = min(inicio + LOTE_ESCRITURA, total_registros)
+        elapsed = time.time() - start_time
+        print(f"Progreso: {escritos}/{total_registros} registros ({escritos / max(elapsed, 1e-9):,.0f} registros/s)")
+    # Recalcular el último periodo solo de los municipios afectados
+    refresh_crime_latest(conn, cambios.municipios)
+    manifest.registrar(sha256, size, digests, cambios)
     conn.commit()
     conn.close()
     print("Actualización completada SOLO para municipios y estados de almacenes.")
@@ -0,0 +1,104 @@
+"""
+Prueba de concurrencia de los conectores de datos reales contra un servidor stub local
+Un CSV del SESNSP servido muy lento no debe bloquear consultas de clima que llegan mientras tanto:
+con requests.get síncrono cada consulta esperaba a que terminara la descarga.
+"""
+import asyncio
+import os
+import sys
+import time
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.cache import response_cache
+from app.http_client import HTTPClientRegistry
+from app.real_data_connectors import GobiernoDataConnector, WeatherDataConnector
+
+RETRASO_CSV = 2.0       # segundos que tarda el upstream lento
+CONSULTAS_RAPIDAS = 10
+LATENCIA_MAXIMA = 0.5   # segundos aceptables para una consulta rápida
+
+CSV_SESNSP = (
+    "Año,Clave_Ent,Entidad,Cve. Municipio,Municipio,Bien jurídico afectado,Tipo de delito,"
+    "Subtipo de delito,Modalidad,Enero,Febrero\n"
+    "2024,13,Hidalgo,13069,Villa de Tezontepec,El patrimonio,Robo,Robo a negocio,Con violencia,3,4\n"
+)
+
+
+def crear_stub() -> web.Application:
+    async def csv_lento(request):
+        response = web.StreamResponse(headers={'Content-Type': 'text/csv'})
+        await response.prepare(request)
+        # El cuerpo llega por partes durante RETRASO_CSV segundos
+        lineas = CSV_SESNSP.encode('utf-8').splitlines(keepends=True)
+        for linea in lineas:
+            await asyncio.sleep(RETRASO_CSV / len(lineas))
+            await response.write(linea)
+        await response.write_eof()
+        return response
+
+    async def clima(request):
+        return web.json_response({
+            'main': {'temp': 21.0, 'humidity': 60},
+            'visibility': 9000,
+            'weather': [{'description': 'cielo claro'}]
+        })
+
+    app = web.Application()
+    app.router.add_get('/sesnsp/{archivo}', csv_lento)
+    app.router.add_get('/clima/weather', clima)
+    return app
+
+
+async def main():
+    runner = web.AppRunner(crear_stub())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    print(f"🧪 Servidor stub en {base}")
+
+    # Se mide el transporte HTTP: sin caché de respuestas
+    response_cache.enabled = False
+    registro = HTTPClientRegistry()
+    await registro.startup()
+    session = registro.session()
+
+    gobierno = GobiernoDataConnector(session=session)
+    gobierno.crime_data_urls = {'municipal_stub': f"{base}/sesnsp/municipal.csv"}
+    clima = WeatherDataConnector(session=session)
+    clima.openweather_api = f"{base}/clima"
+
+    inicio = time.perf_counter()
+    lenta = asyncio.create_task(gobierno.get_crime_data_by_municipio('Villa de Tezontepec', 'Hidalgo'))
+    await asyncio.sleep(0.1)
+
+    latencias = []
+    for _ in range(CONSULTAS_RAPIDAS):
+        t0 = time.perf_counter()
+        datos = await clima.get_weather_risk_factors(20.0, -98.8)
+        latencias.append(time.perf_counter() - t0)
+        assert datos['data_source'] == 'OpenWeatherMap', datos
+    rapidas_terminadas = time.perf_counter() - inicio
+
+    crime_data = await lenta
+    total = time.perf_counter() - inicio
+
+    await registro.shutdown()
+    await runner.cleanup()
+
+    print(f"📊 Descarga lenta: {total:.2f}s (datos encontrados: {crime_data.get('found_data', False)})")
+    print(f"📊 {CONSULTAS_RAPIDAS} consultas de clima terminadas a los {rapidas_terminadas:.2f}s, "
+          f"latencia máxima {max(latencias) * 1000:.1f} ms")
+    if max(latencias) < LATENCIA_MAXIMA and rapidas_terminadas < RETRASO_CSV:
+        print("✅ El upstream lento no bloqueó las demás consultas")
+    else:
+        print("❌ Las consultas rápidas esperaron a la descarga lenta")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
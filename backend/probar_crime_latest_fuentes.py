@@ -0,0 +1,77 @@
+"""
+Prueba de crime_latest con dos fuentes del mismo municipio
+Importa un CSV municipal sintético con importar_csv_municipal (fuente 'SESNSP') y luego el
+mismo archivo con importar_sesnsp ('SESNSP Oficial') en una base temporal; los totales del
+último periodo por municipio no deben cambiar al cargar la segunda fuente.
+"""
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import importar_sesnsp
+from services.bulk_importer import MESES, importar_csv_municipal
+
+ENCABEZADO = ['Año', 'Clave_Ent', 'Entidad', 'Cve. Municipio', 'Municipio', 'Bien jurídico afectado',
+              'Tipo de delito', 'Subtipo de delito', 'Modalidad', *MESES]
+
+# (Entidad, Municipio, tipo, subtipo, modalidad, delitos por mes de enero a junio)
+FILAS = [
+    ('Hidalgo', 'Zempoala', 'Robo', 'Robo a negocio', 'Con violencia', [3, 4, 2, 5, 6, 30]),
+    ('Hidalgo', 'Zempoala', 'Robo', 'Robo de vehículo automotor', 'Sin violencia', [7, 8, 6, 9, 10, 40]),
+    ('Hidalgo', 'Zempoala', 'Homicidio', 'Homicidio doloso', 'Con arma de fuego', [1, 0, 1, 0, 2, 14]),
+    ('Hidalgo', 'Pachuca de Soto', 'Extorsión', 'Extorsión', 'Extorsión', [2, 3, 1, 4, 2, 5]),
+    ('Hidalgo', 'Pachuca de Soto', 'Robo', 'Robo a negocio', 'Sin violencia', [11, 9, 12, 10, 13, 15]),
+]
+
+
+def escribir_csv(path: str):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ENCABEZADO)
+        for entidad, municipio, tipo, subtipo, modalidad, meses in FILAS:
+            writer.writerow([2025, 13, entidad, 13000, municipio, 'El patrimonio', tipo, subtipo, modalidad,
+                             *meses, *[''] * (len(MESES) - len(meses))])
+
+
+def totales_latest(db_path: str):
+    conn = sqlite3.connect(db_path)
+    filas = conn.execute(
+        'SELECT municipio_norm, year, month, total_delitos, fuente FROM crime_latest ORDER BY municipio_norm'
+    ).fetchall()
+    conn.close()
+    return {municipio: (year, month, total, fuente) for municipio, year, month, total, fuente in filas}
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'Municipal-Delitos.csv')
+        db_path = os.path.join(tmp, 'real_crime_data.db')
+        escribir_csv(csv_path)
+
+        importar_csv_municipal(csv_path, db_path)
+        antes = totales_latest(db_path)
+
+        importar_sesnsp.DB_PATH = db_path
+        importar_sesnsp.ARCHIVOS = [csv_path]
+        importar_sesnsp.procesar_e_insertar()
+        despues = totales_latest(db_path)
+
+    print("\n🧪 crime_latest por municipio (año, mes, total, fuente)")
+    fallas = 0
+    for municipio in sorted(antes):
+        total_antes, total_despues = antes[municipio][2], despues.get(municipio, (None,) * 4)[2]
+        ok = total_antes == total_despues and antes[municipio][:2] == despues[municipio][:2]
+        fallas += not ok
+        print(f"   {'✅' if ok else '❌'} {municipio}: {antes[municipio]} -> {despues.get(municipio)}")
+    if fallas or set(antes) != set(despues):
+        print("❌ Cargar una segunda fuente cambió los totales de crime_latest")
+        sys.exit(1)
+    print("✅ Los totales no cambian al cargar la segunda fuente")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Prueba del pool HTTP compartido contra un servidor stub local
+Levanta un servidor aiohttp en 127.0.0.1, apunta los conectores a él y cuenta
+cuántas conexiones TCP distintas se abren para varias consultas seguidas.
+"""
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.cache import response_cache
+from app.http_client import HTTPClientRegistry
+from app.inegi_expanded_connector import INEGIExpandedConnector
+from app.fiscalias_connector import FiscaliasEstatalesConnector
+
+CONSULTAS = 3
+
+
+def crear_stub(conexiones: set, peticiones: list) -> web.Application:
+    async def registrar(request):
+        conexiones.add(request.transport.get_extra_info('peername'))
+        peticiones.append(request.path)
+
+    async def indicador(request):
+        await registrar(request)
+        return web.json_response({'Series': [{'OBSERVATIONS': [{'OBS_VALUE': '7.5', 'TIME_PERIOD': '2024'}]}]})
+
+    async def denue(request):
+        await registrar(request)
+        return web.json_response([{'id': 1}, {'id': 2}])
+
+    async def fiscalia(request):
+        await registrar(request)
+        return web.json_response({'delitos': {'robo_negocio': 12}, 'estadisticas': {}})
+
+    app = web.Application()
+    app.router.add_get('/indicadores/{tail:.*}', indicador)
+    app.router.add_get('/denue/{tail:.*}', denue)
+    app.router.add_get('/fiscalia/{tail:.*}', fiscalia)
+    return app
+
+
+async def main():
+    conexiones, peticiones = set(), []
+    runner = web.AppRunner(crear_stub(conexiones, peticiones))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    print(f"🧪 Servidor stub en {base}")
+
+    # Se mide el transporte HTTP: sin caché de respuestas
+    response_cache.enabled = False
+    registro = HTTPClientRegistry(limit_per_host=4)
+    await registro.startup()
+    session = registro.session()
+
+    inegi = INEGIExpandedConnector(session=session)
+    inegi.base_url = f"{base}/indicadores/"
+    inegi.denue_base_url = f"{base}/denue/"
+    fiscalias = FiscaliasEstatalesConnector(session=session)
+    fiscalias.fiscalias_endpoints['hidalgo'] = {
+        'base_url': f"{base}/fiscalia/",
+        'estadisticas_url': f"{base}/fiscalia/estadisticas",
+        'carpetas_url': f"{base}/fiscalia/carpetas",
+        'municipios_clave': ['Pachuca'],
+        'codigo_estado': '13'
+    }
+
+    for i in range(CONSULTAS):
+        datos = await inegi.get_socioeconomic_data('13048')
+        estatal = await fiscalias.get_state_crime_data('Hidalgo', 'Pachuca')
+        print(f"   Consulta {i + 1}: {len(datos['indicadores'])} indicadores, "
+              f"{len(datos['densidad_comercial'])} SCIAN, fuente fiscalía {estatal['fuente']}")
+
+    await registro.shutdown()
+    await runner.cleanup()
+
+    print(f"📊 Peticiones: {len(peticiones)} | Conexiones TCP: {len(conexiones)} "
+          f"(límite por host {registro.limit_per_host})")
+    if len(conexiones) <= registro.limit_per_host:
+        print("✅ Las conexiones se reutilizaron entre consultas")
+    else:
+        print("❌ Se abrieron más conexiones que el límite por host")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Prueba de carga de /consultar-riesgo contra un backend que usa las fuentes falsas
+
+    python servidor_fuentes_falsas.py --latencia 150 --tasa-error 0.05 &
+    HTTP_REPLAY_URL=http://127.0.0.1:8099 python real_data_server.py &
+    python prueba_carga_consultar_riesgo.py --solicitudes 500 --concurrencia 20
+
+/consultar-riesgo solo lee la base local: no hace llamadas a los conectores. Para medir la
+latencia y los errores inyectados por el servidor de fuentes falsas, --modo motor ejecuta
+IntegratedRiskEngine en este proceso con las URLs externas redirigidas a --fuentes:
+
+    python prueba_carga_consultar_riesgo.py --modo motor --solicitudes 100 --concurrencia 10
+
+Reporta rendimiento y percentiles de latencia, y al final el estado de precalentamiento
+del backend y los contadores del servidor de fuentes falsas.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import Dict, List
+
+import aiohttp
+
+DIRECCIONES = [
+    "Tultepec, Estado de México",
+    "Ecatepec, Estado de México",
+    "Monterrey, Nuevo León",
+    "Apodaca, Nuevo León",
+    "Guadalajara, Jalisco",
+    "Tlaquepaque, Jalisco",
+]
+# Claves del motor científico (SCENARIO_WEIGHTS y SECURITY_EFFECTIVENESS): con etiquetas de
+# pantalla todos los escenarios caerían en los pesos por defecto y las medidas en unknown_measures
+ESCENARIOS = ["intrusion_armada", "robo_transito", "robo_interno"]
+MEDIDAS = ["camaras", "guardias", "control_acceso", "iluminacion"]
+
+# IntegratedRiskEngine usa su propio catálogo de medidas (_calculate_security_mitigation)
+MEDIDAS_MOTOR = ["Cámaras de seguridad", "Guardias de seguridad", "Control de acceso"]
+
+
+def percentil(valores: List[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
+
+
+async def consultar(session: aiohttp.ClientSession, backend: str, direccion: str) -> Dict:
+    inicio = time.perf_counter()
+    try:
+        async with session.post(f"{backend}/consultar-riesgo", json={
+            'address': direccion,
+            'scenarios': ESCENARIOS,
+            'security_measures': MEDIDAS
+        }) as response:
+            await response.read()
+            status = response.status
+    except Exception as e:
+        status = type(e).__name__
+    return {'status': status, 'segundos': time.perf_counter() - inicio}
+
+
+async def consultar_motor(engine, direccion: str) -> Dict:
+    municipio, estado = direccion.split(', ', 1)
+    inicio = time.perf_counter()
+    try:
+        resultado = await engine.calculate_integrated_risk(municipio, estado, 'Almacén', 2_000_000, MEDIDAS_MOTOR)
+        status = f"{len(resultado['fuentes_consultadas'])}/4 fuentes"
+    except Exception as e:
+        status = type(e).__name__
+    return {'status': status, 'segundos': time.perf_counter() - inicio}
+
+
+def motor_integrado(fuentes: str):
+    """IntegratedRiskEngine con las URLs externas redirigidas al servidor de fuentes falsas"""
+    # Config lee HTTP_REPLAY_URL al importarse: definirla antes de importar app
+    os.environ['HTTP_REPLAY_URL'] = fuentes
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app.cache import response_cache
+    from app.http_client import http_clients
+    from app.integrated_risk_engine import IntegratedRiskEngine
+
+    # Se mide el camino de los conectores: sin caché de respuestas
+    response_cache.enabled = False
+    return IntegratedRiskEngine(), http_clients
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de /consultar-riesgo")
+    parser.add_argument('--backend', default='http://127.0.0.1:8000')
+    parser.add_argument('--fuentes', default='http://127.0.0.1:8099', help="Servidor de fuentes falsas")
+    parser.add_argument('--solicitudes', type=int, default=200)
+    parser.add_argument('--concurrencia', type=int, default=10)
+    parser.add_argument('--modo', choices=['endpoint', 'motor'], default='endpoint',
+                        help="endpoint: POST /consultar-riesgo; motor: IntegratedRiskEngine contra las fuentes falsas")
+    args = parser.parse_args()
+
+    engine, http_clients = motor_integrado(args.fuentes) if args.modo == 'motor' else (None, None)
+    semaforo = asyncio.Semaphore(args.concurrencia)
+    timeout = aiohttp.ClientTimeout(total=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async def una(i: int) -> Dict:
+            direccion = DIRECCIONES[i % len(DIRECCIONES)]
+            async with semaforo:
+                if engine is not None:
+                    return await consultar_motor(engine, direccion)
+                return await consultar(session, args.backend, direccion)
+
+        destino = "IntegratedRiskEngine" if engine is not None else f"{args.backend}/consultar-riesgo"
+        print(f"🚀 {args.solicitudes} solicitudes a {destino} (concurrencia {args.concurrencia})")
+        inicio = time.perf_counter()
+        try:
+            resultados = await asyncio.gather(*(una(i) for i in range(args.solicitudes)))
+        finally:
+            if http_clients is not None:
+                await http_clients.shutdown()
+        total = time.perf_counter() - inicio
+
+        latencias = [r['segundos'] * 1000 for r in resultados]
+        print(f"📊 {len(resultados) / total:.1f} solicitudes/s en {total:.2f}s")
+        print(f"📊 Status: {dict(Counter(r['status'] for r in resultados))}")
+        print(f"📊 Latencia ms: media {statistics.mean(latencias):.1f}, p50 {percentil(latencias, 50):.1f}, "
+              f"p95 {percentil(latencias, 95):.1f}, p99 {percentil(latencias, 99):.1f}, "
+              f"máx {max(latencias):.1f}")
+
+        for nombre, url in (('Precalentamiento', f"{args.backend}/api/warmup-status"),
+                            ('Fuentes falsas', f"{args.fuentes}/__stats")):
+            if engine is not None and nombre == 'Precalentamiento':
+                continue
+            try:
+                async with session.get(url) as response:
+                    datos = await response.json()
+                resumen = datos.get('resumen', datos)
+                print(f"ℹ️ {nombre}: {resumen}")
+            except Exception as e:
+                print(f"⚠️ {nombre} no disponible: {e}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,10 +6,11 @@ import os
 import sys
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional, Dict, Any
 import uvicorn
 from datetime import datetime
+import asyncio
 import logging
 
 # Añadir el directorio del proyecto al path
@@ -26,12 +27,40 @@ except ImportError as e:
 
 # Importar motor científico de riesgo
 try:
-    from engines.scientific_risk_engine import scientific_engine
+    from engines.scientific_risk_engine import (
+        scientific_engine, MONTE_CARLO_SAMPLES, MONTE_CARLO_MIN_SAMPLES, MONTE_CARLO_MAX_SAMPLES,
+        MONTE_CARLO_TIME_BUDGET
+    )
+    from engines.measure_portfolio import portfolio_optimizer
     SCIENTIFIC_ENGINE_AVAILABLE = True
     print("🔬 Motor Científico de Riesgo v4.0 disponible")
 except ImportError as e:
     print(f"⚠️ Motor científico no disponible: {e}")
     SCIENTIFIC_ENGINE_AVAILABLE = False
+    # Límites de validación de RiskRequest aunque el motor no cargue
+    MONTE_CARLO_MIN_SAMPLES, MONTE_CARLO_MAX_SAMPLES = 1_000, 1_000_000
+
+# Registro de sesiones HTTP y caché de respuestas compartidos por los conectores externos
+try:
+    from app.http_client import http_clients
+    from app.cache import response_cache
+    from app.single_flight import single_flight
+    from app.resilience import breakers_stats
+    from app.rate_limit import limitadores_stats
+    from app.parse_pool import parse_pool
+    HTTP_POOL_AVAILABLE = True
+except ImportError as e:
+    print(f"⚠️ Pool HTTP compartido no disponible: {e}")
+    HTTP_POOL_AVAILABLE = False
+
+# Precalentamiento en segundo plano de los datos de los almacenes
+try:
+    from app.config import Config
+    from app.warmup import warmup_scheduler
+    WARMUP_AVAILABLE = Config.WARMUP_ENABLED
+except ImportError as e:
+    print(f"⚠️ Precalentamiento de almacenes no disponible: {e}")
+    WARMUP_AVAILABLE = False
 
 # Configuración de logging mejorada
 logging.basicConfig(
@@ -58,6 +87,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_event():
+    """Abrir el pool HTTP compartido e iniciar el precalentamiento de almacenes"""
+    if HTTP_POOL_AVAILABLE:
+        await http_clients.startup()
+    if WARMUP_AVAILABLE:
+        await warmup_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Detener el precalentamiento, cerrar las sesiones HTTP y el pool de parseo al apagar el servidor"""
+    if WARMUP_AVAILABLE:
+        await warmup_scheduler.stop()
+    if HTTP_POOL_AVAILABLE:
+        await http_clients.shutdown()
+        parse_pool.shutdown()
+
 # Modelos Pydantic
 class RiskRequest(BaseModel):
     address: str
@@ -65,6 +111,18 @@ class RiskRequest(BaseModel):
     scenarios: List[str] = []
     security_measures: List[str] = []
     comments: str = ""
+    # Valores fuera de rango o de la lista los rechaza la validación de FastAPI con 422
+    uncertainty: Literal["heuristic", "monte_carlo"] = "heuristic"  # "monte_carlo" para intervalos por simulación
+    monte_carlo_samples: Optional[int] = Field(None, ge=MONTE_CARLO_MIN_SAMPLES, le=MONTE_CARLO_MAX_SAMPLES)
+
+class PortfolioRequest(BaseModel):
+    address: str
+    scenarios: List[str]
+    security_measures: List[str] = []            # medidas ya instaladas
+    candidate_measures: Optional[List[str]] = None  # None = todo el catálogo
+    costs: Dict[str, float] = {}                 # costo anual en MXN, sobrescribe los de referencia
+    budget: Optional[float] = None
+    target_probability: Optional[float] = None   # % anual de al menos un incidente
 
 class RiskResponse(BaseModel):
     success: bool
@@ -112,8 +170,73 @@ async def health_check():
         },
         "timestamp": datetime.now().isoformat()
     }
+    if HTTP_POOL_AVAILABLE:
+        health["http_pool"] = http_clients.stats()
+        health["cache"] = response_cache.stats()
+        health["single_flight"] = single_flight.stats()
+        health["circuit_breakers"] = breakers_stats()
+        health["rate_limits"] = limitadores_stats()
+        health["parse_pool"] = parse_pool.stats()
+    if SCIENTIFIC_ENGINE_AVAILABLE:
+        health["measure_cache"] = scientific_engine.measure_cache_stats()
+    if WARMUP_AVAILABLE:
+        health["warmup"] = warmup_scheduler.status()["resumen"]
     return health
 
+@app.get("/api/warmup-status")
+async def get_warmup_status():
+    """Estado warm/cold de los datos externos de cada almacén del catálogo"""
+    if not WARMUP_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Precalentamiento no disponible")
+    return warmup_scheduler.status()
+
+@app.get("/api/scientific-metadata")
+async def get_scientific_metadata(version: Optional[str] = None):
+    """Bloques constantes del motor científico referenciados por metadata_version en las respuestas"""
+    if not SCIENTIFIC_ENGINE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Motor científico no disponible")
+    if version and version != scientific_engine.metadata_version:
+        raise HTTPException(status_code=404, detail=f"Versión de metadatos desconocida: {version}")
+    return scientific_engine.static_metadata
+
+def _parse_include(include: Optional[str]) -> List[str]:
+    """?include=metadata,otro -> ['metadata', 'otro']"""
+    return [parte.strip() for parte in include.split(',') if parte.strip()] if include else []
+
+@app.post("/api/optimizar-medidas")
+async def optimizar_medidas(request: PortfolioRequest):
+    """
+    Frontera de Pareto costo anual vs. probabilidad residual de las medidas a agregar
+    Sustituye iterar /consultar-riesgo a mano con distintas listas de medidas.
+    """
+    if not SCIENTIFIC_ENGINE_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Motor científico no disponible")
+    if not request.scenarios:
+        raise HTTPException(status_code=400, detail="Se requiere al menos un escenario")
+
+    # La criminalidad local ajusta el factor regional; sin datos se usa solo la región
+    crime_data = None
+    if REAL_DATA_AVAILABLE:
+        crime_data = real_data_service.get_crime_data_by_location(request.address)
+
+    try:
+        # Búsqueda CPU pura: fuera del event loop
+        result = await asyncio.to_thread(
+            portfolio_optimizer.optimize,
+            request.scenarios, request.address, crime_data, request.security_measures,
+            candidate_measures=request.candidate_measures,
+            costs=request.costs,
+            budget=request.budget,
+            target_probability=request.target_probability
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result["data_source"] = crime_data['data_source'] if crime_data else "Solo factor regional"
+    result["timestamp"] = datetime.now().isoformat()
+    print(f"🧮 Portafolio para {request.address}: {len(result['frontier'])} puntos en la frontera "
+          f"({result['search']['nodes']} nodos, {result['search']['seconds']}s)")
+    return result
+
 # Endpoint de prueba simple
 @app.post("/test-endpoint")
 async def test_endpoint():
@@ -121,8 +244,12 @@ async def test_endpoint():
     return {"message": "Test endpoint working"}
 
 @app.post("/consultar-riesgo", response_model=RiskResponse)
-async def consultar_riesgo(request: RiskRequest):
-    """Endpoint principal para análisis de riesgo con datos reales"""
+async def consultar_riesgo(request: RiskRequest, include: Optional[str] = None):
+    """
+    Endpoint principal para análisis de riesgo con datos reales
+    Los bloques científicos constantes van por referencia (scientific_metadata_version);
+    ?include=metadata los agrega una vez en metadata.scientific_metadata.
+    """
     try:
         print(f"\n🎯 === ANÁLISIS DE RIESGO REAL ===")
         print(f"📍 Ubicación: {request.address}")
@@ -146,13 +273,30 @@ async def consultar_riesgo(request: RiskRequest):
         scenario_analysis = {}
         if SCIENTIFIC_ENGINE_AVAILABLE and request.scenarios:
             print(f"🔬 Iniciando análisis científico de escenarios...")
-            for scenario in request.scenarios:
-                scenario_result = scientific_engine.calculate_scenario_probability(
-                    scenario=scenario,
-                    location=request.address,
-                    security_measures=request.security_measures,
-                    crime_context=crime_data
+            # Todos los escenarios en una sola evaluación vectorizada
+            batch = scientific_engine.calculate_batch(
+                scenarios=request.scenarios,
+                locations=[request.address],
+                measure_sets=[request.security_measures],
+                crime_contexts=[crime_data]
+            )
+            unknown_measures = scientific_engine.encode_measures(request.security_measures).unknown
+            simulations = {}
+            if request.uncertainty == "monte_carlo":
+                # Una simulación para todos los escenarios, fuera del event loop (CPU pura)
+                simulations = await asyncio.to_thread(
+                    scientific_engine.calculate_monte_carlo_batch,
+                    request.scenarios, request.address, request.security_measures, crime_data,
+                    samples=request.monte_carlo_samples or MONTE_CARLO_SAMPLES,
+                    time_budget=MONTE_CARLO_TIME_BUDGET
                 )
+            for i, scenario in enumerate(request.scenarios):
+                scenario_result = scientific_engine.batch_result_to_dict(scenario, batch[i, 0, 0], unknown_measures)
+                if scenario in simulations:
+                    scientific_engine.apply_monte_carlo(
+                        scenario_result, scenario, request.address, request.security_measures, crime_data,
+                        simulation=simulations[scenario]
+                    )
                 scenario_analysis[scenario] = scenario_result
                 print(f"📊 {scenario}: {scenario_result['probability']}% (reducción por medidas aplicada)")
 
@@ -223,6 +367,10 @@ async def consultar_riesgo(request: RiskRequest):
             },
             "timestamp": datetime.now().isoformat()
         }
+        if scenario_analysis:
+            response["metadata"]["scientific_metadata_version"] = scientific_engine.metadata_version
+            if "metadata" in _parse_include(include):
+                response["metadata"]["scientific_metadata"] = scientific_engine.static_metadata
         print(f"✅ Incidencia delictiva local devuelta para: {crime_data.get('location', request.address)}")
         print(f"📊 Fuente de datos: {data_source}")
         return response
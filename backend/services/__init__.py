@@ -2,4 +2,13 @@
 """
 Servicios del sistema de análisis de riesgo
 - real_data_service: Integración con datos oficiales SESNSP/INEGI
+- sqlite_pool: Pool de conexiones SQLite (lectura) con escritor único
+- crime_schema: Esquema e índices de crime_data
+- bulk_importer: Importación masiva en streaming del CSV municipal
+- crime_classifier: Tabla única de clasificación de delitos para los importadores
+- crime_latest: Tabla materializada con el último periodo por municipio
+- crime_snapshot: Índice en memoria del periodo más reciente por municipio
+- import_manifest: Manifiesto de importaciones incrementales por partición
+- normalization: Normalización de nombres de estado/municipio
+- csv_loader: Detección de encoding y lectura única de CSV oficiales
 """
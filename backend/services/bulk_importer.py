@@ -0,0 +1,439 @@
+"""
+Importador masivo del CSV municipal del SESNSP (2015-2025)
+Lee el archivo en streaming por bloques de tamaño fijo e inserta con executemany
+dentro de una sola transacción; los índices secundarios se reconstruyen al final.
+Con el manifiesto de importación solo se reescriben las particiones que cambiaron, y en
+modo paralelo el parseo se reparte entre procesos mientras un solo escritor carga SQLite.
+"""
+import csv
+import os
+import pickle
+import sqlite3
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from services.crime_classifier import DESGLOSE_COLUMNAS, TablaClasificacion
+from services.crime_latest import refresh_crime_latest
+from services.crime_schema import SQL_CREATE_CRIME_DATA, create_crime_data_indexes, drop_crime_data_indexes
+from services.csv_loader import detectar_encoding_archivo
+from services.import_manifest import DigestParticiones, ImportManifest, Particion, file_sha256
+from services.normalization import normalizar
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+# Filas del CSV por lote de executemany (cada fila genera hasta 12 registros mensuales)
+DEFAULT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", 5000))
+
+# Procesos para parsear/clasificar (1 = todo en este proceso) y shards por proceso para balancear carga
+DEFAULT_WORKERS = int(os.getenv("IMPORT_WORKERS", 1))
+SHARDS_POR_WORKER = 4
+# Shards en vuelo por worker: acota la memoria y los archivos temporales pendientes de consumir
+VENTANA_POR_WORKER = 2
+# Bytes leídos por bloque al buscar límites de shard fuera de comillas
+BLOQUE_ESCANEO = 1 << 20
+
+# Solo durante la carga: sin fsync por transacción, temporales en memoria y cache de 256 MB
+BULK_PRAGMAS = (
+    'PRAGMA synchronous=OFF',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-262144',
+)
+
+# Fracción de particiones reescritas a partir de la cual conviene eliminar y reconstruir índices
+UMBRAL_REINDEX = 0.2
+
+SQL_INSERT_CRIME_MONTH = '''
+    INSERT OR REPLACE INTO crime_data
+    (estado, municipio, estado_norm, municipio_norm, year, month, tipo_delito, robo_comun, robo_casa_habitacion,
+     robo_negocio, robo_vehiculo, homicidio_doloso, homicidio_culposo,
+     extorsion, secuestro, total_delitos, poblacion, tasa_criminalidad, fuente, fecha_actualizacion)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+SIN_DESGLOSE = (0.0,) * len(DESGLOSE_COLUMNAS)
+
+
+def safe_float(val) -> float:
+    """Convertir valores del CSV a float; vacíos, 'ND' o texto inválido cuentan como cero"""
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _iter_filas(reader, header, stats: Dict, estado: Optional[str],
+                year_min: Optional[int]) -> Iterator[Tuple[Particion, list]]:
+    """Filas del CSV que pasan los filtros, con su partición (estado_norm, municipio_norm, year)"""
+    col = {name: i for i, name in enumerate(header)}
+    i_entidad, i_municipio, i_year = col['Entidad'], col['Municipio'], col['Año']
+    estado_filtro = normalizar(estado) if estado else None
+    nombres: Dict[str, str] = {}
+
+    for fields in reader:
+        stats['filas'] += 1
+        try:
+            estado_norm = nombres.get(fields[i_entidad])
+            if estado_norm is None:
+                estado_norm = nombres.setdefault(fields[i_entidad], normalizar(fields[i_entidad]))
+            if estado_filtro and estado_norm != estado_filtro:
+                continue
+            year = int(fields[i_year])
+            if year_min and year < year_min:
+                continue
+            municipio_norm = nombres.get(fields[i_municipio])
+            if municipio_norm is None:
+                municipio_norm = nombres.setdefault(fields[i_municipio], normalizar(fields[i_municipio]))
+        except (IndexError, ValueError) as e:
+            stats['errores'] += 1
+            print(f"⚠️ Error en fila {stats['filas']}: {e}")
+            continue
+        yield (estado_norm, municipio_norm, year), fields
+
+
+def _meses_header(header) -> List[Tuple[int, int]]:
+    """(mes, índice de columna) de los meses presentes en el encabezado"""
+    col = {name: i for i, name in enumerate(header)}
+    return [(month, col[mes]) for month, mes in enumerate(MESES, 1) if mes in col]
+
+
+def _iter_compactos(filas: Iterator[Tuple[Particion, list]], header, stats: Dict,
+                    particiones: Optional[Set[Particion]], clasificacion: TablaClasificacion) -> Iterator[Tuple]:
+    """Una tupla compacta (partición, tipo_delito, columna, valores mensuales) por fila de las particiones a cargar"""
+    col = {name: i for i, name in enumerate(header)}
+    i_tipo, i_subtipo = col['Tipo de delito'], col['Subtipo de delito']
+    i_modalidad = col.get('Modalidad')
+    indices = [idx for _, idx in _meses_header(header)]
+
+    for particion, fields in filas:
+        if particiones is not None and particion not in particiones:
+            continue
+        try:
+            tipo, subtipo = fields[i_tipo], fields[i_subtipo]
+            modalidad = fields[i_modalidad] if i_modalidad is not None else ''
+        except IndexError as e:
+            stats['errores'] += 1
+            print(f"⚠️ Error en fila {stats['filas']}: {e}")
+            continue
+
+        stats['filas_importadas'] += 1
+        # Reglas evaluadas una sola vez por triple distinto; aquí solo se consulta la tabla
+        columna, tipo_delito = clasificacion.get(tipo, subtipo, modalidad)
+        valores = tuple(safe_float(fields[idx]) if idx < len(fields) else 0.0 for idx in indices)
+        yield particion, tipo_delito, columna, valores
+
+
+def _expandir(compactos: Iterator[Tuple], meses: List[int], omitir_ceros: bool,
+              fuente: str, fecha: str) -> Iterator[Tuple]:
+    """Generar una tupla lista para insertar por cada fila-mes"""
+    for (estado_norm, municipio_norm, year), tipo_delito, columna, valores in compactos:
+        for month, valor in zip(meses, valores):
+            if omitir_ceros and valor <= 0:
+                continue
+            if columna is None:
+                desglose = SIN_DESGLOSE
+            else:
+                desglose = SIN_DESGLOSE[:columna] + (valor,) + SIN_DESGLOSE[columna + 1:]
+            yield (estado_norm, municipio_norm, estado_norm, municipio_norm, year, month, tipo_delito,
+                   *desglose, valor, 0, 0, fuente, fecha)
+
+
+def _leer_csv(csv_path: str, encoding: str, errores: str = 'strict'):
+    """Abrir el CSV completo: (header, lector de filas)"""
+    f = open(csv_path, encoding=encoding, errors=errores, newline='')
+    reader = csv.reader(f)
+    header = [h.strip() for h in next(reader)]
+    return f, header, reader
+
+
+def _limites_registros(f, inicio: int, objetivos: List[int]) -> List[int]:
+    """Primer inicio de registro en o después de cada objetivo: el byte siguiente a un salto de
+    línea con un número par de comillas desde 'inicio' (un campo entre comillas puede contener
+    saltos de línea). Comillas escapadas ("") no alteran la paridad."""
+    limites: List[int] = []
+    pendientes = iter(objetivos)
+    objetivo = next(pendientes, None)
+    paridad, pos = 0, inicio
+    f.seek(inicio)
+    while objetivo is not None:
+        bloque = f.read(BLOQUE_ESCANEO)
+        if not bloque:
+            break
+        i = 0
+        while objetivo is not None and i < len(bloque):
+            if pos + i < objetivo:
+                corte = min(objetivo - pos, len(bloque))
+                paridad ^= bloque.count(b'"', i, corte) & 1
+                i = corte
+                continue
+            j = bloque.find(b'\n', i)
+            if j < 0:
+                paridad ^= bloque.count(b'"', i) & 1
+                break
+            paridad ^= bloque.count(b'"', i, j) & 1
+            i = j + 1
+            if not paridad:
+                limites.append(pos + i)
+                while objetivo is not None and objetivo <= pos + i:
+                    objetivo = next(pendientes, None)
+        pos += len(bloque)
+    return limites
+
+
+def rangos_shards(csv_path: str, partes: int) -> List[Tuple[int, int]]:
+    """Dividir el archivo (sin el encabezado) en rangos de bytes que empiezan en un inicio de registro"""
+    size = os.path.getsize(csv_path)
+    with open(csv_path, 'rb') as f:
+        f.readline()
+        inicio = f.tell()
+        paso = max(1, (size - inicio) // partes)
+        objetivos = [inicio + i * paso for i in range(1, partes) if inicio + i * paso < size]
+        limites = [inicio] + [l for l in _limites_registros(f, inicio, objetivos) if l < size] + [size]
+    return [(limites[i], limites[i + 1]) for i in range(len(limites) - 1) if limites[i] < limites[i + 1]]
+
+
+def _lineas_shard(f, encoding: str, inicio: int, fin: int, errores: str = 'strict') -> Iterator[str]:
+    """Líneas que empiezan dentro de [inicio, fin) ya decodificadas; con límites de rangos_shards
+    los registros con saltos de línea entre comillas quedan completos dentro del shard"""
+    # La línea que cruza 'inicio' pertenece al shard anterior
+    f.seek(inicio - 1)
+    f.readline()
+    pos = f.tell()
+    while pos < fin:
+        linea = f.readline()
+        if not linea:
+            break
+        pos += len(linea)
+        yield linea.decode(encoding, errores)
+
+
+def _shard_digests(args) -> Tuple[Dict[Particion, int], Dict]:
+    """Worker: digests de contenido de las particiones de un shard"""
+    csv_path, encoding, errores, header, inicio, fin, estado, year_min = args
+    stats = {'filas': 0, 'errores': 0}
+    digest = DigestParticiones()
+    with open(csv_path, 'rb') as f:
+        reader = csv.reader(_lineas_shard(f, encoding, inicio, fin, errores))
+        for particion, fields in _iter_filas(reader, header, stats, estado, year_min):
+            digest.agregar(particion, '\x1f'.join(fields))
+    return digest.sumas, stats
+
+
+def _shard_registros(args) -> Tuple[str, Dict, Set]:
+    """Worker: parsear, normalizar y clasificar un shard. Los registros compactos (uno por fila del
+    CSV, sin expandir por mes) se escriben por lotes en un archivo temporal; devuelve su ruta"""
+    csv_path, encoding, errores, header, inicio, fin, estado, year_min, particiones, chunk_size = args
+    stats = {'filas': 0, 'filas_importadas': 0, 'errores': 0}
+    clasificacion = TablaClasificacion()
+    fd, ruta = tempfile.mkstemp(prefix='crime_shard_', suffix='.pkl')
+    try:
+        with open(csv_path, 'rb') as f, os.fdopen(fd, 'wb') as salida:
+            reader = csv.reader(_lineas_shard(f, encoding, inicio, fin, errores))
+            filas = _iter_filas(reader, header, stats, estado, year_min)
+            compactos = _iter_compactos(filas, header, stats, particiones, clasificacion)
+            while True:
+                lote = list(islice(compactos, chunk_size))
+                if not lote:
+                    break
+                pickle.dump(lote, salida, pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        _borrar_archivo(ruta)
+        raise
+    return ruta, stats, set(clasificacion.columnas())
+
+
+def _leer_compactos(ruta: str) -> Iterator[Tuple]:
+    """Registros compactos de un shard, lote por lote"""
+    with open(ruta, 'rb') as f:
+        while True:
+            try:
+                lote = pickle.load(f)
+            except EOFError:
+                return
+            yield from lote
+
+
+def _borrar_archivo(ruta: str):
+    try:
+        os.remove(ruta)
+    except OSError:
+        pass
+
+
+def _sumar_stats(stats: Dict, parcial: Dict):
+    for key, value in parcial.items():
+        stats[key] = stats.get(key, 0) + value
+
+
+def _digest_particiones(csv_path: str, encoding: str, estado: Optional[str],
+                        year_min: Optional[int], workers: int = 1, errores: str = 'strict') -> Dict[Particion, str]:
+    """Primera pasada: digest de contenido de cada partición del archivo"""
+    digest = DigestParticiones()
+    if workers > 1:
+        f, header, _ = _leer_csv(csv_path, encoding, errores)
+        f.close()
+        tareas = [(csv_path, encoding, errores, header, inicio, fin, estado, year_min)
+                  for inicio, fin in rangos_shards(csv_path, workers * SHARDS_POR_WORKER)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for sumas, _ in pool.map(_shard_digests, tareas):
+                digest.combinar(sumas)
+        return digest.digests()
+
+    f, header, reader = _leer_csv(csv_path, encoding, errores)
+    with f:
+        for particion, fields in _iter_filas(reader, header, {'filas': 0, 'errores': 0}, estado, year_min):
+            digest.agregar(particion, '\x1f'.join(fields))
+    return digest.digests()
+
+
+def _lotes_registros(csv_path: str, encoding: str, stats: Dict, estado: Optional[str], year_min: Optional[int],
+                     particiones: Optional[Set[Particion]], omitir_ceros: bool, fuente: str, fecha: str,
+                     clasificacion: TablaClasificacion, chunk_size: int, workers: int,
+                     errores: str = 'strict') -> Iterator[List[Tuple]]:
+    """Lotes de registros para el escritor único: en este proceso o desde un pool de workers"""
+    if workers > 1:
+        f, header, _ = _leer_csv(csv_path, encoding, errores)
+        f.close()
+        meses = [month for month, _ in _meses_header(header)]
+        tareas = iter([(csv_path, encoding, errores, header, inicio, fin, estado, year_min, particiones, chunk_size)
+                       for inicio, fin in rangos_shards(csv_path, workers * SHARDS_POR_WORKER)])
+        pendientes = deque()
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                try:
+                    # Ventana acotada de shards en vuelo; se consumen en orden para que el último valor
+                    # de cada llave gane igual que en secuencial
+                    for tarea in islice(tareas, workers * VENTANA_POR_WORKER):
+                        pendientes.append(pool.submit(_shard_registros, tarea))
+                    while pendientes:
+                        ruta, parcial, triples = pendientes.popleft().result()
+                        tarea = next(tareas, None)
+                        if tarea is not None:
+                            pendientes.append(pool.submit(_shard_registros, tarea))
+                        try:
+                            _sumar_stats(stats, parcial)
+                            for triple in triples:
+                                clasificacion.get(*triple)
+                            registros = _expandir(_leer_compactos(ruta), meses, omitir_ceros, fuente, fecha)
+                            yield from _lotes(registros, chunk_size * len(MESES))
+                        finally:
+                            _borrar_archivo(ruta)
+                finally:
+                    for futuro in pendientes:
+                        futuro.cancel()
+        finally:
+            # Importación interrumpida: borrar los archivos de los shards que ya terminaron
+            for futuro in pendientes:
+                if not futuro.cancelled() and futuro.exception() is None:
+                    _borrar_archivo(futuro.result()[0])
+        return
+
+    f, header, reader = _leer_csv(csv_path, encoding, errores)
+    with f:
+        filas = _iter_filas(reader, header, stats, estado, year_min)
+        compactos = _iter_compactos(filas, header, stats, particiones, clasificacion)
+        meses = [month for month, _ in _meses_header(header)]
+        yield from _lotes(_expandir(compactos, meses, omitir_ceros, fuente, fecha), chunk_size * len(MESES))
+
+
+def _lotes(registros: Iterator[Tuple], tamano: int) -> Iterator[List[Tuple]]:
+    while True:
+        lote = list(islice(registros, tamano))
+        if not lote:
+            return
+        yield lote
+
+
+def importar_csv_municipal(csv_path: str, db_path: str, estado: Optional[str] = None,
+                           year_min: Optional[int] = None, omitir_ceros: bool = False,
+                           fuente: str = 'SESNSP', chunk_size: int = DEFAULT_CHUNK_SIZE,
+                           encoding: Optional[str] = None, incremental: bool = True,
+                           workers: int = DEFAULT_WORKERS) -> Dict:
+    """Importar el CSV municipal (o filtrado por estado/año) en crime_data.
+    En modo incremental solo se reescriben las particiones (estado, municipio, año) cuyo
+    contenido cambió respecto al manifiesto de la importación anterior.
+    Con workers > 1 el parseo y la clasificación se reparten por rangos de bytes entre procesos.
+    Sin encoding explícito se detecta una vez sobre el prefijo del archivo."""
+    fecha = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    stats = {'filas': 0, 'filas_importadas': 0, 'registros': 0, 'errores': 0}
+    clasificacion = TablaClasificacion()
+    start = time.time()
+    origen = f"municipal|estado={estado or '*'}|desde={year_min or '*'}|ceros={'no' if omitir_ceros else 'si'}|fuente={fuente}"
+
+    # Transacción explícita: un solo BEGIN/COMMIT para toda la carga
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        for pragma in BULK_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute(SQL_CREATE_CRIME_DATA)
+        conn.execute('BEGIN')
+        manifest = ImportManifest(conn, origen)
+
+        # Con encoding explícito se lee estricto; detectado con poca confianza, se reemplazan los bytes inválidos
+        errores = 'strict'
+        if encoding is None:
+            deteccion = detectar_encoding_archivo(csv_path)
+            encoding, errores = deteccion.encoding, deteccion.errores
+            print(f"🔤 Encoding detectado: {deteccion.encoding} (confianza {deteccion.confianza:.0%})")
+        sha256, size = file_sha256(csv_path)
+        if incremental and manifest.archivo_sin_cambios(sha256):
+            conn.execute('COMMIT')
+            print("✅ El archivo no cambió desde la última importación; nada que actualizar")
+            stats.update(cambios=None, import_id=None, segundos=round(time.time() - start, 2))
+            return stats
+
+        digests = _digest_particiones(csv_path, encoding, estado, year_min, workers, errores)
+        cambios = manifest.comparar(digests)
+        print(f"🧾 Particiones: {cambios.resumen()}")
+        if incremental:
+            particiones = cambios.nuevas | cambios.modificadas
+            por_borrar = cambios.afectadas
+        else:
+            particiones = None
+            por_borrar = set(digests) | cambios.eliminadas
+        # Las particiones se reescriben completas (filas que desaparecieron incluidas); la limpieza
+        # de la primera importación se limita a los municipios del archivo
+        stats['registros_eliminados'] = manifest.preparar_reescritura(
+            por_borrar, fuente, estado_norm=normalizar(estado) if estado else None, year_min=year_min,
+            municipios={(estado_norm, municipio_norm) for estado_norm, municipio_norm, _ in digests}
+        )
+
+        # Reconstruir índices solo compensa cuando se reescribe buena parte del histórico
+        reindexar = particiones is None or len(particiones) > UMBRAL_REINDEX * max(len(digests), 1)
+        if reindexar:
+            drop_crime_data_indexes(conn)
+
+        # Escritor único: todos los lotes pasan por esta conexión
+        lotes = _lotes_registros(csv_path, encoding, stats, estado, year_min, particiones, omitir_ceros,
+                                 fuente, fecha, clasificacion, chunk_size, workers, errores)
+        for lote in lotes:
+            conn.executemany(SQL_INSERT_CRIME_MONTH, lote)
+            stats['registros'] += len(lote)
+            elapsed = time.time() - start
+            print(f"   Procesadas {stats['filas']} filas, {stats['registros']} registros "
+                  f"({stats['registros'] / max(elapsed, 1e-9):,.0f} registros/s)")
+
+        if reindexar:
+            print("🔧 Reconstruyendo índices...")
+            create_crime_data_indexes(conn)
+        # Recalcular el último periodo solo de los municipios afectados
+        refresh_crime_latest(conn, None if particiones is None else cambios.municipios)
+        import_id = manifest.registrar(sha256, size, digests, cambios)
+        conn.execute('COMMIT')
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    stats['cambios'] = cambios.resumen()
+    stats['import_id'] = import_id
+    stats['tipos_delito'] = len(clasificacion)
+    stats['segundos'] = round(time.time() - start, 2)
+    return stats
@@ -0,0 +1,75 @@
+"""
+Clasificación de delitos SESNSP en las columnas de desglose de crime_data
+Una sola tabla de reglas para todos los importadores: cada triple distinto
+(tipo, subtipo, modalidad) se evalúa una vez por archivo y después solo se consulta.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from services.normalization import normalizar
+
+# Columnas de desglose en el orden en que se insertan en crime_data
+DESGLOSE_COLUMNAS = [
+    'robo_comun', 'robo_casa_habitacion', 'robo_negocio', 'robo_vehiculo',
+    'homicidio_doloso', 'homicidio_culposo', 'extorsion', 'secuestro',
+]
+ROBO_COMUN, ROBO_CASA, ROBO_NEGOCIO, ROBO_VEHICULO, HOMICIDIO_DOLOSO, HOMICIDIO_CULPOSO, EXTORSION, SECUESTRO = range(8)
+
+Triple = Tuple[str, str, str]
+
+
+def clasificar_delito(tipo_delito: str, subtipo_delito: str, modalidad: str = '') -> Optional[int]:
+    """Índice en DESGLOSE_COLUMNAS que corresponde a un delito (None si no se desglosa)"""
+    tipo = normalizar(tipo_delito)
+    subtipo = normalizar(subtipo_delito)
+    if 'HOMICIDIO DOLOSO' in subtipo:
+        return HOMICIDIO_DOLOSO
+    if 'HOMICIDIO CULPOSO' in subtipo:
+        return HOMICIDIO_CULPOSO
+    if 'EXTORSION' in tipo:
+        return EXTORSION
+    if 'SECUESTRO' in tipo:
+        return SECUESTRO
+    if 'ROBO' in tipo:
+        detalle = f"{subtipo} {normalizar(modalidad)}"
+        if 'CASA' in detalle:
+            return ROBO_CASA
+        if 'NEGOCIO' in detalle:
+            return ROBO_NEGOCIO
+        if 'VEHICULO' in detalle:
+            return ROBO_VEHICULO
+        return ROBO_COMUN
+    return None
+
+
+def clave_delito(tipo_delito: str, subtipo_delito: str, modalidad: str = '') -> str:
+    """Valor de tipo_delito en crime_data: una clave distinta por fila del CSV"""
+    return ' - '.join(p for p in (tipo_delito, subtipo_delito, modalidad) if p)
+
+
+class TablaClasificacion:
+    """Tabla triple -> (columna de desglose, clave tipo_delito) que se llena una vez por triple distinto"""
+
+    def __init__(self, triples: Iterable[Triple] = ()):
+        self._tabla: Dict[Triple, Tuple[Optional[int], str]] = {}
+        for triple in triples:
+            self.get(*triple)
+
+    def get(self, tipo_delito: str, subtipo_delito: str, modalidad: str = '') -> Tuple[Optional[int], str]:
+        triple = (tipo_delito, subtipo_delito, modalidad)
+        entrada = self._tabla.get(triple)
+        if entrada is None:
+            entrada = self._tabla[triple] = (
+                clasificar_delito(*triple),
+                clave_delito(*triple),
+            )
+        return entrada
+
+    def columnas(self) -> Dict[Triple, Optional[str]]:
+        """Triple -> nombre de columna de desglose (para uniones con DataFrames)"""
+        return {
+            triple: DESGLOSE_COLUMNAS[columna] if columna is not None else None
+            for triple, (columna, _) in self._tabla.items()
+        }
+
+    def __len__(self):
+        return len(self._tabla)
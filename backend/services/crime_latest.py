@@ -0,0 +1,129 @@
+"""
+Tabla materializada crime_latest
+Una fila agregada por municipio con el periodo más reciente de una sola fuente (PRIORIDAD_FUENTES),
+desgloses y porcentajes precalculados.
+La refrescan los scripts de importación y el servicio tras cada carga de datos.
+"""
+import logging
+from typing import Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SQL_CREATE_CRIME_LATEST = '''
+    CREATE TABLE IF NOT EXISTS crime_latest (
+        estado_norm TEXT NOT NULL,
+        municipio_norm TEXT NOT NULL,
+        estado TEXT NOT NULL,
+        municipio TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        robo_comun REAL DEFAULT 0,
+        robo_casa_habitacion REAL DEFAULT 0,
+        robo_negocio REAL DEFAULT 0,
+        robo_vehiculo REAL DEFAULT 0,
+        homicidio_doloso REAL DEFAULT 0,
+        homicidio_culposo REAL DEFAULT 0,
+        extorsion REAL DEFAULT 0,
+        secuestro REAL DEFAULT 0,
+        total_delitos REAL DEFAULT 0,
+        poblacion INTEGER DEFAULT 0,
+        tasa_criminalidad REAL DEFAULT 0,
+        fuente TEXT DEFAULT 'SESNSP',
+        fecha_actualizacion TIMESTAMP,
+        pct_robo REAL DEFAULT 0,
+        pct_homicidio REAL DEFAULT 0,
+        pct_extorsion REAL DEFAULT 0,
+        PRIMARY KEY (estado_norm, municipio_norm)
+    )
+'''
+
+# Prioridad de fuentes cuando un municipio aparece en varias: los importadores usan claves de
+# tipo_delito distintas, así que sumar entre fuentes contaría los mismos delitos dos veces.
+# Se toma una sola fuente por municipio; las no listadas van al final, en orden alfabético.
+PRIORIDAD_FUENTES = (
+    'SESNSP Oficial',       # importar_sesnsp: archivo oficial de incidencia municipal
+    'SESNSP',               # importar_municipal_csv: CSV municipal 2015-2025
+    'SESNSP Hidalgo',       # importar_hidalgo: el mismo CSV, solo Hidalgo desde 2020 y sin meses en cero
+    'SESNSP Real Data',     # datos de muestra del servicio (y cargas de importar_hidalgo anteriores)
+)
+
+RANGO_FUENTE = 'CASE fuente {} ELSE {} END'.format(
+    ' '.join(f"WHEN '{fuente}' THEN {i}" for i, fuente in enumerate(PRIORIDAD_FUENTES)),
+    len(PRIORIDAD_FUENTES)
+)
+
+# Periodo más reciente con delitos registrados (meses 1-12; el mes 0 es el total anual) de la
+# fuente elegida. Si un municipio solo tiene meses en cero se toma su último mes disponible.
+SQL_INSERT_LATEST = '''
+    INSERT OR REPLACE INTO crime_latest (
+        estado_norm, municipio_norm, estado, municipio, year, month,
+        robo_comun, robo_casa_habitacion, robo_negocio, robo_vehiculo,
+        homicidio_doloso, homicidio_culposo, extorsion, secuestro,
+        total_delitos, poblacion, tasa_criminalidad, fuente, fecha_actualizacion
+    )
+    WITH periodo AS (
+        SELECT estado_norm, municipio_norm, fuente,
+               COALESCE(MAX(CASE WHEN total_delitos > 0 THEN year * 100 + month END),
+                        MAX(year * 100 + month)) AS periodo,
+               ROW_NUMBER() OVER (
+                   PARTITION BY estado_norm, municipio_norm ORDER BY {rango}, fuente
+               ) AS orden
+        FROM crime_data
+        WHERE month BETWEEN 1 AND 12 {{filtro}}
+        GROUP BY estado_norm, municipio_norm, fuente
+    )
+    SELECT c.estado_norm, c.municipio_norm, MIN(c.estado), MIN(c.municipio),
+           p.periodo / 100, p.periodo % 100,
+           SUM(c.robo_comun), SUM(c.robo_casa_habitacion), SUM(c.robo_negocio), SUM(c.robo_vehiculo),
+           SUM(c.homicidio_doloso), SUM(c.homicidio_culposo), SUM(c.extorsion), SUM(c.secuestro),
+           SUM(c.total_delitos), MAX(c.poblacion), MAX(c.tasa_criminalidad),
+           p.fuente, MAX(c.fecha_actualizacion)
+    FROM periodo p
+    JOIN crime_data c
+      ON c.estado_norm = p.estado_norm AND c.municipio_norm = p.municipio_norm
+     AND c.year = p.periodo / 100 AND c.month = p.periodo % 100 AND c.fuente = p.fuente
+    WHERE p.orden = 1
+    GROUP BY c.estado_norm, c.municipio_norm
+'''.format(rango=RANGO_FUENTE)
+
+SQL_UPDATE_PERCENTAGES = '''
+    UPDATE crime_latest SET
+        pct_robo = ROUND((robo_comun + robo_negocio + robo_vehiculo) * 100.0 / total_delitos, 1),
+        pct_homicidio = ROUND((homicidio_doloso + homicidio_culposo) * 100.0 / total_delitos, 1),
+        pct_extorsion = ROUND(extorsion * 100.0 / total_delitos, 1)
+    WHERE total_delitos > 0 {filtro}
+'''
+
+# Actualización parcial: solo los municipios listados en la tabla temporal
+FILTRO_MUNICIPIOS = '''
+    AND (estado_norm, municipio_norm) IN (SELECT estado_norm, municipio_norm FROM temp.municipios_refresh)
+'''
+
+
+def ensure_crime_latest_table(conn):
+    """Crear la tabla materializada si no existe"""
+    conn.execute(SQL_CREATE_CRIME_LATEST)
+
+
+def refresh_crime_latest(conn, municipios: Optional[Iterable[Tuple[str, str]]] = None) -> int:
+    """Recalcular crime_latest desde crime_data; completo o solo para los municipios (estado_norm, municipio_norm) dados.
+    Devuelve municipios materializados"""
+    ensure_crime_latest_table(conn)
+    if municipios is None:
+        conn.execute('DELETE FROM crime_latest')
+        conn.execute(SQL_INSERT_LATEST.format(filtro=''))
+        conn.execute(SQL_UPDATE_PERCENTAGES.format(filtro=''))
+        total = conn.execute('SELECT COUNT(*) FROM crime_latest').fetchone()[0]
+        logger.info(f"🗂️ crime_latest actualizada: {total} municipios")
+        return total
+
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS municipios_refresh (estado_norm TEXT, municipio_norm TEXT)')
+    conn.execute('DELETE FROM temp.municipios_refresh')
+    conn.executemany('INSERT INTO temp.municipios_refresh VALUES (?, ?)', municipios)
+    conn.execute(f'DELETE FROM crime_latest WHERE 1 = 1 {FILTRO_MUNICIPIOS}')
+    conn.execute(SQL_INSERT_LATEST.format(filtro=FILTRO_MUNICIPIOS))
+    conn.execute(SQL_UPDATE_PERCENTAGES.format(filtro=FILTRO_MUNICIPIOS))
+    total = conn.execute('SELECT COUNT(*) FROM temp.municipios_refresh').fetchone()[0]
+    conn.execute('DELETE FROM temp.municipios_refresh')
+    logger.info(f"🗂️ crime_latest actualizada parcialmente: {total} municipios")
+    return total
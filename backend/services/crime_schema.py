@@ -0,0 +1,51 @@
+"""
+Esquema de la tabla crime_data
+Compartido por el servicio de datos reales y los scripts de importación
+"""
+
+SQL_CREATE_CRIME_DATA = '''
+    CREATE TABLE IF NOT EXISTS crime_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        estado TEXT NOT NULL,
+        municipio TEXT NOT NULL,
+        estado_norm TEXT DEFAULT '',
+        municipio_norm TEXT DEFAULT '',
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        tipo_delito TEXT DEFAULT '',
+        robo_comun REAL DEFAULT 0,
+        robo_casa_habitacion REAL DEFAULT 0,
+        robo_negocio REAL DEFAULT 0,
+        robo_vehiculo REAL DEFAULT 0,
+        homicidio_doloso REAL DEFAULT 0,
+        homicidio_culposo REAL DEFAULT 0,
+        extorsion REAL DEFAULT 0,
+        secuestro REAL DEFAULT 0,
+        total_delitos REAL DEFAULT 0,
+        poblacion INTEGER DEFAULT 0,
+        tasa_criminalidad REAL DEFAULT 0,
+        fuente TEXT DEFAULT 'SESNSP',
+        fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(estado, municipio, year, month, tipo_delito)
+    )
+'''
+
+# Índices secundarios (el UNIQUE se conserva siempre: lo usa INSERT OR REPLACE).
+# Las cargas masivas los eliminan y los reconstruyen al terminar.
+CRIME_DATA_INDEXES = {
+    'idx_location': 'CREATE INDEX IF NOT EXISTS idx_location ON crime_data(estado, municipio)',
+    'idx_date': 'CREATE INDEX IF NOT EXISTS idx_date ON crime_data(year, month)',
+    'idx_location_norm': 'CREATE INDEX IF NOT EXISTS idx_location_norm ON crime_data(estado_norm, municipio_norm, year, month)',
+}
+
+
+def create_crime_data_indexes(conn):
+    """Crear (o recrear) los índices secundarios de crime_data"""
+    for ddl in CRIME_DATA_INDEXES.values():
+        conn.execute(ddl)
+
+
+def drop_crime_data_indexes(conn):
+    """Eliminar los índices secundarios antes de una carga masiva"""
+    for name in CRIME_DATA_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,127 @@
+"""
+Snapshot en memoria del periodo más reciente por municipio
+Índice inmutable (estado_norm, municipio_norm) -> registro compacto, cargado desde crime_latest
+"""
+import sys
+import time
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+class MunicipioRecord(NamedTuple):
+    """Último periodo disponible de un municipio con porcentajes ya calculados"""
+    estado: str
+    municipio: str
+    year: int
+    month: int
+    robo_comun: float
+    robo_casa_habitacion: float
+    robo_negocio: float
+    robo_vehiculo: float
+    homicidio_doloso: float
+    homicidio_culposo: float
+    extorsion: float
+    secuestro: float
+    total_delitos: float
+    poblacion: int
+    tasa_criminalidad: float
+    fuente: str
+    fecha_actualizacion: str
+    pct_robo: float
+    pct_homicidio: float
+    pct_extorsion: float
+
+    @property
+    def crime_percentages(self) -> Dict:
+        return {'robo': self.pct_robo, 'homicidio': self.pct_homicidio, 'extorsion': self.pct_extorsion}
+
+    @property
+    def raw_data(self) -> Dict:
+        data = self._asdict()
+        for key in ('pct_robo', 'pct_homicidio', 'pct_extorsion'):
+            del data[key]
+        return data
+
+
+SQL_CRIME_LATEST_ROWS = '''
+    SELECT estado_norm, municipio_norm, estado, municipio, year, month,
+           robo_comun, robo_casa_habitacion, robo_negocio, robo_vehiculo,
+           homicidio_doloso, homicidio_culposo, extorsion, secuestro,
+           total_delitos, poblacion, tasa_criminalidad, fuente, fecha_actualizacion,
+           pct_robo, pct_homicidio, pct_extorsion
+    FROM crime_latest
+'''
+
+
+def record_from_row(row) -> MunicipioRecord:
+    """Convertir una fila de crime_latest (con sus llaves normalizadas) en registro compacto"""
+    return MunicipioRecord(*row[2:])
+
+
+class CrimeSnapshot:
+    """Índice inmutable de municipios; se reemplaza completo en cada recarga"""
+
+    def __init__(self, records: Dict, build_seconds: float):
+        self._records = MappingProxyType(records)
+        self.built_at = datetime.now().isoformat()
+        self.build_seconds = build_seconds
+        self.memory_bytes = _estimate_memory(records)
+
+    def __len__(self):
+        return len(self._records)
+
+    def lookup(self, estados_norm: Iterable[str], municipio_norm: str) -> Optional[MunicipioRecord]:
+        """Buscar un municipio aceptando varias formas normalizadas del estado"""
+        for estado_norm in estados_norm:
+            record = self._records.get((estado_norm, municipio_norm))
+            if record is not None:
+                return record
+        return None
+
+    def actualizar(self, records: Dict, eliminados: Iterable) -> 'CrimeSnapshot':
+        """Nuevo snapshot con solo las llaves indicadas reemplazadas o eliminadas"""
+        start = time.perf_counter()
+        nuevos = dict(self._records)
+        for key in eliminados:
+            nuevos.pop(key, None)
+        nuevos.update(records)
+        return CrimeSnapshot(nuevos, time.perf_counter() - start)
+
+    def stats(self) -> Dict:
+        return {
+            'municipios': len(self._records),
+            'built_at': self.built_at,
+            'build_ms': round(self.build_seconds * 1000, 2),
+            'memory_bytes': self.memory_bytes,
+        }
+
+
+def build_snapshot(conn) -> CrimeSnapshot:
+    """Construir el snapshot a partir de la tabla materializada crime_latest"""
+    start = time.perf_counter()
+    records = {
+        (row[0], row[1]): record_from_row(row)
+        for row in conn.execute(SQL_CRIME_LATEST_ROWS)
+    }
+    return CrimeSnapshot(records, time.perf_counter() - start)
+
+
+def load_records(conn, keys: Iterable[Tuple[str, str]]) -> Dict:
+    """Leer de crime_latest solo los municipios (estado_norm, municipio_norm) indicados"""
+    query = SQL_CRIME_LATEST_ROWS + ' WHERE estado_norm = ? AND municipio_norm = ?'
+    records = {}
+    for key in keys:
+        row = conn.execute(query, key).fetchone()
+        if row is not None:
+            records[key] = record_from_row(row)
+    return records
+
+
+def _estimate_memory(records: Dict) -> int:
+    """Tamaño aproximado en bytes del dict, sus llaves y sus registros"""
+    total = sys.getsizeof(records)
+    for key, record in records.items():
+        total += sys.getsizeof(key) + sum(sys.getsizeof(k) for k in key)
+        total += sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record)
+    return total
@@ -0,0 +1,87 @@
+"""
+Carga de CSV oficiales con detección de encoding en una sola pasada
+Se inspecciona un prefijo acotado del archivo y después se lee completo una única vez
+con el codec detectado, en lugar de reintentar el parseo con cada encoding.
+"""
+import codecs
+import io
+import logging
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Bytes inspeccionados para detectar el encoding (el encabezado SESNSP ya trae 'Año')
+PREFIJO_BYTES = 64 * 1024
+
+# Bytes que cp1252 no define: su presencia indica latin-1
+_NO_DEFINIDOS_CP1252 = {0x81, 0x8D, 0x8F, 0x90, 0x9D}
+# Caracteres esperables en textos oficiales en español
+_CARACTERES_ES = set('áéíóúüñÁÉÍÓÚÜÑ¿¡°')
+
+
+class DeteccionEncoding(NamedTuple):
+    """Resultado de la detección: codec, confianza (0-1) y bytes inspeccionados"""
+    encoding: str
+    confianza: float
+    bytes_muestra: int
+
+    @property
+    def errores(self) -> str:
+        # Muestra solo ASCII: el resto del archivo podría no ser UTF-8; reemplazar en vez de abortar
+        return 'strict' if self.confianza >= 0.9 else 'replace'
+
+
+def _proporcion_espanol(texto: str) -> float:
+    """Fracción de caracteres no ASCII que son letras/símbolos habituales del español"""
+    no_ascii = [c for c in texto if ord(c) > 127]
+    if not no_ascii:
+        return 0.0
+    return sum(1 for c in no_ascii if c in _CARACTERES_ES) / len(no_ascii)
+
+
+def detectar_encoding_bytes(muestra: bytes) -> DeteccionEncoding:
+    """Detectar el encoding a partir de un prefijo del contenido"""
+    if muestra.startswith(codecs.BOM_UTF8):
+        return DeteccionEncoding('utf-8-sig', 1.0, len(muestra))
+
+    if not any(b > 127 for b in muestra):
+        return DeteccionEncoding('utf-8', 0.5, len(muestra))
+
+    # final=False: una secuencia multibyte cortada al final del prefijo no cuenta como error
+    try:
+        texto = codecs.getincrementaldecoder('utf-8')().decode(muestra, final=False)
+        return DeteccionEncoding('utf-8', round(0.9 + 0.1 * _proporcion_espanol(texto), 3), len(muestra))
+    except UnicodeDecodeError:
+        pass
+
+    altos = {b for b in muestra if 0x80 <= b <= 0x9F}
+    encoding = 'latin-1' if altos & _NO_DEFINIDOS_CP1252 else 'cp1252'
+    texto = muestra.decode(encoding)
+    confianza = 0.6 + 0.39 * _proporcion_espanol(texto)
+    return DeteccionEncoding(encoding, round(confianza, 3), len(muestra))
+
+
+def detectar_encoding_archivo(path: str, prefijo: int = PREFIJO_BYTES) -> DeteccionEncoding:
+    """Detectar el encoding leyendo solo los primeros bytes del archivo"""
+    with open(path, 'rb') as f:
+        return detectar_encoding_bytes(f.read(prefijo))
+
+
+def leer_csv(origen: Union[str, bytes], deteccion: Optional[DeteccionEncoding] = None,
+             **read_csv_kwargs) -> Tuple["pd.DataFrame", DeteccionEncoding]:
+    """Leer un CSV (ruta o contenido descargado) una sola vez con el encoding detectado"""
+    import pandas as pd
+
+    if deteccion is None:
+        if isinstance(origen, (bytes, bytearray)):
+            deteccion = detectar_encoding_bytes(bytes(origen[:PREFIJO_BYTES]))
+        else:
+            deteccion = detectar_encoding_archivo(origen)
+    logger.info(f"🔤 Encoding detectado: {deteccion.encoding} (confianza {deteccion.confianza:.0%})")
+
+    fuente = io.BytesIO(origen) if isinstance(origen, (bytes, bytearray)) else origen
+    df = pd.read_csv(fuente, encoding=deteccion.encoding, encoding_errors=deteccion.errores, **read_csv_kwargs)
+    return df, deteccion
@@ -0,0 +1,252 @@
+"""
+Manifiesto de importaciones incrementales del SESNSP
+Guarda el hash de cada archivo importado y un digest de contenido por partición
+(estado_norm, municipio_norm, year) para reescribir solo lo que cambió entre publicaciones.
+"""
+import hashlib
+import logging
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Set, Tuple
+
+from services.normalization import estados_equivalentes, normalizar
+
+logger = logging.getLogger(__name__)
+
+Particion = Tuple[str, str, int]
+
+SQL_CREATE_MANIFEST = (
+    '''
+    CREATE TABLE IF NOT EXISTS import_files (
+        origen TEXT PRIMARY KEY,
+        sha256 TEXT NOT NULL,
+        size INTEGER DEFAULT 0,
+        imported_at TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS import_partitions (
+        origen TEXT NOT NULL,
+        estado_norm TEXT NOT NULL,
+        municipio_norm TEXT NOT NULL,
+        year INTEGER NOT NULL,
+        digest TEXT NOT NULL,
+        import_id INTEGER,
+        PRIMARY KEY (origen, estado_norm, municipio_norm, year)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS import_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        origen TEXT NOT NULL,
+        sha256 TEXT,
+        imported_at TIMESTAMP,
+        nuevas INTEGER DEFAULT 0,
+        modificadas INTEGER DEFAULT 0,
+        eliminadas INTEGER DEFAULT 0,
+        sin_cambios INTEGER DEFAULT 0
+    )
+    ''',
+    # Municipios tocados por cada importación: el servicio invalida solo estos en su snapshot
+    '''
+    CREATE TABLE IF NOT EXISTS import_changes (
+        import_id INTEGER NOT NULL,
+        estado_norm TEXT NOT NULL,
+        municipio_norm TEXT NOT NULL,
+        PRIMARY KEY (import_id, estado_norm, municipio_norm)
+    )
+    ''',
+)
+
+SQL_DELETE_PARTITION = 'DELETE FROM crime_data WHERE estado_norm = ? AND municipio_norm = ? AND year = ? AND fuente = ?'
+
+_MASK_64 = (1 << 64) - 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> Tuple[str, int]:
+    """SHA-256 y tamaño de un archivo leyéndolo por bloques"""
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size
+
+
+class DigestParticiones:
+    """Digest por partición independiente del orden de las filas (suma de hashes de fila módulo 2^64)"""
+
+    def __init__(self):
+        self._sumas: Dict[Particion, int] = {}
+
+    def agregar(self, particion: Particion, fila: str):
+        h = int.from_bytes(hashlib.blake2b(fila.encode('utf-8'), digest_size=8).digest(), 'little')
+        self._sumas[particion] = (self._sumas.get(particion, 0) + h) & _MASK_64
+
+    def agregar_hash(self, particion: Particion, h: int):
+        """Sumar un hash de fila ya calculado (p. ej. pandas.util.hash_pandas_object)"""
+        self._sumas[particion] = (self._sumas.get(particion, 0) + int(h)) & _MASK_64
+
+    def combinar(self, sumas: Dict[Particion, int]):
+        """Sumar los acumulados de otro DigestParticiones (p. ej. de un proceso worker)"""
+        for particion, suma in sumas.items():
+            self._sumas[particion] = (self._sumas.get(particion, 0) + suma) & _MASK_64
+
+    @property
+    def sumas(self) -> Dict[Particion, int]:
+        return self._sumas
+
+    def digests(self) -> Dict[Particion, str]:
+        return {particion: f"{suma:016x}" for particion, suma in self._sumas.items()}
+
+
+class CambiosImportacion(NamedTuple):
+    """Resultado de comparar una publicación contra el manifiesto"""
+    nuevas: Set[Particion]
+    modificadas: Set[Particion]
+    eliminadas: Set[Particion]
+    sin_cambios: int
+
+    @property
+    def afectadas(self) -> Set[Particion]:
+        return self.nuevas | self.modificadas | self.eliminadas
+
+    @property
+    def municipios(self) -> Set[Tuple[str, str]]:
+        return {(estado_norm, municipio_norm) for estado_norm, municipio_norm, _ in self.afectadas}
+
+    def resumen(self) -> Dict:
+        return {
+            'nuevas': len(self.nuevas),
+            'modificadas': len(self.modificadas),
+            'eliminadas': len(self.eliminadas),
+            'sin_cambios': self.sin_cambios,
+            'municipios_afectados': len(self.municipios),
+        }
+
+
+class ImportManifest:
+    """Manifiesto de un origen de importación (importador + filtros) guardado en la propia base"""
+
+    def __init__(self, conn, origen: str):
+        self.conn = conn
+        self.origen = origen
+        for ddl in SQL_CREATE_MANIFEST:
+            conn.execute(ddl)
+
+    def archivo_sin_cambios(self, sha256: str) -> bool:
+        row = self.conn.execute('SELECT sha256 FROM import_files WHERE origen = ?', (self.origen,)).fetchone()
+        return row is not None and row[0] == sha256
+
+    def digests(self) -> Dict[Particion, str]:
+        rows = self.conn.execute(
+            'SELECT estado_norm, municipio_norm, year, digest FROM import_partitions WHERE origen = ?',
+            (self.origen,)
+        )
+        return {(e, m, y): digest for e, m, y, digest in rows}
+
+    def comparar(self, nuevos: Dict[Particion, str]) -> CambiosImportacion:
+        """Clasificar particiones en nuevas/modificadas/eliminadas respecto a la última importación"""
+        anteriores = self.digests()
+        nuevas = {p for p in nuevos if p not in anteriores}
+        modificadas = {p for p, d in nuevos.items() if p in anteriores and anteriores[p] != d}
+        eliminadas = {p for p in anteriores if p not in nuevos}
+        sin_cambios = len(nuevos) - len(nuevas) - len(modificadas)
+        return CambiosImportacion(nuevas, modificadas, eliminadas, sin_cambios)
+
+    def eliminar_particiones(self, particiones: Iterable[Particion], fuente: str) -> int:
+        """Borrar de crime_data las filas de este origen en las particiones dadas"""
+        cursor = self.conn.executemany(SQL_DELETE_PARTITION, [(*p, fuente) for p in particiones])
+        return cursor.rowcount
+
+    def primera_importacion(self) -> bool:
+        """Sin importación previa registrada para este origen"""
+        row = self.conn.execute('SELECT 1 FROM import_files WHERE origen = ?', (self.origen,)).fetchone()
+        return row is None
+
+    def eliminar_fuente(self, fuente: str, estado_norm: Optional[str] = None,
+                        municipios: Optional[Iterable[Tuple[str, str]]] = None,
+                        year_min: Optional[int] = None) -> int:
+        """Borrar todas las filas de la fuente dentro del alcance de la importación
+        Compara con normalizar(estado/municipio) para alcanzar también filas de importadores
+        anteriores, que pueden tener las columnas normalizadas vacías."""
+        self.conn.create_function('normalizar', 1, normalizar, deterministic=True)
+        condiciones, params = ['fuente = ?'], [fuente]
+        if estado_norm:
+            estados = estados_equivalentes(estado_norm)
+            condiciones.append(f"normalizar(estado) IN ({','.join('?' * len(estados))})")
+            params.extend(estados)
+        if year_min:
+            condiciones.append('year >= ?')
+            params.append(year_min)
+        if municipios is not None:
+            # Un solo recorrido de crime_data contra la lista de municipios (con sus estados equivalentes)
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS municipios_borrar (estado TEXT, municipio TEXT)')
+            self.conn.execute('DELETE FROM temp.municipios_borrar')
+            self.conn.executemany('INSERT INTO temp.municipios_borrar VALUES (?, ?)', [
+                (equivalente, municipio)
+                for estado, municipio in set(municipios) for equivalente in estados_equivalentes(estado)
+            ])
+            condiciones.append('(normalizar(estado), normalizar(municipio)) IN '
+                               '(SELECT estado, municipio FROM temp.municipios_borrar)')
+        borrados = self.conn.execute(f"DELETE FROM crime_data WHERE {' AND '.join(condiciones)}", params).rowcount
+        if municipios is not None:
+            self.conn.execute('DELETE FROM temp.municipios_borrar')
+        return borrados
+
+    def preparar_reescritura(self, particiones: Iterable[Particion], fuente: str, **alcance) -> int:
+        """Borrar lo que se va a reescribir: las particiones dadas y, en la primera importación
+        con manifiesto, las filas previas de la fuente en el alcance (eliminar_fuente). Conviene
+        acotar el alcance a los municipios del archivo: otras cargas pueden compartir la fuente.
+        Sin esto las filas de importadores anteriores, con otras claves de tipo_delito,
+        quedarían junto a las nuevas y refresh_crime_latest las sumaría dos veces."""
+        borrados = self.eliminar_fuente(fuente, **alcance) if self.primera_importacion() else 0
+        return borrados + self.eliminar_particiones(particiones, fuente)
+
+    def registrar(self, sha256: str, size: int, nuevos: Dict[Particion, str],
+                  cambios: CambiosImportacion) -> int:
+        """Guardar hash del archivo, digests de particiones y la bitácora de cambios; devuelve import_id"""
+        ahora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        import_id = self.conn.execute(
+            'INSERT INTO import_runs (origen, sha256, imported_at, nuevas, modificadas, eliminadas, sin_cambios) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (self.origen, sha256, ahora, len(cambios.nuevas), len(cambios.modificadas),
+             len(cambios.eliminadas), cambios.sin_cambios)
+        ).lastrowid
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO import_partitions (origen, estado_norm, municipio_norm, year, digest, import_id) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            [(self.origen, *p, nuevos[p], import_id) for p in cambios.nuevas | cambios.modificadas]
+        )
+        self.conn.executemany(
+            'DELETE FROM import_partitions WHERE origen = ? AND estado_norm = ? AND municipio_norm = ? AND year = ?',
+            [(self.origen, *p) for p in cambios.eliminadas]
+        )
+        self.conn.executemany(
+            'INSERT OR IGNORE INTO import_changes (import_id, estado_norm, municipio_norm) VALUES (?, ?, ?)',
+            [(import_id, *m) for m in cambios.municipios]
+        )
+        self.conn.execute(
+            'INSERT OR REPLACE INTO import_files (origen, sha256, size, imported_at) VALUES (?, ?, ?, ?)',
+            (self.origen, sha256, size, ahora)
+        )
+        logger.info(f"🧾 Importación {import_id} registrada para {self.origen}: {cambios.resumen()}")
+        return import_id
+
+
+def ultimo_import_id(conn) -> int:
+    """Id de la importación más reciente (0 si no hay manifiesto)"""
+    try:
+        return conn.execute('SELECT COALESCE(MAX(id), 0) FROM import_runs').fetchone()[0]
+    except sqlite3.OperationalError:
+        # Base sin tablas de manifiesto todavía
+        return 0
+
+
+def municipios_cambiados_desde(conn, import_id: int) -> Set[Tuple[str, str]]:
+    """Municipios modificados por importaciones posteriores a import_id"""
+    rows = conn.execute(
+        'SELECT DISTINCT estado_norm, municipio_norm FROM import_changes WHERE import_id > ?', (import_id,)
+    )
+    return {(e, m) for e, m in rows}
@@ -0,0 +1,33 @@
+"""
+Normalización de nombres de estados y municipios
+Compartida por el servicio de datos reales y los scripts de importación
+"""
+import unicodedata
+from typing import List
+
+
+def normalizar(s) -> str:
+    """Quitar acentos, espacios extremos y pasar a mayúsculas (NFKD + ASCII)"""
+    if not isinstance(s, str):
+        return ""
+    return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII').strip().upper()
+
+
+# Equivalencias de nombre de estado (ya normalizadas)
+EQUIVALENCIAS_ESTADO = {
+    'ESTADO DE MEXICO': ['MEXICO', 'ESTADO DE MEXICO'],
+    'MEXICO': ['MEXICO', 'ESTADO DE MEXICO'],
+    'CIUDAD DE MEXICO': ['CIUDAD DE MEXICO', 'CDMX'],
+    'NUEVO LEON': ['NUEVO LEON'],
+    'JALISCO': ['JALISCO'],
+    'GUANAJUATO': ['GUANAJUATO'],
+    'HIDALGO': ['HIDALGO'],
+}
+
+
+def estados_equivalentes(estado_norm: str) -> List[str]:
+    """Nombres normalizados con los que puede aparecer un estado en la base"""
+    for key, vals in EQUIVALENCIAS_ESTADO.items():
+        if estado_norm in vals or key == estado_norm:
+            return vals
+    return [estado_norm]
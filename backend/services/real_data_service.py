@@ -3,86 +3,133 @@ Servicio de Datos Reales para el Sistema de Análisis de Riesgo
 Integra datos oficiales de SESNSP, INEGI y otras fuentes gubernamentales
 """
 import requests
-import sqlite3
 import json
 import os
 from datetime import datetime, timedelta
 import pandas as pd
 from typing import Dict, List, Optional
 import logging
+import time
+
+from services.crime_latest import ensure_crime_latest_table, refresh_crime_latest
+from services.crime_schema import SQL_CREATE_CRIME_DATA, create_crime_data_indexes
+from services.crime_snapshot import build_snapshot, load_records, record_from_row
+from services.import_manifest import municipios_cambiados_desde, ultimo_import_id
+from services.normalization import normalizar, estados_equivalentes
+from services.sqlite_pool import SQLiteConnectionPool
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cada cuánto revisar si un importador externo cambió municipios (segundos)
+SNAPSHOT_SYNC_SECONDS = float(os.getenv("SNAPSHOT_SYNC_SECONDS", 60))
+
+# Sentencias SQL fijas: el texto constante permite reutilizar la sentencia preparada
+# en el cache de cada conexión del pool
+SQL_LATEST_BY_NORM = '''
+    SELECT estado_norm, municipio_norm, estado, municipio, year, month,
+           robo_comun, robo_casa_habitacion, robo_negocio, robo_vehiculo,
+           homicidio_doloso, homicidio_culposo, extorsion, secuestro,
+           total_delitos, poblacion, tasa_criminalidad, fuente, fecha_actualizacion,
+           pct_robo, pct_homicidio, pct_extorsion
+    FROM crime_latest
+    WHERE estado_norm IN ({placeholders}) AND municipio_norm = ?
+    LIMIT 1
+'''
+SQL_MUNICIPIOS_HIDALGO = "SELECT municipio FROM crime_latest WHERE estado_norm = 'HIDALGO' ORDER BY municipio"
+SQL_COUNT_CRIME = 'SELECT COUNT(*) FROM crime_data'
+SQL_LAST_UPDATE = 'SELECT MAX(fecha_actualizacion) FROM crime_data'
+SQL_UPSERT_CRIME = '''
+    INSERT OR REPLACE INTO crime_data 
+    (estado, municipio, estado_norm, municipio_norm, year, month, robo_comun, robo_casa_habitacion, 
+     robo_negocio, robo_vehiculo, homicidio_doloso, homicidio_culposo, 
+     extorsion, secuestro, total_delitos, poblacion, tasa_criminalidad, fuente)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+SQL_BACKFILL_NORM = '''
+    UPDATE crime_data
+    SET estado_norm = normalizar(estado), municipio_norm = normalizar(municipio)
+    WHERE estado_norm IS NULL OR estado_norm = '' OR municipio_norm IS NULL OR municipio_norm = ''
+'''
+
 class RealDataService:
     def _normalize(self, s):
-        import unicodedata
-        if not isinstance(s, str):
-            return ""
-        return unicodedata.normalize('NFKD', s).encode('ASCII', 'ignore').decode('ASCII').strip().upper()
+        return normalizar(s)
 
     def get_crime_data_by_municipio_estado(self, municipio: str, estado: str) -> Optional[Dict]:
         """Obtener datos criminales por municipio y estado, aceptando equivalencias de nombre de estado"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
             municipio_norm = self._normalize(municipio)
-            estado_norm = self._normalize(estado)
-            # Equivalencias de estado
-            equivalencias_estado = {
-                'ESTADO DE MEXICO': ['MEXICO', 'ESTADO DE MEXICO'],
-                'MEXICO': ['MEXICO', 'ESTADO DE MEXICO'],
-                'CIUDAD DE MEXICO': ['CIUDAD DE MEXICO', 'CDMX'],
-                'NUEVO LEON': ['NUEVO LEON', 'NUEVO LEÓN'],
-                'JALISCO': ['JALISCO'],
-                'GUANAJUATO': ['GUANAJUATO'],
-                'HIDALGO': ['HIDALGO'],
+            estados_validos = estados_equivalentes(self._normalize(estado))
+            record = self._lookup_latest(estados_validos, municipio_norm)
+            if record is None:
+                return None
+            return {
+                'location': f"{record.municipio}, {record.estado}",
+                'crime_percentages': record.crime_percentages,
+                'raw_data': record.raw_data,
+                'data_source': 'SESNSP - Datos Oficiales',
+                'last_update': record.fecha_actualizacion,
+                'reliability': 'HIGH'
             }
-            # Buscar equivalencias para el estado recibido
-            estados_validos = [estado_norm]
-            for key, vals in equivalencias_estado.items():
-                if estado_norm in vals or key == estado_norm:
-                    estados_validos = vals
-                    break
-            query = '''
-                SELECT * FROM crime_data 
-            '''
-            cursor.execute(query)
-            results = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]
-            for row in results:
-                row_dict = dict(zip(columns, row))
-                row_estado_norm = self._normalize(row_dict['estado'])
-                row_municipio_norm = self._normalize(row_dict['municipio'])
-                if row_municipio_norm == municipio_norm and row_estado_norm in estados_validos:
-                    crime_data = row_dict
-                    total = crime_data['total_delitos']
-                    if total > 0:
-                        crime_percentages = {
-                            'robo': round((crime_data.get('robo_comun',0) + crime_data.get('robo_negocio',0) + crime_data.get('robo_vehiculo',0)) / total * 100, 1),
-                            'homicidio': round((crime_data.get('homicidio_doloso',0) + crime_data.get('homicidio_culposo',0)) / total * 100, 1),
-                            'extorsion': round(crime_data.get('extorsion',0) / total * 100, 1)
-                        }
-                    else:
-                        crime_percentages = {'robo': 0, 'homicidio': 0, 'extorsion': 0}
-                    return {
-                        'location': f"{crime_data['municipio']}, {crime_data['estado']}",
-                        'crime_percentages': crime_percentages,
-                        'raw_data': crime_data,
-                        'data_source': 'SESNSP - Datos Oficiales',
-                        'last_update': crime_data['fecha_actualizacion'],
-                        'reliability': 'HIGH'
-                    }
-            return None
         except Exception as e:
             logger.error(f"❌ Error obteniendo datos criminales por municipio/estado: {str(e)}")
             return None
+
+    def _lookup_latest(self, estados_validos: List[str], municipio_norm: str):
+        """Periodo más reciente de un municipio: snapshot en memoria y, si falta, crime_latest por llave primaria"""
+        if time.monotonic() >= self._next_sync:
+            self.sincronizar_importaciones()
+        record = self.snapshot.lookup(estados_validos, municipio_norm)
+        if record is not None:
+            return record
+        query = SQL_LATEST_BY_NORM.format(placeholders=', '.join('?' * len(estados_validos)))
+        with self.pool.reader() as conn:
+            row = conn.execute(query, (*estados_validos, municipio_norm)).fetchone()
+        return record_from_row(row) if row else None
+
     def __init__(self):
         self.data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
         self.db_path = os.path.join(self.data_dir, 'real_crime_data.db')
         self.ensure_data_directory()
+        self.pool = SQLiteConnectionPool(self.db_path)
         self.init_database()
+        self.import_id = 0
+        self._next_sync = time.monotonic() + SNAPSHOT_SYNC_SECONDS
+        self.snapshot = self._build_snapshot()
+    
+    def _build_snapshot(self):
+        """Construir el índice en memoria del periodo más reciente por municipio"""
+        with self.pool.reader() as conn:
+            self.import_id = ultimo_import_id(conn)
+            snapshot = build_snapshot(conn)
+        logger.info(f"🗂️ Snapshot de municipios construido: {len(snapshot)} municipios en {snapshot.build_seconds * 1000:.1f} ms")
+        return snapshot
+    
+    def refresh_snapshot(self):
+        """Reconstruir el snapshot y reemplazarlo de forma atómica"""
+        # La asignación de atributo es atómica: los lectores ven el snapshot viejo o el nuevo
+        self.snapshot = self._build_snapshot()
+        return self.snapshot
+    
+    def sincronizar_importaciones(self) -> int:
+        """Aplicar al snapshot solo los municipios que cambiaron en importaciones posteriores"""
+        self._next_sync = time.monotonic() + SNAPSHOT_SYNC_SECONDS
+        try:
+            with self.pool.reader() as conn:
+                ultimo = ultimo_import_id(conn)
+                if ultimo <= self.import_id:
+                    return 0
+                municipios = municipios_cambiados_desde(conn, self.import_id)
+                records = load_records(conn, municipios)
+        except Exception as e:
+            logger.error(f"❌ Error sincronizando importaciones: {str(e)}")
+            return 0
+        self.snapshot = self.snapshot.actualizar(records, municipios - records.keys())
+        self.import_id = ultimo
+        logger.info(f"🔄 Snapshot sincronizado con la importación {ultimo}: {len(municipios)} municipios actualizados")
+        return len(municipios)
     
     def ensure_data_directory(self):
         """Crear directorio de datos si no existe"""
@@ -92,34 +139,19 @@ class RealDataService:
     
     def init_database(self):
         """Inicializar base de datos SQLite"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
+        with self.pool.writer() as conn:
+            self._create_schema(conn.cursor())
+            self._migrate_normalized_columns(conn)
+            # Bases importadas antes de existir crime_latest: materializar una vez
+            if conn.execute('SELECT COUNT(*) FROM crime_latest').fetchone()[0] == 0 \
+                    and conn.execute(SQL_COUNT_CRIME).fetchone()[0] > 0:
+                refresh_crime_latest(conn)
+        logger.info("✅ Base de datos inicializada correctamente")
+    
+    def _create_schema(self, cursor):
+        """Crear tablas si no existen"""
         # Tabla para datos criminales por municipio
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS crime_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                estado TEXT NOT NULL,
-                municipio TEXT NOT NULL,
-                year INTEGER NOT NULL,
-                month INTEGER NOT NULL,
-                tipo_delito TEXT DEFAULT '',
-                robo_comun REAL DEFAULT 0,
-                robo_casa_habitacion REAL DEFAULT 0,
-                robo_negocio REAL DEFAULT 0,
-                robo_vehiculo REAL DEFAULT 0,
-                homicidio_doloso REAL DEFAULT 0,
-                homicidio_culposo REAL DEFAULT 0,
-                extorsion REAL DEFAULT 0,
-                secuestro REAL DEFAULT 0,
-                total_delitos REAL DEFAULT 0,
-                poblacion INTEGER DEFAULT 0,
-                tasa_criminalidad REAL DEFAULT 0,
-                fuente TEXT DEFAULT 'SESNSP',
-                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(estado, municipio, year, month, tipo_delito)
-            )
-        ''')
+        cursor.execute(SQL_CREATE_CRIME_DATA)
         
         # Tabla para datos demográficos INEGI
         cursor.execute('''
@@ -140,13 +172,25 @@ class RealDataService:
             )
         ''')
         
-        # Índice para consultas rápidas
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_location ON crime_data(estado, municipio)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_date ON crime_data(year, month)')
+        # Último periodo por municipio, del que lee el servicio
+        ensure_crime_latest_table(cursor)
+    
+    def _migrate_normalized_columns(self, conn):
+        """Agregar y rellenar estado_norm/municipio_norm en bases creadas antes de estas columnas"""
+        columnas = {row[1] for row in conn.execute('PRAGMA table_info(crime_data)')}
+        for columna in ('estado_norm', 'municipio_norm'):
+            if columna not in columnas:
+                conn.execute(f"ALTER TABLE crime_data ADD COLUMN {columna} TEXT DEFAULT ''")
+                logger.info(f"🔧 Columna {columna} agregada a crime_data")
         
-        conn.commit()
-        conn.close()
-        logger.info("✅ Base de datos inicializada correctamente")
+        # Filas importadas sin normalizar (scripts antiguos): normalizar una sola vez aquí
+        conn.create_function('normalizar', 1, normalizar, deterministic=True)
+        updated = conn.execute(SQL_BACKFILL_NORM).rowcount
+        if updated > 0:
+            logger.info(f"🔧 Normalizados {updated} registros existentes")
+        
+        # Índices para consultas rápidas (incluye el compuesto por nombre normalizado + periodo)
+        create_crime_data_indexes(conn)
     
     def download_sesnsp_data(self):
         """Descargar datos oficiales del SESNSP"""
@@ -169,9 +213,6 @@ class RealDataService:
     
     def load_sample_real_data(self):
         """Cargar datos de ejemplo basados en estadísticas reales mexicanas"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         # Datos reales aproximados para estados con almacenes ML
         real_crime_data = [
             # Estado de México (Tepotzotlán - MXCD02)
@@ -240,23 +281,21 @@ class RealDataService:
             },
         ]
         
-        for data in real_crime_data:
-            cursor.execute('''
-                INSERT OR REPLACE INTO crime_data 
-                (estado, municipio, year, month, robo_comun, robo_casa_habitacion, 
-                 robo_negocio, robo_vehiculo, homicidio_doloso, homicidio_culposo, 
-                 extorsion, secuestro, total_delitos, poblacion, tasa_criminalidad, fuente)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['estado'], data['municipio'], data['year'], data['month'],
-                data['robo_comun'], data['robo_casa_habitacion'], data['robo_negocio'],
-                data['robo_vehiculo'], data['homicidio_doloso'], data['homicidio_culposo'],
-                data['extorsion'], data['secuestro'], data['total_delitos'],
-                data['poblacion'], data['tasa_criminalidad'], data['fuente']
-            ))
-        
-        conn.commit()
-        conn.close()
+        # Escritura por la conexión dedicada (solo update_data llega aquí)
+        with self.pool.writer() as conn:
+            conn.executemany(SQL_UPSERT_CRIME, [
+                (
+                    data['estado'], data['municipio'],
+                    normalizar(data['estado']), normalizar(data['municipio']),
+                    data['year'], data['month'],
+                    data['robo_comun'], data['robo_casa_habitacion'], data['robo_negocio'],
+                    data['robo_vehiculo'], data['homicidio_doloso'], data['homicidio_culposo'],
+                    data['extorsion'], data['secuestro'], data['total_delitos'],
+                    data['poblacion'], data['tasa_criminalidad'], data['fuente']
+                )
+                for data in real_crime_data
+            ])
+            refresh_crime_latest(conn)
         logger.info(f"✅ Cargados {len(real_crime_data)} registros de datos criminales reales")
     
     def get_crime_data_by_location(self, address: str) -> Optional[Dict]:
@@ -272,34 +311,18 @@ class RealDataService:
             
             logger.info(f"📍 Ubicación parseada: {location_info}")
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Buscar datos más recientes para la ubicación
-            query = '''
-                SELECT * FROM crime_data 
-                WHERE estado = ? AND municipio = ?
-                ORDER BY year DESC, month DESC
-                LIMIT 1
-            '''
-            params = (location_info["estado"], location_info["municipio"])
-            
-            logger.info(f"🔍 Ejecutando query exacta: {query}")
-            logger.info(f"🔍 Parámetros exactos: {params}")
-            
-            cursor.execute(query, params)
-            
-            result = cursor.fetchone()
+            # Snapshot en memoria y, si falta, la tabla materializada crime_latest
+            record = self._lookup_latest(
+                estados_equivalentes(self._normalize(location_info["estado"])),
+                self._normalize(location_info["municipio"])
+            )
             
-            if result:
-                logger.info(f"✅ Datos encontrados en BD: {result}")
-            else:
+            if record is None:
                 logger.warning(f"❌ No se encontraron datos en BD para {location_info}")
                 
-                # Si es Hidalgo, mostrar municipios disponibles para debug
                 if 'HIDALGO' in location_info["estado"].upper():
-                    cursor.execute("SELECT DISTINCT municipio FROM crime_data WHERE UPPER(estado) LIKE '%HIDALGO%' ORDER BY municipio")
-                    municipios_disponibles = cursor.fetchall()
+                    with self.pool.reader() as conn:
+                        municipios_disponibles = conn.execute(SQL_MUNICIPIOS_HIDALGO).fetchall()
                     logger.info(f"📋 Municipios disponibles en Hidalgo ({len(municipios_disponibles)}):")
                     
                     # Mostrar TODOS los municipios, buscando específicamente Tezontepec
@@ -318,41 +341,27 @@ class RealDataService:
                         logger.info(f"🎯 MUNICIPIOS CON TEZONTEPEC ENCONTRADOS: {tezontepec_encontrados}")
                     else:
                         logger.info(f"❌ NO se encontró ningún municipio con 'TEZONTEPEC' en Hidalgo")
-            
-            conn.close()
-            
-            if result:
-                # Convertir resultado a diccionario
-                columns = [desc[0] for desc in cursor.description]
-                crime_data = dict(zip(columns, result))
                 
-                # Calcular porcentajes relativos
-                total = crime_data['total_delitos']
-                if total > 0:
-                    crime_percentages = {
-                        'robo': round((crime_data['robo_comun'] + crime_data['robo_negocio'] + crime_data['robo_vehiculo']) / total * 100, 1),
-                        'homicidio': round((crime_data['homicidio_doloso'] + crime_data['homicidio_culposo']) / total * 100, 1),
-                        'extorsion': round(crime_data['extorsion'] / total * 100, 1)
-                    }
-                    return {
-                        'location': f"{crime_data['municipio']}, {crime_data['estado']}",
-                        'crime_percentages': crime_percentages,
-                        'raw_data': crime_data,
-                        'data_source': 'SESNSP - Datos Oficiales',
-                        'fuente': 'SESNSP - Datos Oficiales',
-                        'last_update': crime_data['fecha_actualizacion'],
-                        'reliability': 'HIGH',
-                        'confiabilidad': 'HIGH'
-                    }
-                else:
-                    # Datos placeholder/vacíos - generar datos sintéticos realistas
-                    logger.warning(f"⚠️ Datos vacíos encontrados para {location_info['municipio']}, {location_info['estado']}. Generando datos sintéticos.")
-                    return self.generate_synthetic_crime_data(location_info)
-            else:
                 # No se encontraron datos - generar datos sintéticos realistas
                 logger.warning(f"⚠️ No se encontraron datos para {location_info['municipio']}, {location_info['estado']}. Generando datos sintéticos.")
                 return self.generate_synthetic_crime_data(location_info)
             
+            if record.total_delitos > 0:
+                return {
+                    'location': f"{record.municipio}, {record.estado}",
+                    'crime_percentages': record.crime_percentages,
+                    'raw_data': record.raw_data,
+                    'data_source': 'SESNSP - Datos Oficiales',
+                    'fuente': 'SESNSP - Datos Oficiales',
+                    'last_update': record.fecha_actualizacion,
+                    'reliability': 'HIGH',
+                    'confiabilidad': 'HIGH'
+                }
+            
+            # Datos placeholder/vacíos - generar datos sintéticos realistas
+            logger.warning(f"⚠️ Datos vacíos encontrados para {location_info['municipio']}, {location_info['estado']}. Generando datos sintéticos.")
+            return self.generate_synthetic_crime_data(location_info)
+            
         except Exception as e:
             logger.error(f"❌ Error obteniendo datos criminales: {str(e)}")
             return None
@@ -546,6 +555,7 @@ class RealDataService:
         logger.info("🔄 Iniciando actualización de datos...")
         success = self.download_sesnsp_data()
         if success:
+            self.refresh_snapshot()
             logger.info("✅ Actualización completada exitosamente")
         else:
             logger.error("❌ Error en la actualización de datos")
@@ -553,21 +563,17 @@ class RealDataService:
     
     def get_data_status(self) -> Dict:
         """Obtener estado de los datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) FROM crime_data')
-        crime_records = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT MAX(fecha_actualizacion) FROM crime_data')
-        last_update = cursor.fetchone()[0]
-        
-        conn.close()
+        with self.pool.reader() as conn:
+            crime_records = conn.execute(SQL_COUNT_CRIME).fetchone()[0]
+            last_update = conn.execute(SQL_LAST_UPDATE).fetchone()[0]
         
         return {
             'crime_records': crime_records,
             'last_update': last_update,
             'database_path': self.db_path,
+            'connection_pool': self.pool.stats(),
+            'snapshot': self.snapshot.stats(),
+            'import_id': self.import_id,
             'status': 'OPERATIONAL' if crime_records > 0 else 'NO_DATA'
         }
 
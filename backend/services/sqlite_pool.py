@@ -0,0 +1,130 @@
+"""
+Pool de conexiones SQLite para el servicio de datos reales
+Conexiones de solo lectura reutilizables + una única conexión de escritura
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamaño por defecto: un lector por worker del servidor
+DEFAULT_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", os.cpu_count() or 4))
+# Sentencias preparadas que conserva cada conexión (cache interno de sqlite3)
+DEFAULT_STATEMENT_CACHE = 128
+
+
+class SQLiteConnectionPool:
+    """Pool thread-safe de conexiones de lectura con una conexión de escritura dedicada"""
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE,
+                 cached_statements: int = DEFAULT_STATEMENT_CACHE, timeout: float = 30.0):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=self.size)
+        self._created = 0
+        self._create_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writer: sqlite3.Connection = None
+        self._closed = False
+
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        # WAL permite que los lectores sigan atendiendo mientras se actualizan datos
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _open_reader(self) -> sqlite3.Connection:
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute('PRAGMA query_only=ON')
+        return conn
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._create_lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._open_reader()
+                except Exception:
+                    self._created -= 1
+                    raise
+        # Pool lleno: esperar a que otro hilo devuelva su conexión
+        return self._readers.get(timeout=self.timeout)
+
+    def _release_reader(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+            return
+        self._readers.put_nowait(conn)
+
+    @contextmanager
+    def reader(self):
+        """Prestar una conexión de solo lectura del pool"""
+        if self._closed:
+            raise RuntimeError("El pool de conexiones está cerrado")
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            self._release_reader(conn)
+
+    @contextmanager
+    def writer(self):
+        """Usar la conexión de escritura única dentro de una transacción"""
+        if self._closed:
+            raise RuntimeError("El pool de conexiones está cerrado")
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open_writer()
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def stats(self) -> dict:
+        """Estado del pool para diagnóstico"""
+        return {
+            'size': self.size,
+            'readers_open': self._created,
+            'readers_idle': self._readers.qsize(),
+            'writer_open': self._writer is not None,
+            'cached_statements': self.cached_statements,
+        }
+
+    def close(self):
+        """Cerrar todas las conexiones abiertas"""
+        self._closed = True
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
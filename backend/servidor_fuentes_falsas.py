@@ -0,0 +1,53 @@
+"""
+Servidor local de fuentes falsas (SESNSP, INEGI, fiscalías, ONGs, clima) para pruebas sin red
+
+Uso:
+    python servidor_fuentes_falsas.py --puerto 8099 --latencia 150 --jitter 50 --tasa-error 0.05
+    HTTP_REPLAY_URL=http://127.0.0.1:8099 python real_data_server.py
+
+Con --modo record consulta las fuentes reales y guarda cada respuesta en data/cassettes/
+para reproducirla después sin conexión; en modo replay se sirven las grabaciones y, si no
+hay, datos sintéticos con el mismo formato. Estadísticas en http://127.0.0.1:<puerto>/__stats
+"""
+import argparse
+import logging
+import os
+import sys
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.fuentes_falsas import CASSETTES_DIR, FuentesFalsas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de fuentes de datos falsas")
+    parser.add_argument('--modo', choices=['replay', 'record'], default='replay')
+    parser.add_argument('--cassettes', default=CASSETTES_DIR, help="Directorio de grabaciones")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8099)
+    parser.add_argument('--latencia', type=float, default=0.0, help="Latencia media en ms")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Variación de la latencia en ms")
+    parser.add_argument('--tasa-error', type=float, default=0.0, help="Fracción de respuestas 503 (0-1)")
+    parser.add_argument('--semilla', type=int, default=None, help="Semilla para latencia y errores")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fuentes = FuentesFalsas(
+        modo=args.modo,
+        directorio=args.cassettes,
+        latencia=args.latencia / 1000,
+        jitter=args.jitter / 1000,
+        tasa_error=args.tasa_error,
+        semilla=args.semilla
+    )
+    print(f"🎞️ Fuentes falsas en modo {args.modo} en http://{args.host}:{args.puerto}")
+    print(f"⏱️ Latencia {args.latencia}±{args.jitter} ms, tasa de error {args.tasa_error:.0%}")
+    print(f"📼 Grabaciones en {args.cassettes}")
+    print(f"👉 Iniciar el backend con HTTP_REPLAY_URL=http://{args.host}:{args.puerto}")
+    web.run_app(fuentes.crear_app(), host=args.host, port=args.puerto, print=None)
+
+
+if __name__ == "__main__":
+    main()